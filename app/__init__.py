@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, Request
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
@@ -12,21 +12,112 @@ migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
 
+class FormRequest(Request):
+    """Предел текстовых полей формы — из MAX_FORM_MEMORY_SIZE, а не 500 КБ werkzeug."""
+
+    @property
+    def max_form_memory_size(self):
+        from flask import current_app
+        return current_app.config['MAX_FORM_MEMORY_SIZE']
+
+
 def create_app():
     app = Flask(__name__, template_folder="templates", static_folder="static")
+    app.request_class = FormRequest
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///cryptolab.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Текстовые поля форм: песочницы принимают до MAX_ANALYSIS_TEXT символов
+    # (app/forms.py), кириллица — 2 байта на символ
+    app.config['MAX_FORM_MEMORY_SIZE'] = int(os.getenv('MAX_FORM_MEMORY_SIZE', str(4 * 1024 * 1024)))
+    app.config['RSA_POOL_DEPTH'] = int(os.getenv('RSA_POOL_DEPTH', '4'))
+    app.config['RSA_POOL_SIZES'] = os.getenv('RSA_POOL_SIZES', '2048')
+    app.config['PLAYFAIR_SOLVER_SECONDS'] = float(os.getenv('PLAYFAIR_SOLVER_SECONDS', '20'))
+    app.config['API_BATCH_WORKERS'] = int(os.getenv('API_BATCH_WORKERS', '2'))
+    # Общий каталог метрик для нескольких воркеров (пусто — только текущий процесс)
+    app.config['METRICS_DIR'] = os.getenv('METRICS_DIR', '')
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')
+    # Запись отправок: async — пачками из фонового потока, sync — сразу в запросе
+    app.config['SUBMISSION_SINK'] = os.getenv('SUBMISSION_SINK', 'async')
+    app.config['SUBMISSION_BATCH_SIZE'] = int(os.getenv('SUBMISSION_BATCH_SIZE', '200'))
+    app.config['SUBMISSION_FLUSH_SECONDS'] = float(os.getenv('SUBMISSION_FLUSH_SECONDS', '0.5'))
+    app.config['SUBMISSION_QUEUE_SIZE'] = int(os.getenv('SUBMISSION_QUEUE_SIZE', '1000'))
+    # Кэш пользователей Flask-Login: TTL (с, 0 — выключен) и число записей на процесс
+    app.config['USER_CACHE_TTL'] = float(os.getenv('USER_CACHE_TTL', '30'))
+    app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', '1024'))
+    # Хэши паролей: метод werkzeug, процессов пула (0 — в потоке запроса),
+    # предел очереди и сколько ждать места в ней перед 503. Пул — на каждый
+    # воркер gunicorn: всего SERVE_WORKERS × PASSWORD_HASH_WORKERS процессов
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', '1'))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.getenv('PASSWORD_HASH_QUEUE', '0'))
+    app.config['PASSWORD_HASH_WAIT'] = float(os.getenv('PASSWORD_HASH_WAIT', '5'))
+    # Допуск дорогих запросов (app/admission.py): вёдра пользователя и сервера
+    # в единицах ~10 мс CPU, бэкенд состояния memory|sqlite
+    app.config['ADMISSION_ENABLED'] = os.getenv('ADMISSION_ENABLED', '1') not in ('0', 'false', 'no')
+    app.config['ADMISSION_USER_RATE'] = float(os.getenv('ADMISSION_USER_RATE', '20'))
+    app.config['ADMISSION_USER_BURST'] = float(os.getenv('ADMISSION_USER_BURST', '200'))
+    app.config['ADMISSION_GLOBAL_RATE'] = float(os.getenv('ADMISSION_GLOBAL_RATE', '0'))
+    app.config['ADMISSION_GLOBAL_BURST'] = float(os.getenv('ADMISSION_GLOBAL_BURST', '0'))
+    app.config['ADMISSION_BACKEND'] = os.getenv('ADMISSION_BACKEND', 'sqlite')
+    app.config['ADMISSION_SQLITE_PATH'] = os.getenv('ADMISSION_SQLITE_PATH', '')
+    # flask serve: адрес, воркеры (0 — по числу CPU), потоки на воркер и перезапуск воркера
+    app.config['SERVE_BIND'] = os.getenv('SERVE_BIND', '0.0.0.0:8000')
+    app.config['SERVE_WORKERS'] = int(os.getenv('SERVE_WORKERS', '0'))
+    app.config['SERVE_THREADS'] = int(os.getenv('SERVE_THREADS', '4'))
+    app.config['SERVE_MAX_REQUESTS'] = int(os.getenv('SERVE_MAX_REQUESTS', '1000'))
+    # Кэш GET-страниц песочниц и лаб: предел памяти на процесс, TTL записи (с)
+    # и файл-метка версии лаб, общий для воркеров
+    app.config['PAGE_CACHE_ENABLED'] = os.getenv('PAGE_CACHE_ENABLED', '1') not in ('0', 'false', 'no')
+    app.config['PAGE_CACHE_BYTES'] = int(os.getenv('PAGE_CACHE_BYTES', str(32 * 1024 * 1024)))
+    app.config['PAGE_CACHE_TTL'] = float(os.getenv('PAGE_CACHE_TTL', '600'))
+    app.config['PAGE_CACHE_STAMP'] = os.getenv('PAGE_CACHE_STAMP', '')
+    # Фоновые задачи (flask jobs_worker): каталог файлов (пусто — instance/jobs),
+    # срок хранения результата (с), незавершённых задач на пользователя, предел загрузки (байт)
+    app.config['JOB_DIR'] = os.getenv('JOB_DIR', '')
+    app.config['JOB_RESULT_TTL'] = float(os.getenv('JOB_RESULT_TTL', str(24 * 3600)))
+    app.config['JOB_MAX_ACTIVE'] = int(os.getenv('JOB_MAX_ACTIVE', '5'))
+    app.config['JOB_UPLOAD_MAX_BYTES'] = int(os.getenv('JOB_UPLOAD_MAX_BYTES', str(256 * 1024 * 1024)))
+    app.config['JOB_STALE_SECONDS'] = float(os.getenv('JOB_STALE_SECONDS', '120'))
+    app.config['JOB_MAX_ATTEMPTS'] = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    # Строк на страницу в списках профиля и админки
+    app.config['LIST_PAGE_SIZE'] = int(os.getenv('LIST_PAGE_SIZE', '50'))
 
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
+    from .metrics import metrics
+    metrics.init_app(app)
+    # слушатель after_insert для Submission -> user_stats
+    from . import stats  # noqa: F401
+    from .submission_sink import submission_sink
+    submission_sink.init_app(app)
+    from .user_cache import user_cache
+    user_cache.init_app(app)
+    from .passwords import passwords
+    passwords.init_app(app)
+    from .admission import admission
+    admission.init_app(app)
+    from .page_cache import page_cache
+    page_cache.init_app(app)
+    from .jobs import jobs
+    jobs.init_app(app)
+
+    from .crypto.rsa_pool import key_pool
+    key_pool.init_app(app)
+    from .crypto.operations import batch_pool
+    batch_pool.init_app(app)
+
     from .views.main import bp as main_bp
     from .views.auth import bp as auth_bp
     from .views.admin import bp as admin_bp
+    from .views.api import bp as api_bp
+    from .views.health import bp as health_bp
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(admin_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(health_bp)
 
     return app
@@ -0,0 +1,281 @@
+# app/admission.py
+# -*- coding: utf-8 -*-
+"""
+Допуск дорогих запросов: token bucket на пользователя и общий.
+
+Тяжёлые вьюхи объявляют стоимость в условных единицах (~10 мс CPU):
+
+    @bp.route('/playground/rsa', methods=['GET', 'POST'])
+    @login_required
+    @admission.limit(cost_of('rsa.keygen'))     # цена из COSTS (+ за КБ тела)
+    @admission.limit(5)                         # или просто число
+
+Цена списывается только с POST сразу из двух вёдер — пользователя
+(ADMISSION_USER_RATE ед/с, ёмкость ADMISSION_USER_BURST) и общего на
+сервер (ADMISSION_GLOBAL_RATE/BURST). Если хотя бы в одном не хватает,
+запрос сразу получает отказ и ничего не списывается — без очереди и без
+занятого потока: API и скрипты — 429 с Retry-After, браузер — обратно на
+страницу с формой и flash-сообщением. Запрос дороже ёмкости ведра не
+пройдёт никогда — он получает 429 без Retry-After: такую работу отправляют
+фоновой задачей (POST /api/v1/jobs).
+
+Состояние вёдер — в бэкенде (ADMISSION_BACKEND):
+- sqlite (по умолчанию) — файл ADMISSION_SQLITE_PATH, общий для всех
+  воркеров хоста;
+- memory — словарь процесса: только для одного процесса, при N воркерах
+  gunicorn каждое ведро, включая общее, фактически в N раз больше.
+Ошибка бэкенда запрос не блокирует (fail-open, пишется в лог).
+Счётчики admitted/rejected — в /admin/metrics.
+"""
+
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Iterable, Tuple, Union
+
+from flask import Response, current_app, flash, jsonify, redirect, request
+from flask_login import current_user
+
+from .metrics import metrics, _labelstr
+
+# (ключ ведра, скорость ед/с, ёмкость)
+Bucket = Tuple[str, float, float]
+
+DEFAULT_USER_RATE = 20.0
+DEFAULT_USER_BURST = 200.0
+# общий лимит по умолчанию — ~80% ядер хоста
+DEFAULT_GLOBAL_RATE = 80.0 * (os.cpu_count() or 1)
+
+
+def _refill(tokens: float, ts: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - ts) * rate)
+
+
+def _decide(levels: Dict[str, float], buckets: Iterable[Bucket], cost: float) -> float:
+    """0 — хватает во всех вёдрах, иначе сколько секунд ждать."""
+    wait = 0.0
+    for key, rate, _ in buckets:
+        if levels[key] < cost:
+            wait = max(wait, (cost - levels[key]) / rate)
+    return wait
+
+
+class MemoryBackend:
+    """Вёдра в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, buckets, cost: float, now: float) -> float:
+        with self._lock:
+            levels = {}
+            for key, rate, burst in buckets:
+                tokens, ts = self._state.get(key, (burst, now))
+                levels[key] = _refill(tokens, ts, now, rate, burst)
+            wait = _decide(levels, buckets, cost)
+            if not wait:
+                for key, _, _ in buckets:
+                    self._state[key] = (levels[key] - cost, now)
+            return wait
+
+
+class SQLiteBackend:
+    """Вёдра в файле SQLite: одно BEGIN IMMEDIATE на решение, общее для процессов."""
+
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket '
+                         '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        return conn
+
+    def _conn(self):
+        # соединение на поток и на процесс (после fork — новое)
+        conn, pid = getattr(self._local, 'conn', None), getattr(self._local, 'pid', None)
+        if conn is None or pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, buckets, cost: float, now: float) -> float:
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            levels = {}
+            for key, rate, burst in buckets:
+                row = conn.execute('SELECT tokens, ts FROM bucket WHERE key = ?', (key,)).fetchone()
+                levels[key] = burst if row is None else _refill(row[0], row[1], now, rate, burst)
+            wait = _decide(levels, buckets, cost)
+            if not wait:
+                conn.executemany(
+                    'INSERT INTO bucket (key, tokens, ts) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, ts = excluded.ts',
+                    [(key, levels[key] - cost, now) for key, _, _ in buckets])
+            self._calls += 1
+            if self._calls % self.CLEANUP_EVERY == 0:
+                # давно не тронутые вёдра уже полные — строка не нужна
+                conn.execute('DELETE FROM bucket WHERE ts < ?', (now - 3600,))
+            conn.execute('COMMIT')
+            return wait
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+
+BACKENDS: Dict[str, Callable[[dict], object]] = {
+    'memory': lambda cfg: MemoryBackend(),
+    'sqlite': lambda cfg: SQLiteBackend(cfg.get('ADMISSION_SQLITE_PATH')
+                                        or os.path.join(tempfile.gettempdir(), 'cryptolab_admission.db')),
+}
+
+
+# Стоимость алгоритмов: (база, за каждый КБ тела запроса), ~10 мс CPU за единицу.
+# Ключ — 'алгоритм' или 'алгоритм.действие' (как в app/crypto/operations.py).
+# Ставки за КБ — замер на самом большом вводе песочницы с запасом ~2×:
+# такой запрос укладывается в ведро пользователя по умолчанию (200 ед.)
+COSTS: Dict[str, Tuple[float, float]] = {
+    'caesar': (1, 0.02),
+    'caesar.bruteforce': (2, 0.01),
+    'vigenere': (1, 0.03),
+    'vigenere.break': (20, 0.25),
+    'playfair': (1, 0.05),
+    'railfence': (1, 0.06),
+    'rc4': (1, 0.1),
+    'aes': (1, 0.02),
+    'aes.file': (1, 0.002),
+    'rsa': (5, 0),
+    'rsa.keygen': (50, 0),
+    'sha256': (1, 0.001),
+    'pipeline': (2, 0.2),
+}
+DEFAULT_COST = (1, 0.1)
+# admit(): запрос дороже ёмкости ведра
+TOO_EXPENSIVE = math.inf
+
+
+def cost_rates(name: str) -> Tuple[float, float]:
+    return COSTS.get(name) or COSTS.get(name.split('.', 1)[0]) or DEFAULT_COST
+
+
+def op_cost_rates(name: str, params: object) -> Tuple[float, float]:
+    """cost_rates() с поправкой на параметры операции: rsa.keygen дорожает как куб длины ключа."""
+    base, per_kb = cost_rates(name)
+    if name == 'rsa.keygen' and isinstance(params, dict):
+        try:
+            bits = int(params.get('bits') or 2048)
+        except (TypeError, ValueError):
+            bits = 2048
+        base *= (min(max(bits, 2048), 16384) / 2048) ** 3
+    return base, per_kb
+
+
+def cost_of(name: str) -> Callable[[], float]:
+    """Цена запроса к алгоритму name: база + ставка за КБ тела."""
+    base, per_kb = cost_rates(name)
+
+    def cost() -> float:
+        return base + per_kb * (request.content_length or 0) / 1024
+    return cost
+
+
+class Admission:
+    def __init__(self):
+        self.enabled = True
+        self.user_rate = DEFAULT_USER_RATE
+        self.user_burst = DEFAULT_USER_BURST
+        self.global_rate = DEFAULT_GLOBAL_RATE
+        self.global_burst = DEFAULT_GLOBAL_RATE * 5
+        self.backend = MemoryBackend()
+
+    def init_app(self, app):
+        cfg = app.config
+        self.enabled = bool(cfg.get('ADMISSION_ENABLED', True))
+        self.user_rate = float(cfg.get('ADMISSION_USER_RATE') or DEFAULT_USER_RATE)
+        self.user_burst = float(cfg.get('ADMISSION_USER_BURST') or DEFAULT_USER_BURST)
+        self.global_rate = float(cfg.get('ADMISSION_GLOBAL_RATE') or DEFAULT_GLOBAL_RATE)
+        self.global_burst = float(cfg.get('ADMISSION_GLOBAL_BURST') or self.global_rate * 5)
+        name = cfg.get('ADMISSION_BACKEND') or 'sqlite'
+        if name not in BACKENDS:
+            raise ValueError(f'ADMISSION_BACKEND: неизвестный бэкенд {name!r} ({"|".join(BACKENDS)})')
+        self.backend = BACKENDS[name](cfg)
+
+    def _buckets(self) -> Tuple[Bucket, ...]:
+        if current_user.is_authenticated:
+            who = f'u:{current_user.id}'
+        else:
+            who = f'ip:{request.remote_addr}'
+        return ((who, self.user_rate, self.user_burst),
+                ('global', self.global_rate, self.global_burst))
+
+    def admit(self, cost: float) -> float:
+        """
+        Списывает cost; 0 — допущен, иначе Retry-After в секундах или
+        TOO_EXPENSIVE, если cost больше ёмкости какого-то из вёдер.
+        """
+        buckets = self._buckets()
+        if cost > min(b for _, _, b in buckets):
+            return TOO_EXPENSIVE
+        try:
+            return self.backend.take(buckets, cost, time.time())
+        except Exception:
+            current_app.logger.exception('admission: бэкенд недоступен, запрос пропущен')
+            return 0.0
+
+    def _reject(self, wait: float):
+        if wait == TOO_EXPENSIVE:
+            retry = None
+            msg = 'Запрос слишком тяжёлый для синхронной обработки — отправьте его фоновой задачей (/api/v1/jobs)'
+        else:
+            retry = str(max(1, math.ceil(wait)))
+            msg = f'Слишком много тяжёлых запросов, повторите через {retry} с'
+        if request.path.startswith('/api/'):
+            resp = jsonify({'error': msg})
+            resp.status_code = 429
+        elif request.accept_mimetypes.quality('text/html') > request.accept_mimetypes.quality('application/json'):
+            # браузер (text/html важнее JSON; */* от curl и скриптов — нет):
+            # снова GET той же страницы, сообщение — во flash
+            flash(msg, 'warning')
+            return redirect(request.full_path if request.query_string else request.path, code=303)
+        else:
+            resp = Response(msg, status=429, mimetype='text/plain')
+        if retry:
+            resp.headers['Retry-After'] = retry
+        return resp
+
+    def limit(self, cost: Union[float, Callable[[], float]]):
+        """Декоратор вьюхи: POST стоит cost единиц (число или функция от запроса)."""
+        def deco(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'POST':
+                    return view(*args, **kwargs)
+                price = cost() if callable(cost) else cost
+                wait = self.admit(price)
+                labels = _labelstr({'endpoint': request.endpoint, 'result': 'rejected' if wait else 'admitted'})
+                metrics.inc('cryptolab_admission_total', labels)
+                if wait:
+                    return self._reject(wait)
+                metrics.inc('cryptolab_admission_cost_total', _labelstr({'endpoint': request.endpoint}), price)
+                return view(*args, **kwargs)
+            return wrapper
+        return deco
+
+
+admission = Admission()
+
+metrics.counter('cryptolab_admission_total', 'Дорогие запросы по endpoint: admitted/rejected (429)')
+metrics.counter('cryptolab_admission_cost_total', 'Списано единиц стоимости по endpoint')
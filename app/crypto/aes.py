@@ -2,17 +2,220 @@ from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 from Crypto.Random import get_random_bytes
 import base64
+import struct
+from itertools import chain
+from typing import BinaryIO, Iterable, Iterator, Tuple
+
+from ..metrics import instrument
 
 # Демонстрация AES-CBC (учебный пример)
+@instrument('aes', 'encrypt_cbc')
 def encrypt_cbc(text: str, key: bytes):
     iv = get_random_bytes(16)
     cipher = AES.new(key, AES.MODE_CBC, iv)
     ct = cipher.encrypt(pad(text.encode('utf-8'), AES.block_size))
     return base64.b64encode(iv + ct).decode('utf-8')
 
+@instrument('aes', 'decrypt_cbc')
 def decrypt_cbc(b64: str, key: bytes):
     raw = base64.b64decode(b64)
     iv, ct = raw[:16], raw[16:]
     cipher = AES.new(key, AES.MODE_CBC, iv)
     pt = unpad(cipher.decrypt(ct), AES.block_size)
     return pt.decode('utf-8')
+
+
+# ===== Потоковое шифрование файлов =====
+#
+# Бинарный контейнер (вместо Base64):
+#   magic b"CLAB" | версия (1) | режим (1) | длина IV/nonce (1) | IV/nonce | тело
+# CBC/CTR (версия 1): тело — сплошной шифртекст.
+# GCM (версия 2): тело — сегменты «длина шифртекста (4) | шифртекст | тег (16)»
+# по STREAM_CHUNK байт открытого текста. nonce сегмента = префикс (8 байт
+# из заголовка) || номер сегмента (4); в AAD — заголовок, номер и флаг
+# «последний». Каждый сегмент проверяется до того, как его открытый текст
+# отдаётся дальше; перестановка и обрезка сегментов ловятся тегом.
+
+STREAM_MAGIC = b"CLAB"
+STREAM_VERSION = 1
+STREAM_GCM_VERSION = 2
+STREAM_CHUNK = 64 * 1024
+STREAM_MODES = {'cbc': 1, 'ctr': 2, 'gcm': 3}
+_MODE_NAMES = {v: k for k, v in STREAM_MODES.items()}
+_GCM_TAG = 16
+_HEADER_FIXED = len(STREAM_MAGIC) + 3
+_IV_LEN = {'cbc': 16, 'ctr': 8, 'gcm': 8}
+
+
+def read_chunks(stream: BinaryIO, size: int = STREAM_CHUNK) -> Iterator[bytes]:
+    """Читает файловый объект кусками фиксированного размера."""
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def rechunk(chunks: Iterable[bytes], size: int) -> Iterator[bytes]:
+    """Перекладывает поток в куски ровно по size байт (последний — короче)."""
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        while len(buf) >= size:
+            yield bytes(buf[:size])
+            del buf[:size]
+    if buf:
+        yield bytes(buf)
+
+
+def lookahead(chunks: Iterable[bytes]) -> Iterator[Tuple[bytes, bool]]:
+    """(кусок, последний ли) — пустой вход даёт один пустой последний кусок."""
+    it = iter(chunks)
+    prev = next(it, b"")
+    for cur in it:
+        yield prev, False
+        prev = cur
+    yield prev, True
+
+
+def _new_cipher(mode: str, key: bytes, iv: bytes):
+    if mode == 'cbc':
+        return AES.new(key, AES.MODE_CBC, iv)
+    return AES.new(key, AES.MODE_CTR, nonce=iv)
+
+
+def _segment_cipher(key: bytes, header: bytes, prefix: bytes, index: int, last: bool):
+    cipher = AES.new(key, AES.MODE_GCM, nonce=prefix + struct.pack(">I", index))
+    cipher.update(header + struct.pack(">IB", index, 1 if last else 0))
+    return cipher
+
+
+def encrypt_stream(chunks: Iterable[bytes], key: bytes, mode: str = 'cbc') -> Iterator[bytes]:
+    """Шифрует поток кусков; в памяти держится не больше одного куска + блок."""
+    if mode not in STREAM_MODES:
+        raise ValueError(f'Неизвестный режим AES: {mode}')
+    iv = get_random_bytes(_IV_LEN[mode])
+    version = STREAM_GCM_VERSION if mode == 'gcm' else STREAM_VERSION
+    header = STREAM_MAGIC + struct.pack(">BBB", version, STREAM_MODES[mode], len(iv)) + iv
+
+    if mode == 'gcm':
+        AES.new(key, AES.MODE_GCM)  # неверная длина ключа — до первого байта ответа
+        yield header
+        for index, (chunk, last) in enumerate(lookahead(rechunk(chunks, STREAM_CHUNK))):
+            ct, tag = _segment_cipher(key, header, iv, index, last).encrypt_and_digest(chunk)
+            yield struct.pack(">I", len(ct)) + ct + tag
+        return
+
+    cipher = _new_cipher(mode, key, iv)
+    yield header
+    tail = b""  # CBC: недобранный до блока хвост
+    for chunk in chunks:
+        if mode != 'cbc':
+            yield cipher.encrypt(chunk)
+            continue
+        data = tail + chunk
+        cut = len(data) - len(data) % AES.block_size
+        tail = data[cut:]
+        if cut:
+            yield cipher.encrypt(data[:cut])
+
+    if mode == 'cbc':
+        yield cipher.encrypt(pad(tail, AES.block_size))
+
+
+def _decrypt_segments(it: Iterator[bytes], buf: bytes, key: bytes, header: bytes) -> Iterator[bytes]:
+    prefix = header[_HEADER_FIXED:]
+    data = bytearray(buf)
+
+    def need(n: int) -> bool:
+        while len(data) < n:
+            chunk = next(it, None)
+            if chunk is None:
+                return False
+            data.extend(chunk)
+        return True
+
+    def take(n: int) -> bytes:
+        out = bytes(data[:n])
+        del data[:n]
+        return out
+
+    index = 0
+    while True:
+        if not need(4):
+            raise ValueError('Контейнер обрезан: нет последнего сегмента')
+        (clen,) = struct.unpack(">I", take(4))
+        if clen > STREAM_CHUNK:
+            raise ValueError('Повреждён контейнер: сегмент больше допустимого')
+        if not need(clen + _GCM_TAG):
+            raise ValueError('Контейнер обрезан')
+        ct, tag = take(clen), take(_GCM_TAG)
+        # последний сегмент — если после него данных нет
+        last = not need(1)
+        try:
+            pt = _segment_cipher(key, header, prefix, index, last).decrypt_and_verify(ct, tag)
+        except ValueError:
+            raise ValueError('Проверка целостности (GCM tag) не пройдена: неверный ключ или данные изменены')
+        yield pt
+        if last:
+            return
+        index += 1
+
+
+def decrypt_stream(chunks: Iterable[bytes], key: bytes) -> Iterator[bytes]:
+    """
+    Обратное к encrypt_stream; режим берётся из заголовка.
+    Ошибки формата/паддинга/тега — ValueError. GCM отдаёт только
+    проверенные сегменты; для CBC ошибка паддинга (в т.ч. от неверного
+    ключа) видна лишь на последнем блоке, CTR целостность не проверяет —
+    кому нужен ответ «всё или ничего», расшифровывает во временный файл
+    (см. _aes_stream_response в views/main.py).
+    """
+    it = iter(chunks)
+    buf = b""
+    while len(buf) < _HEADER_FIXED:
+        chunk = next(it, None)
+        if chunk is None:
+            raise ValueError('Обрезан заголовок контейнера')
+        buf += chunk
+    if buf[:len(STREAM_MAGIC)] != STREAM_MAGIC:
+        raise ValueError('Это не контейнер CryptoLab AES')
+    version, mode_id, iv_len = struct.unpack(">BBB", buf[len(STREAM_MAGIC):_HEADER_FIXED])
+    if mode_id not in _MODE_NAMES:
+        raise ValueError(f'Неизвестный режим в контейнере: {mode_id}')
+    mode = _MODE_NAMES[mode_id]
+    expected = STREAM_GCM_VERSION if mode == 'gcm' else STREAM_VERSION
+    if version != expected:
+        raise ValueError(f'Неподдерживаемая версия контейнера {mode.upper()}: {version}')
+    if iv_len != _IV_LEN[mode]:
+        raise ValueError('Повреждён заголовок контейнера')
+    while len(buf) < _HEADER_FIXED + iv_len:
+        chunk = next(it, None)
+        if chunk is None:
+            raise ValueError('Обрезан заголовок контейнера')
+        buf += chunk
+    header, buf = buf[:_HEADER_FIXED + iv_len], buf[_HEADER_FIXED + iv_len:]
+    if mode == 'gcm':
+        AES.new(key, AES.MODE_GCM)  # проверка длины ключа
+        yield from _decrypt_segments(it, buf, key, header)
+        return
+    cipher = _new_cipher(mode, key, header[_HEADER_FIXED:])
+
+    # CBC: удерживаем последний блок (паддинг)
+    hold = AES.block_size if mode == 'cbc' else 0
+    pending = b""
+    for chunk in chain([buf], it):
+        pending += chunk
+        cut = len(pending) - hold
+        if mode == 'cbc':
+            cut -= cut % AES.block_size
+        if cut > 0:
+            yield cipher.decrypt(pending[:cut])
+            pending = pending[cut:]
+
+    if mode == 'cbc':
+        if len(pending) != AES.block_size:
+            raise ValueError('Длина шифртекста CBC не кратна блоку')
+        yield unpad(cipher.decrypt(pending), AES.block_size)
+    elif pending:
+        yield cipher.decrypt(pending)
@@ -0,0 +1,251 @@
+# app/crypto/analysis.py
+# -*- coding: utf-8 -*-
+"""
+Криптоанализ классических шифров: частотные таблицы RU/EN, хи-квадрат,
+перебор сдвигов Цезаря, подбор ключа Виженера.
+
+Текст сворачивается один раз — в вектор частот букв алфавита. Сдвиг Цезаря
+лишь поворачивает этот вектор, поэтому все кандидаты оцениваются на
+векторах длины 26/33 без повторного прохода по тексту. Сам текст
+расшифровывается только для превью (str.translate).
+"""
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .caesar import RU_LOWER, EN_LOWER, caesar_decrypt
+from .vigenere import vigenere
+from ..metrics import instrument
+
+# Частоты букв, % (классические таблицы для английского и русского)
+EN_FREQ = {
+    'a': 8.167, 'b': 1.492, 'c': 2.782, 'd': 4.253, 'e': 12.702, 'f': 2.228,
+    'g': 2.015, 'h': 6.094, 'i': 6.966, 'j': 0.153, 'k': 0.772, 'l': 4.025,
+    'm': 2.406, 'n': 6.749, 'o': 7.507, 'p': 1.929, 'q': 0.095, 'r': 5.987,
+    's': 6.327, 't': 9.056, 'u': 2.758, 'v': 0.978, 'w': 2.360, 'x': 0.150,
+    'y': 1.974, 'z': 0.074,
+}
+RU_FREQ = {
+    'о': 10.97, 'е': 8.45, 'а': 8.01, 'и': 7.35, 'н': 6.70, 'т': 6.26, 'с': 5.47,
+    'р': 4.73, 'в': 4.54, 'л': 4.40, 'к': 3.49, 'м': 3.21, 'д': 2.98, 'п': 2.81,
+    'у': 2.62, 'я': 2.01, 'ы': 1.90, 'ь': 1.74, 'г': 1.70, 'з': 1.65, 'б': 1.59,
+    'ч': 1.44, 'й': 1.21, 'х': 0.97, 'ж': 0.94, 'ш': 0.73, 'ю': 0.64, 'ц': 0.48,
+    'щ': 0.36, 'э': 0.32, 'ф': 0.26, 'ъ': 0.04, 'ё': 0.04,
+}
+
+ALPHABETS = {'ru': RU_LOWER, 'en': EN_LOWER}
+# Вероятности в порядке алфавита (сумма = 1)
+PROBS = {
+    lang: [freq[ch] / sum(freq.values()) for ch in ALPHABETS[lang]]
+    for lang, freq in (('ru', RU_FREQ), ('en', EN_FREQ))
+}
+
+PREVIEW_LEN = 200
+
+
+def letter_counts(text: str, lang: str) -> List[int]:
+    """Вектор количеств букв алфавита lang (регистр не важен)."""
+    # str.count на каждую букву — 26/33 прохода на C, быстрее Counter по символам
+    low = text.lower()
+    return [low.count(ch) for ch in ALPHABETS[lang]]
+
+
+def detect_lang(text: str) -> str:
+    """'ru' или 'en' — каких букв в тексте больше."""
+    ru = sum(letter_counts(text, 'ru'))
+    en = sum(letter_counts(text, 'en'))
+    return 'ru' if ru > en else 'en'
+
+
+def chi_squared(counts: Sequence[int], probs: Sequence[float], shift: int = 0) -> float:
+    """
+    χ² наблюдаемых количеств против ожидаемых частот.
+    shift — считать, что буква i открытого текста лежит в counts[i + shift].
+    """
+    total = sum(counts)
+    if not total:
+        return float('inf')
+    n = len(counts)
+    chi = 0.0
+    for i, p in enumerate(probs):
+        expected = total * p
+        d = counts[(i + shift) % n] - expected
+        chi += d * d / expected
+    return chi
+
+
+def index_of_coincidence(counts: Sequence[int]) -> float:
+    """Индекс совпадений по вектору количеств."""
+    total = sum(counts)
+    if total < 2:
+        return 0.0
+    return sum(c * (c - 1) for c in counts) / (total * (total - 1))
+
+
+class CaesarCandidate(NamedTuple):
+    shift: int
+    chi2: float
+    preview: str
+
+
+@instrument('caesar', 'bruteforce')
+def caesar_bruteforce(text: str, lang: str = 'auto', top: Optional[int] = None,
+                      preview_len: int = PREVIEW_LEN) -> List[CaesarCandidate]:
+    """
+    Все сдвиги Цезаря, отсортированные по χ² (лучший — первый).
+    Превью — расшифровка первых preview_len символов текста.
+    """
+    if lang not in ALPHABETS:
+        lang = detect_lang(text)
+    counts = letter_counts(text, lang)
+    probs = PROBS[lang]
+    scored = sorted((chi_squared(counts, probs, k), k) for k in range(len(probs)))
+    if top:
+        scored = scored[:top]
+    head = text[:preview_len]
+    return [CaesarCandidate(k, chi, caesar_decrypt(head, k)) for chi, k in scored]
+
+
+def caesar_crack(text: str, lang: str = 'auto') -> Dict[str, object]:
+    """Лучший сдвиг и полная расшифровка."""
+    best = caesar_bruteforce(text, lang, top=1, preview_len=0)[0]
+    return {'shift': best.shift, 'chi2': best.chi2, 'plaintext': caesar_decrypt(text, best.shift)}
+
+
+# ===== Виженер: Касиски + индекс совпадений + частоты по столбцам =====
+#
+# Как и в vigenere(), ключ продвигается только на буквах RU/EN, поэтому
+# анализ идёт по «буквенному потоку» текста без пробелов и знаков.
+# Подсчёты — str.count по буквам столбца letters[p::L].
+
+LANG_IC = {'ru': 0.0553, 'en': 0.0667}
+MAX_KEY_LEN = 24
+# Ниже этого объёма процессы дороже самой работы — считаем в текущем
+PARALLEL_MIN_LETTERS = 20000
+
+_NOT_LETTER_RE = re.compile('[^' + re.escape(RU_LOWER + EN_LOWER) + ']+')
+
+
+def letter_stream(text: str) -> str:
+    """Только буквы RU/EN в нижнем регистре — ровно те, что двигают ключ."""
+    return _NOT_LETTER_RE.sub('', text.lower())
+
+
+def _column_counts(letters: str, length: int, lang: str) -> List[List[int]]:
+    return [letter_counts(letters[p::length], lang) for p in range(length)]
+
+
+def kasiski_factors(letters: str, max_len: int = MAX_KEY_LEN, ngram: int = 3) -> Dict[int, int]:
+    """
+    Касиски: расстояния между соседними повторами n-грамм,
+    для каждой длины ключа — сколько расстояний на неё делится.
+    """
+    last: Dict[str, int] = {}
+    votes = {k: 0 for k in range(2, max_len + 1)}
+    for i in range(len(letters) - ngram + 1):
+        g = letters[i:i + ngram]
+        j = last.get(g)
+        if j is not None:
+            dist = i - j
+            for k in votes:
+                if dist % k == 0:
+                    votes[k] += 1
+        last[g] = i
+    return votes
+
+
+def average_ic(letters: str, length: int, lang: str) -> float:
+    """Средний индекс совпадений по столбцам для длины ключа length."""
+    cols = _column_counts(letters, length, lang)
+    return sum(index_of_coincidence(c) for c in cols) / length
+
+
+def candidate_lengths(letters: str, lang: str, max_len: int = MAX_KEY_LEN, top: int = 6) -> List[int]:
+    """Короткий список длин ключа: лучшие по IC и лучшие по Касиски."""
+    max_len = max(1, min(max_len, len(letters) // 2))
+    target = LANG_IC[lang]
+    by_ic = sorted(range(1, max_len + 1), key=lambda L: abs(average_ic(letters, L, lang) - target))
+    votes = kasiski_factors(letters, max_len)
+    by_kasiski = sorted((k for k, v in votes.items() if v), key=lambda k: -votes[k] * k)
+    out: List[int] = []
+    for L in by_ic[:top] + by_kasiski[:top]:
+        if L not in out:
+            out.append(L)
+    return out
+
+
+def _solve_length(args) -> Tuple[float, str]:
+    """(сумма χ² по столбцам, ключ) для заданной длины — частотами по столбцам."""
+    letters, length, lang = args
+    alph = ALPHABETS[lang]
+    probs = PROBS[lang]
+    total = 0.0
+    key = []
+    for counts in _column_counts(letters, length, lang):
+        chi, shift = min((chi_squared(counts, probs, k), k) for k in range(len(alph)))
+        if chi != float('inf'):
+            total += chi
+        key.append(alph[shift])
+    return total, ''.join(key)
+
+
+def _shortest_period(key: str) -> str:
+    """«keykey» -> «key»: кратные длины дают повторённый ключ."""
+    n = len(key)
+    for p in range(1, n):
+        if n % p == 0 and key[:p] * (n // p) == key:
+            return key[:p]
+    return key
+
+
+def _near_repeat(key: str, base: str, threshold: float = 0.75) -> bool:
+    if len(key) <= len(base) or len(key) % len(base):
+        return False
+    rep = base * (len(key) // len(base))
+    return sum(a == b for a, b in zip(key, rep)) >= threshold * len(key)
+
+
+class VigenereCandidate(NamedTuple):
+    key: str
+    score: float
+    preview: str
+
+
+@instrument('vigenere', 'break')
+def vigenere_break(text: str, lang: str = 'auto', top: int = 3, max_len: int = MAX_KEY_LEN,
+                   workers: Optional[int] = None,
+                   preview_len: int = PREVIEW_LEN) -> List[VigenereCandidate]:
+    """
+    Подбор ключа Виженера. Возвращает top лучших ключей (меньше score — лучше)
+    с превью расшифровки. Длины-кандидаты решаются в ProcessPoolExecutor,
+    если текст большой и workers != 1.
+    """
+    if lang not in ALPHABETS:
+        lang = detect_lang(text)
+    letters = letter_stream(text)
+    if not letters:
+        return []
+    jobs = [(letters, L, lang) for L in candidate_lengths(letters, lang, max_len)]
+    if workers != 1 and len(letters) >= PARALLEL_MIN_LETTERS and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            solved = list(pool.map(_solve_length, jobs))
+    else:
+        solved = [_solve_length(j) for j in jobs]
+
+    best: Dict[str, float] = {}
+    for score, key in solved:
+        key = _shortest_period(key)
+        if key not in best or score < best[key]:
+            best[key] = score
+
+    ranked: List[Tuple[str, float]] = []
+    for key, score in sorted(best.items(), key=lambda kv: kv[1]):
+        # кратная длина с почти тем же ключом — шум от лишних столбцов
+        if any(_near_repeat(key, k) for k, _ in ranked):
+            continue
+        ranked.append((key, score))
+        if len(ranked) >= top:
+            break
+    head = text[:preview_len]
+    return [VigenereCandidate(k, s, vigenere(head, k, encrypt=False)) for k, s in ranked]
@@ -0,0 +1,243 @@
+# app/crypto/bench.py
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарки пакета app/crypto с базовой линией (JSON).
+
+Каждый случай — (алгоритм, алфавит, ключ, размер входа). Для каждого
+считается лучшее время одного вызова по нескольким повторам (ops/s, MB/s)
+и отдельным прогоном под tracemalloc — пик выделенной памяти.
+Вход генерируется заранее и в замер не входит.
+
+compare() сравнивает прогон с сохранённой базовой линией: случай
+регрессировал, если ops/s упал больше чем на threshold (доля).
+"""
+
+import json
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .aes import encrypt_cbc
+from .caesar import RU_LOWER, EN_LOWER, caesar_encrypt
+from .playfair import playfair_encrypt
+from .railfence import railfence_decrypt, _getters
+from .rc4 import rc4_encrypt
+from .rsa import generate_keypair_pem, rsa_encrypt_b64
+from .vigenere import vigenere
+
+KB = 1024
+MB = 1024 * KB
+DEFAULT_SIZES = (1 * KB, 64 * KB, 1 * MB, 10 * MB)
+QUICK_SIZES = (1 * KB, 64 * KB)
+ALPHABETS = ('en', 'ru', 'mixed')
+# Повторяем замер, пока суммарно не наберётся столько секунд (или MAX_REPEATS)
+MIN_TIME = 0.2
+MAX_REPEATS = 50
+DEFAULT_THRESHOLD = 0.2
+# OAEP(SHA-256) для RSA-2048 вмещает не больше 190 байт
+RSA_MESSAGE = 190
+
+
+class Case(NamedTuple):
+    algo: str
+    alphabet: str
+    key: str                            # описание ключа для отчёта
+    size: int                           # целевой размер входа, байт UTF-8
+    fn: Callable[[], object]
+    setup: Optional[Callable[[], None]] = None  # перед каждым вызовом, не замеряется
+    nbytes: int = 0                     # фактический размер входа
+
+    @property
+    def id(self) -> str:
+        return f'{self.algo}/{self.alphabet}/{self.key}/{self.size}'
+
+
+class Result(NamedTuple):
+    id: str
+    algo: str
+    alphabet: str
+    key: str
+    size: int
+    bytes: int
+    repeats: int
+    seconds: float
+    ops_per_s: float
+    mb_per_s: float
+    peak_kib: float
+
+
+# ===== Входные данные =====
+
+def sample_text(size: int, alphabet: str, seed: int = 1) -> str:
+    """Псевдотекст из «слов» нужного алфавита размером ~size байт UTF-8."""
+    rnd = random.Random(f'{seed}:{alphabet}:{size}')
+    letters = {'en': EN_LOWER, 'ru': RU_LOWER, 'mixed': EN_LOWER + RU_LOWER}[alphabet]
+    # кириллица занимает 2 байта в UTF-8
+    per_char = {'en': 1.0, 'ru': 1.85, 'mixed': 1.45}[alphabet]
+    words = [''.join(rnd.choices(letters, k=rnd.randint(2, 9))) for _ in range(512)]
+    out, n = [], 0
+    target = int(size / per_char)
+    while n < target:
+        w = rnd.choice(words)
+        if rnd.random() < 0.1:
+            w = w.capitalize()
+        out.append(w)
+        n += len(w) + 1
+    text = ' '.join(out)[:target]
+    return text
+
+
+def _size_label(size: int) -> str:
+    if size >= MB and size % MB == 0:
+        return f'{size // MB}M'
+    if size >= KB and size % KB == 0:
+        return f'{size // KB}K'
+    return str(size)
+
+
+def parse_sizes(spec: str) -> Tuple[int, ...]:
+    """'1K,64K,1M' -> (1024, 65536, 1048576)."""
+    out = []
+    for part in spec.split(','):
+        part = part.strip().upper()
+        if not part:
+            continue
+        mult = {'K': KB, 'M': MB}.get(part[-1], 1)
+        out.append(int(float(part.rstrip('KM')) * mult))
+    return tuple(out)
+
+
+# ===== Случаи =====
+
+def _railfence_cold():
+    # лабы приходят с разной длиной — меряем без тёплого кэша перестановок
+    _getters.cache_clear()
+
+
+def build_cases(sizes: Iterable[int] = DEFAULT_SIZES, alphabets: Iterable[str] = ALPHABETS,
+                only: Optional[Iterable[str]] = None, rsa_bits: Iterable[int] = (2048, 3072, 4096)) -> List[Case]:
+    """Все случаи для заданных размеров/алфавитов; only — фильтр по алгоритму."""
+    only = set(only or ())
+    want = (lambda a: not only or a in only)
+    cases: List[Case] = []
+
+    for size in sizes:
+        for alph in alphabets:
+            text = sample_text(size, alph)
+            nbytes = len(text.encode('utf-8'))
+
+            def add(algo, key, fn, setup=None):
+                if want(algo):
+                    cases.append(Case(algo, alph, key, size, fn, setup, nbytes))
+
+            add('caesar_encrypt', 'shift=3', lambda t=text: caesar_encrypt(t, 3))
+            for k in ('lemon', 'cryptographically', 'k' * 64):
+                add('vigenere', f'len={len(k)}', lambda t=text, k=k: vigenere(t, k))
+            for k in ('Key', 'x' * 16, 'y' * 256):
+                add('rc4_encrypt', f'len={len(k)}', lambda t=text, k=k: rc4_encrypt(t, k))
+            for rails in (3, 10):
+                add('railfence_decrypt', f'rails={rails}',
+                    lambda t=text, r=rails: railfence_decrypt(t, r), _railfence_cold)
+            add('playfair_encrypt', 'keyword', lambda t=text: playfair_encrypt(t, 'keyword'))
+            for n in (16, 24, 32):
+                add('encrypt_cbc', f'aes-{n * 8}', lambda t=text, k=b'k' * n: encrypt_cbc(t, k))
+
+    if want('rsa_encrypt_b64'):
+        msg = sample_text(RSA_MESSAGE, 'en')[:RSA_MESSAGE]
+        for bits in rsa_bits:
+            _, pub = generate_keypair_pem(bits)
+            cases.append(Case('rsa_encrypt_b64', 'en', f'rsa-{bits}', RSA_MESSAGE,
+                              lambda p=pub: rsa_encrypt_b64(msg, p), None, len(msg)))
+    return cases
+
+
+# ===== Замер =====
+
+def measure(case: Case, min_time: float = MIN_TIME, max_repeats: int = MAX_REPEATS,
+            trace: bool = True) -> Result:
+    best = float('inf')
+    total = 0.0
+    repeats = 0
+    while repeats < max_repeats and (repeats == 0 or total < min_time):
+        if case.setup:
+            case.setup()
+        t0 = time.perf_counter()
+        case.fn()
+        dt = time.perf_counter() - t0
+        best = min(best, dt)
+        total += dt
+        repeats += 1
+
+    peak = 0
+    if trace:
+        if case.setup:
+            case.setup()
+        tracemalloc.start()
+        try:
+            case.fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    best = max(best, 1e-9)
+    return Result(case.id, case.algo, case.alphabet, case.key, case.size, case.nbytes, repeats,
+                  best, 1.0 / best, case.nbytes / best / 1e6, peak / 1024)
+
+
+def run(cases: Iterable[Case], progress: Optional[Callable[[Result], None]] = None, **kw) -> List[Result]:
+    out = []
+    for case in cases:
+        res = measure(case, **kw)
+        if progress:
+            progress(res)
+        out.append(res)
+    return out
+
+
+# ===== Базовая линия =====
+
+def save_baseline(path: str, results: List[Result]):
+    data = {
+        'meta': {
+            'created': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+        },
+        'results': {r.id: r._asdict() for r in results},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def load_baseline(path: str) -> Dict[str, dict]:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+class Comparison(NamedTuple):
+    id: str
+    baseline_ops: float
+    current_ops: float
+    ratio: float          # текущий / базовый
+    regressed: bool
+
+
+def compare(results: List[Result], baseline: Dict[str, dict],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Comparison]:
+    """Сравнение по ops/s; случаи без базовой линии пропускаются."""
+    out = []
+    for r in results:
+        base = baseline.get(r.id)
+        if not base or not base.get('ops_per_s'):
+            continue
+        ratio = r.ops_per_s / base['ops_per_s']
+        out.append(Comparison(r.id, base['ops_per_s'], r.ops_per_s, ratio, ratio < 1.0 - threshold))
+    return out
+
+
+def format_result(r: Result) -> str:
+    return (f'{r.algo:<18} {r.alphabet:<6} {r.key:<18} {_size_label(r.size):>5}  '
+            f'{r.ops_per_s:>10.1f} ops/s {r.mb_per_s:>9.2f} MB/s  peak {r.peak_kib:>10.1f} KiB')
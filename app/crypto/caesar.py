@@ -1,11 +1,19 @@
 # app/crypto/caesar.py
 # -*- coding: utf-8 -*-
 
+from functools import lru_cache
+
+from ..metrics import instrument
+
 RU_LOWER = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
 RU_UPPER = RU_LOWER.upper()
 EN_LOWER = "abcdefghijklmnopqrstuvwxyz"
 EN_UPPER = EN_LOWER.upper()
 
+# Размер LRU для скомпилированных таблиц/шифров
+TABLE_CACHE_SIZE = 256
+
+
 def _alphabet_for(ch: str):
     """Вернёт (lower, upper) алфавит под символ или None если не буква."""
     if ch in RU_LOWER or ch in RU_UPPER:
@@ -14,25 +22,61 @@ def _alphabet_for(ch: str):
         return EN_LOWER, EN_UPPER
     return None
 
+
+def _rotate(alph: str, k: int) -> str:
+    k %= len(alph)
+    return alph[k:] + alph[:k]
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def shift_table(k: int) -> dict:
+    """
+    Таблица str.maketrans для сдвига на k по всем четырём алфавитам
+    (RU/EN, оба регистра). Каждый алфавит сдвигается по своему модулю.
+    """
+    src = dst = ""
+    for alph in (RU_LOWER, RU_UPPER, EN_LOWER, EN_UPPER):
+        src += alph
+        dst += _rotate(alph, k)
+    return str.maketrans(src, dst)
+
+
 def _shift_char(ch: str, k: int) -> str:
-    alph = _alphabet_for(ch)
-    if not alph:
-        return ch
-    lower, upper = alph
-    if ch.isupper():
-        idx = upper.index(ch)
-        return upper[(idx + k) % len(upper)]
-    else:
-        idx = lower.index(ch)
-        return lower[(idx + k) % len(lower)]
+    return ch.translate(shift_table(k))
+
 
+class CaesarCipher:
+    """Скомпилированный шифр Цезаря: таблицы считаются один раз на сдвиг."""
+
+    def __init__(self, shift: int):
+        self.shift = shift
+        self._enc = shift_table(shift)
+        self._dec = shift_table(-shift)
+
+    def encrypt(self, text: str) -> str:
+        return text.translate(self._enc)
+
+    def decrypt(self, text: str) -> str:
+        return text.translate(self._dec)
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def get_caesar_cipher(shift: int) -> CaesarCipher:
+    """CaesarCipher из LRU-кэша (ключ — сдвиг)."""
+    return CaesarCipher(shift)
+
+
+@instrument('caesar', 'encrypt')
 def caesar_encrypt(text: str, shift: int) -> str:
     """Сдвиг вправо на shift (RU/EN, сохраняет регистр, небуквы не трогаем)."""
-    return "".join(_shift_char(c, shift) for c in text)
+    return get_caesar_cipher(shift).encrypt(text)
 
+
+@instrument('caesar', 'decrypt')
 def caesar_decrypt(text: str, shift: int) -> str:
     """Обратный сдвиг."""
-    return "".join(_shift_char(c, -shift) for c in text)
+    return get_caesar_cipher(shift).decrypt(text)
+
 
 # ---- Совместимость со старым кодом ----
 def caesar(text: str, shift: int) -> str:
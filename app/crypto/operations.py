@@ -0,0 +1,327 @@
+# app/crypto/operations.py
+# -*- coding: utf-8 -*-
+"""
+Именованные операции над шифрами для JSON API: "caesar.encrypt",
+"rsa.keygen", "pipeline.run" и т.д. Каждая операция — функция
+params(dict) -> JSON-совместимый результат; ошибка в параметрах —
+OperationError (ValueError).
+
+run_batch() выполняет список операций: небольшие пачки — в текущем
+процессе, крупные — в общем пуле процессов (batch_pool), куда уходят только
+(имя, параметры), так что результаты и ошибки возвращаются по каждой
+операции отдельно. Пул создаётся лениво и пересоздаётся после fork; его
+процессы запускаются через forkserver (или spawn), а не fork — копия
+воркера gunicorn с его потоками и соединениями им не нужна.
+"""
+
+import base64
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .aes import encrypt_cbc, decrypt_cbc
+from .analysis import caesar_bruteforce, vigenere_break
+from .caesar import caesar_encrypt, caesar_decrypt
+from .pipeline import Pipeline, BYTES
+from .playfair import playfair_encrypt, playfair_decrypt
+from .railfence import railfence_encrypt, railfence_decrypt
+from .rc4 import rc4_encrypt_b64, rc4_decrypt_b64
+from .rsa import rsa_encrypt_b64, rsa_decrypt_b64, rsa_hybrid_encrypt_b64, rsa_hybrid_decrypt_b64
+from .rsa_pool import key_pool, SUPPORTED_BITS
+from .sha256util import sha256_hex
+from .vigenere import vigenere
+
+# Лимит на один текстовый параметр (символов)
+MAX_OP_TEXT = 100_000
+# Операций в одном /batch
+MAX_BATCH = 500
+# Тяжёлых операций (до секунды CPU и больше каждая) в одном /batch:
+# пачка выполняется синхронно и должна уложиться в таймаут воркера,
+# остальное — фоновыми задачами (POST /api/v1/jobs)
+HEAVY_OPS = ('rsa.keygen', 'vigenere.break')
+MAX_BATCH_HEAVY = 4
+# Ключи длиннее — только фоновой задачей
+MAX_BATCH_RSA_BITS = 2048
+# Меньше этого — пул процессов дороже самой работы
+PARALLEL_MIN_OPS = 16
+DEFAULT_WORKERS = 2
+# Метод запуска процессов пула: fork из многопоточного процесса может
+# унаследовать захваченные блокировки (логирование, пулы соединений)
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class OperationError(ValueError):
+    """Неверное имя операции или параметры."""
+
+
+# ===== Разбор параметров =====
+
+def _text(p: dict, name: str = 'text') -> str:
+    v = p.get(name)
+    if not isinstance(v, str):
+        raise OperationError(f'параметр {name}: ожидается строка')
+    if len(v) > MAX_OP_TEXT:
+        raise OperationError(f'параметр {name}: длиннее {MAX_OP_TEXT} символов')
+    return v
+
+
+def _int(p: dict, name: str, default: Optional[int] = None, lo: int = None, hi: int = None) -> int:
+    v = p.get(name, default)
+    if isinstance(v, bool) or not isinstance(v, int):
+        raise OperationError(f'параметр {name}: ожидается целое число')
+    if (lo is not None and v < lo) or (hi is not None and v > hi):
+        raise OperationError(f'параметр {name}: допустимо {lo}..{hi}')
+    return v
+
+
+def _key(p: dict, name: str = 'key') -> str:
+    v = _text(p, name)
+    if not v:
+        raise OperationError(f'параметр {name}: пустой ключ')
+    return v
+
+
+def _aes_key(p: dict) -> bytes:
+    key = _key(p).encode('utf-8')
+    if len(key) not in (16, 24, 32):
+        raise OperationError('параметр key: AES-ключ должен быть 16/24/32 байта')
+    return key
+
+
+# ===== Операции =====
+
+OPERATIONS: Dict[str, Callable[[dict], object]] = {}
+
+
+def operation(name: str):
+    def deco(fn):
+        OPERATIONS[name] = fn
+        return fn
+    return deco
+
+
+@operation('caesar.encrypt')
+def _caesar_encrypt(p):
+    return caesar_encrypt(_text(p), _int(p, 'shift', 3))
+
+
+@operation('caesar.decrypt')
+def _caesar_decrypt(p):
+    return caesar_decrypt(_text(p), _int(p, 'shift', 3))
+
+
+@operation('caesar.bruteforce')
+def _caesar_bruteforce(p):
+    cands = caesar_bruteforce(_text(p), p.get('lang', 'auto'), top=_int(p, 'top', 5, 1, 33))
+    return [c._asdict() for c in cands]
+
+
+@operation('vigenere.encrypt')
+def _vigenere_encrypt(p):
+    return vigenere(_text(p), _key(p), encrypt=True)
+
+
+@operation('vigenere.decrypt')
+def _vigenere_decrypt(p):
+    return vigenere(_text(p), _key(p), encrypt=False)
+
+
+@operation('vigenere.break')
+def _vigenere_break(p):
+    cands = vigenere_break(_text(p), p.get('lang', 'auto'), top=_int(p, 'top', 3, 1, 10),
+                           max_len=_int(p, 'max_len', 24, 1, 64), workers=1)
+    return [c._asdict() for c in cands]
+
+
+@operation('playfair.encrypt')
+def _playfair_encrypt(p):
+    return playfair_encrypt(_text(p), _key(p))
+
+
+@operation('playfair.decrypt')
+def _playfair_decrypt(p):
+    return playfair_decrypt(_text(p), _key(p))
+
+
+@operation('railfence.encrypt')
+def _railfence_encrypt(p):
+    return railfence_encrypt(_text(p), _int(p, 'rails', 3, 2, 1000), _int(p, 'offset', 0, 0))
+
+
+@operation('railfence.decrypt')
+def _railfence_decrypt(p):
+    return railfence_decrypt(_text(p), _int(p, 'rails', 3, 2, 1000), _int(p, 'offset', 0, 0))
+
+
+@operation('rc4.encrypt')
+def _rc4_encrypt(p):
+    return rc4_encrypt_b64(_text(p), _key(p))
+
+
+@operation('rc4.decrypt')
+def _rc4_decrypt(p):
+    return rc4_decrypt_b64(_text(p), _key(p))
+
+
+@operation('aes.encrypt')
+def _aes_encrypt(p):
+    return encrypt_cbc(_text(p), _aes_key(p))
+
+
+@operation('aes.decrypt')
+def _aes_decrypt(p):
+    return decrypt_cbc(_text(p), _aes_key(p))
+
+
+@operation('rsa.keygen')
+def _rsa_keygen(p):
+    bits = _int(p, 'bits', 2048)
+    if bits not in SUPPORTED_BITS:
+        raise OperationError(f'параметр bits: допустимо {", ".join(map(str, SUPPORTED_BITS))}')
+    priv, pub = key_pool.get_pem(bits)
+    return {'private_pem': priv, 'public_pem': pub}
+
+
+@operation('rsa.encrypt')
+def _rsa_encrypt(p):
+    fn = rsa_hybrid_encrypt_b64 if p.get('scheme') == 'hybrid' else rsa_encrypt_b64
+    return fn(_text(p), _text(p, 'public_pem'))
+
+
+@operation('rsa.decrypt')
+def _rsa_decrypt(p):
+    fn = rsa_hybrid_decrypt_b64 if p.get('scheme') == 'hybrid' else rsa_decrypt_b64
+    return fn(_text(p), _text(p, 'private_pem'))
+
+
+@operation('sha256.hash')
+def _sha256(p):
+    return sha256_hex(_text(p))
+
+
+@operation('pipeline.run')
+def _pipeline(p):
+    pipe = Pipeline.from_spec(p.get('spec'), decrypt=bool(p.get('decrypt')))
+    data = _text(p)
+    # байты на входе/выходе передаются в Base64
+    if pipe.input_type == BYTES:
+        data = base64.b64decode(data, validate=True)
+    out = pipe.apply(data)
+    return base64.b64encode(out).decode('ascii') if pipe.output_type == BYTES else out
+
+
+# ===== Выполнение =====
+
+def run_op(name: str, params: dict) -> object:
+    fn = OPERATIONS.get(name)
+    if fn is None:
+        raise OperationError(f'неизвестная операция {name!r}')
+    if not isinstance(params, dict):
+        raise OperationError('params: ожидается объект')
+    return fn(params)
+
+
+def _run_item(item: Tuple[str, dict]) -> dict:
+    """Одна операция пачки -> {"ok": true, "result": ...} | {"ok": false, "error": ...}."""
+    name, params = item
+    try:
+        return {'ok': True, 'result': run_op(name, params)}
+    except ValueError as e:
+        return {'ok': False, 'error': str(e)}
+    except Exception as e:
+        # пачка не должна падать из-за одной операции
+        return {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+
+def _init_worker():
+    # генерация RSA в воркере — на месте, без собственного фонового пула
+    key_pool.depth = 0
+
+
+class BatchPool:
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """API_BATCH_WORKERS из конфига: 0 — всё в текущем процессе."""
+        self.workers = int(app.config.get('API_BATCH_WORKERS', self.workers))
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        pid = os.getpid()
+        with self._lock:
+            if self._pool is None or self._pid != pid:
+                # после fork пул родителя не наш — заводим свой
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(START_METHOD),
+                                                 initializer=_init_worker)
+                self._pid = pid
+            return self._pool
+
+    def _discard(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def map(self, items: List[Tuple[str, dict]]) -> List[dict]:
+        pool = self._executor() if len(items) >= PARALLEL_MIN_OPS else None
+        if pool is None:
+            return [_run_item(it) for it in items]
+        chunksize = max(1, len(items) // (self.workers * 4))
+        try:
+            return list(pool.map(_run_item, items, chunksize=chunksize))
+        except BrokenProcessPool:
+            # упавший воркер: пул пересоздастся при следующей пачке. Пачку
+            # в текущем процессе не повторяем — если воркер уронила одна из
+            # операций (память, рекурсия), она уронила бы и воркер gunicorn
+            self._discard(pool)
+            return [{'ok': False, 'error': 'процесс пула завершился аварийно, пачка не выполнена'}
+                    for _ in items]
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+batch_pool = BatchPool()
+
+
+def run_batch(ops: List[dict]) -> List[dict]:
+    """
+    ops — [{"op": "caesar.encrypt", "params": {...}}, ...].
+    Результаты в том же порядке; ошибки — по каждой операции.
+    """
+    if len(ops) > MAX_BATCH:
+        raise OperationError(f'не больше {MAX_BATCH} операций в пачке')
+    items = []
+    for op in ops:
+        if not isinstance(op, dict):
+            items.append(('', {}))
+            continue
+        items.append((op.get('op') or '', op.get('params') or {}))
+    _check_heavy(items)
+    return batch_pool.map(items)
+
+
+def _check_heavy(items: List[Tuple[str, dict]]):
+    heavy = [(name, params) for name, params in items if name in HEAVY_OPS]
+    if len(heavy) > MAX_BATCH_HEAVY:
+        raise OperationError(f'не больше {MAX_BATCH_HEAVY} операций {", ".join(HEAVY_OPS)} в пачке, '
+                             'остальные — фоновыми задачами (POST /api/v1/jobs)')
+    for name, params in heavy:
+        try:
+            bits = _int(params, 'bits', 2048) if name == 'rsa.keygen' and isinstance(params, dict) else 0
+        except OperationError:
+            continue  # ошибка параметров — в результате самой операции
+        if bits > MAX_BATCH_RSA_BITS:
+            raise OperationError(f'rsa.keygen длиннее {MAX_BATCH_RSA_BITS} бит — только фоновой задачей (POST /api/v1/jobs)')
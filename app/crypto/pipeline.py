@@ -0,0 +1,379 @@
+# app/crypto/pipeline.py
+# -*- coding: utf-8 -*-
+"""
+Составные шифры: реестр шифров и потоковый конвейер поверх app/crypto.
+
+Конвейер описывается JSON-спецификацией — списком стадий:
+
+    [{"cipher": "vigenere", "key": "лимон"},
+     {"cipher": "railfence", "rails": 3},
+     {"cipher": "rc4", "key": "secret"},
+     {"cipher": "base64"}]
+
+(или {"stages": [...]}); "decrypt": true у стадии — обратное направление
+только для неё. Каждая стадия — генератор над кусками str/bytes,
+так что память ограничена размером куска. Стадии, которым нужен весь вход
+(Rail Fence — длина текста, Playfair — разбиение на биграммы), объявляют
+buffered = True: только перед ними конвейер собирает поток целиком.
+
+Между текстовой и байтовой стадией автоматически вставляется UTF-8.
+Обратный конвейер (расшифровка) — те же стадии в обратном порядке
+с противоположным направлением: Pipeline.inverse().
+
+Playfair необратим побайтно (фильтрует небуквы, вставляет X/Х), поэтому
+его расшифровка возвращает нормализованный текст.
+"""
+
+import base64
+import codecs
+import json
+from typing import Dict, Iterable, Iterator, List, Type, Union
+
+from .aes import STREAM_CHUNK, STREAM_MODES, encrypt_stream, decrypt_stream
+from .caesar import get_caesar_cipher
+from .playfair import playfair_encrypt, playfair_decrypt
+from .railfence import railfence_encrypt, railfence_decrypt
+from .rc4 import rc4_stream
+from .vigenere import get_vigenere_cipher
+
+TEXT = 'text'
+BYTES = 'bytes'
+# Размер куска при нарезке строк (символов) и байтов
+CHUNK_SIZE = STREAM_CHUNK
+# Ограничение на длину спецификации — конвейер не должен быть бесконечным
+MAX_STAGES = 16
+# Rail Fence: как у операции railfence.* в API (перестановка строится за O(rails + n))
+MAX_RAILS = 1000
+
+Chunk = Union[str, bytes]
+
+
+class PipelineError(ValueError):
+    """Ошибка в спецификации конвейера."""
+
+
+# ===== Реестр =====
+
+CIPHERS: Dict[str, Type['Stage']] = {}
+
+
+def register(cls: Type['Stage']) -> Type['Stage']:
+    """
+    Декоратор: добавляет стадию в реестр под cls.name. Недоделанная
+    стадия — TypeError ещё при импорте, а не посреди потока: buffered
+    переопределяет transform(), потоковая — run().
+    """
+    if not cls.name or cls.name in CIPHERS:
+        raise TypeError(f'{cls.__name__}: пустое или занятое имя стадии {cls.name!r}')
+    if {cls.consumes, cls.produces} - {TEXT, BYTES}:
+        raise TypeError(f'{cls.__name__}: consumes/produces — {TEXT!r} или {BYTES!r}')
+    method = 'transform' if cls.buffered else 'run'
+    if getattr(cls, method) is getattr(Stage, method):
+        raise TypeError(f'{cls.__name__}: {"buffered" if cls.buffered else "потоковая"} стадия без {method}()')
+    CIPHERS[cls.name] = cls
+    return cls
+
+
+class Stage:
+    """
+    Стадия конвейера. consumes/produces — типы кусков при шифровании
+    (при расшифровке меняются местами). params — разрешённые параметры
+    спецификации со значениями по умолчанию (None — обязательный).
+    """
+
+    name = ''
+    consumes = TEXT
+    produces = TEXT
+    buffered = False
+    params: Dict[str, object] = {}
+
+    def __init__(self, encrypt: bool = True, **params):
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise PipelineError(f'{self.name}: неизвестные параметры {", ".join(sorted(unknown))}')
+        values = {}
+        for k, default in self.params.items():
+            v = params.get(k, default)
+            if v is None:
+                raise PipelineError(f'{self.name}: не задан параметр {k}')
+            values[k] = v
+        self.encrypt = encrypt
+        self.values = values
+        self.setup(**values)
+
+    def setup(self, **params):
+        pass
+
+    @property
+    def input_type(self) -> str:
+        return self.consumes if self.encrypt else self.produces
+
+    @property
+    def output_type(self) -> str:
+        return self.produces if self.encrypt else self.consumes
+
+    def inverse(self) -> 'Stage':
+        return type(self)(not self.encrypt, **self.values)
+
+    def spec(self) -> dict:
+        out = {'cipher': self.name, **self.values}
+        if not self.encrypt:
+            out['decrypt'] = True
+        return out
+
+    def run(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        """Потоковая обработка; buffered-стадии переопределяют transform()."""
+        data = (''.join if self.input_type == TEXT else b''.join)(chunks)
+        yield from _split(self.transform(data))
+
+    def transform(self, data: Chunk) -> Chunk:
+        # register() не пропустит buffered-стадию без своего transform()
+        raise NotImplementedError
+
+
+def _int(stage: str, name: str, value, lo: int = None, hi: int = None) -> int:
+    """Целый параметр спецификации (число или строка с числом) в пределах lo..hi."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise PipelineError(f'{stage}: параметр {name} должен быть целым числом')
+    try:
+        v = int(value)
+    except ValueError:
+        raise PipelineError(f'{stage}: параметр {name} должен быть целым числом')
+    if lo is not None and v < lo:
+        raise PipelineError(f'{stage}: параметр {name} должен быть не меньше {lo}')
+    if hi is not None and v > hi:
+        raise PipelineError(f'{stage}: параметр {name} должен быть не больше {hi}')
+    return v
+
+
+def _split(data: Chunk, size: int = CHUNK_SIZE) -> Iterator[Chunk]:
+    for off in range(0, len(data), size):
+        yield data[off:off + size]
+
+
+# ===== Стадии =====
+
+@register
+class CaesarStage(Stage):
+    name = 'caesar'
+    params = {'shift': 3}
+
+    def setup(self, shift):
+        self.cipher = get_caesar_cipher(_int(self.name, 'shift', shift))
+
+    def run(self, chunks):
+        fn = self.cipher.encrypt if self.encrypt else self.cipher.decrypt
+        for chunk in chunks:
+            yield fn(chunk)
+
+
+@register
+class VigenereStage(Stage):
+    name = 'vigenere'
+    params = {'key': None}
+
+    def setup(self, key):
+        self.cipher = get_vigenere_cipher(str(key))
+
+    def run(self, chunks):
+        # ключ двигается только по буквам — позиция переносится между кусками
+        return self.cipher.stream(chunks, self.encrypt)
+
+
+@register
+class RailFenceStage(Stage):
+    name = 'railfence'
+    params = {'rails': 3, 'offset': 0}
+    # перестановка зависит от длины всего текста
+    buffered = True
+
+    def setup(self, rails, offset):
+        self.rails = _int(self.name, 'rails', rails, 2, MAX_RAILS)
+        self.offset = _int(self.name, 'offset', offset, 0)
+
+    def transform(self, data):
+        fn = railfence_encrypt if self.encrypt else railfence_decrypt
+        return fn(data, self.rails, self.offset)
+
+
+@register
+class PlayfairStage(Stage):
+    name = 'playfair'
+    params = {'key': None}
+    # биграммы и язык определяются по всему тексту
+    buffered = True
+
+    def transform(self, data):
+        fn = playfair_encrypt if self.encrypt else playfair_decrypt
+        return fn(data, str(self.values['key']))
+
+
+@register
+class UTF8Stage(Stage):
+    name = 'utf8'
+    consumes = TEXT
+    produces = BYTES
+
+    def run(self, chunks):
+        if self.encrypt:
+            for chunk in chunks:
+                yield chunk.encode('utf-8')
+            return
+        # символ может разрезаться границей куска
+        dec = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        for chunk in chunks:
+            out = dec.decode(chunk)
+            if out:
+                yield out
+        tail = dec.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+@register
+class Base64Stage(Stage):
+    name = 'base64'
+    consumes = BYTES
+    produces = TEXT
+
+    def run(self, chunks):
+        return self._encode(chunks) if self.encrypt else self._decode(chunks)
+
+    @staticmethod
+    def _encode(chunks):
+        # кодируем кратно 3 байтам, остаток переносим в следующий кусок
+        carry = b''
+        for chunk in chunks:
+            data = carry + chunk
+            cut = len(data) - len(data) % 3
+            carry = data[cut:]
+            if cut:
+                yield base64.b64encode(data[:cut]).decode('ascii')
+        if carry:
+            yield base64.b64encode(carry).decode('ascii')
+
+    @staticmethod
+    def _decode(chunks):
+        carry = ''
+        for chunk in chunks:
+            data = carry + ''.join(chunk.split())
+            cut = len(data) - len(data) % 4
+            carry = data[cut:]
+            if cut:
+                yield base64.b64decode(data[:cut], validate=True)
+        if carry:
+            raise PipelineError('base64: длина входа не кратна 4')
+
+
+@register
+class RC4Stage(Stage):
+    name = 'rc4'
+    consumes = BYTES
+    produces = BYTES
+    params = {'key': None}
+
+    def run(self, chunks):
+        return rc4_stream(chunks, str(self.values['key']).encode('utf-8'))
+
+
+@register
+class AESStage(Stage):
+    name = 'aes'
+    consumes = BYTES
+    produces = BYTES
+    params = {'key': None, 'mode': 'gcm'}
+
+    def setup(self, key, mode):
+        self.key = str(key).encode('utf-8')
+        if len(self.key) not in (16, 24, 32):
+            raise PipelineError('aes: ключ должен быть 16/24/32 байта')
+        if mode not in STREAM_MODES:
+            raise PipelineError(f'aes: неизвестный режим {mode}')
+        self.mode = mode
+
+    def run(self, chunks):
+        if self.encrypt:
+            return encrypt_stream(chunks, self.key, self.mode)
+        return decrypt_stream(chunks, self.key)
+
+
+# ===== Конвейер =====
+
+class Pipeline:
+    """Цепочка стадий; run() — ленивый генератор выходных кусков."""
+
+    def __init__(self, stages: List[Stage], input_type: str = TEXT):
+        if len(stages) > MAX_STAGES:
+            raise PipelineError(f'Не больше {MAX_STAGES} стадий')
+        self.input_type = input_type
+        self.stages = self._with_adapters(stages, input_type)
+
+    @staticmethod
+    def _with_adapters(stages: List[Stage], current: str) -> List[Stage]:
+        out: List[Stage] = []
+        for st in stages:
+            if st.input_type != current:
+                # text -> bytes: кодируем, bytes -> text: декодируем
+                out.append(UTF8Stage(encrypt=(current == TEXT)))
+            out.append(st)
+            current = st.output_type
+        return out
+
+    @classmethod
+    def from_spec(cls, spec: Union[str, list, dict], decrypt: bool = False) -> 'Pipeline':
+        """
+        Конвейер из JSON-спецификации (строка, список стадий или
+        {"input": "text"|"bytes", "stages": [...]}).
+        decrypt=True — сразу обратный конвейер.
+        """
+        if isinstance(spec, str):
+            try:
+                spec = json.loads(spec)
+            except ValueError as e:
+                raise PipelineError(f'Некорректный JSON: {e}')
+        input_type = TEXT
+        if isinstance(spec, dict):
+            input_type = spec.get('input', TEXT)
+            spec = spec.get('stages')
+        if input_type not in (TEXT, BYTES):
+            raise PipelineError('input должен быть "text" или "bytes"')
+        if not isinstance(spec, list) or not spec:
+            raise PipelineError('Спецификация — непустой список стадий')
+
+        stages = []
+        for i, item in enumerate(spec, 1):
+            if not isinstance(item, dict) or item.get('cipher') not in CIPHERS:
+                raise PipelineError(f'Стадия {i}: неизвестный шифр; доступны {", ".join(sorted(CIPHERS))}')
+            params = {k: v for k, v in item.items() if k not in ('cipher', 'decrypt')}
+            stages.append(CIPHERS[item['cipher']](not item.get('decrypt'), **params))
+        pipe = cls(stages, input_type)
+        return pipe.inverse() if decrypt else pipe
+
+    @property
+    def output_type(self) -> str:
+        return self.stages[-1].output_type if self.stages else self.input_type
+
+    @property
+    def buffered_stages(self) -> List[str]:
+        return [st.name for st in self.stages if st.buffered]
+
+    def inverse(self) -> 'Pipeline':
+        """Обратный конвейер: стадии в обратном порядке, направление — наоборот."""
+        inv = Pipeline.__new__(Pipeline)
+        inv.input_type = self.output_type
+        inv.stages = [st.inverse() for st in reversed(self.stages)]
+        return inv
+
+    def spec(self) -> List[dict]:
+        return [st.spec() for st in self.stages]
+
+    def run(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        stream: Iterable[Chunk] = chunks
+        for st in self.stages:
+            stream = st.run(stream)
+        return iter(stream)
+
+    def apply(self, data: Chunk) -> Chunk:
+        """Весь вход целиком (строка или байты) -> весь выход."""
+        out = self.run(_split(data))
+        return (''.join if self.output_type == TEXT else b''.join)(out)
@@ -3,7 +3,10 @@
 # Авто-детект алфавита по ключу/тексту.
 
 import re
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from ..metrics import instrument
 
 LAT_ALPH = "abcdefghiklmnopqrstuvwxyz"  # j -> i
 LAT_W, LAT_H = 5, 5
@@ -14,6 +17,9 @@ RUS_ALPH = "абвгдежзийклмнопрстуфхцчшщъыьэюя".re
 RUS_W, RUS_H = 8, 4
 RUS_FILL = "х"
 
+# Сколько скомпилированных ключей держим в LRU
+KEY_CACHE_SIZE = 256
+
 def _only_letters(s: str) -> str:
     return "".join(ch for ch in s if ch.isalpha())
 
@@ -99,22 +105,45 @@ def _shift_rowcol(a_pos, b_pos, W, H, enc: bool):
     # прямоугольник
     return (ra, cb), (rb, ca)
 
+class PlayfairKey:
+    """
+    Скомпилированный ключ Playfair: полная таблица биграмм для шифрования
+    и расшифрования (25×25 для латиницы, 32×32 для кириллицы), так что
+    обработка текста сводится к поиску в словаре.
+    """
+
+    def __init__(self, key: str, is_rus: bool):
+        tbl, pos, W, H = _build_table(key, is_rus)
+        self.key = key
+        self.is_rus = is_rus
+        self.table = tbl
+        self.enc: Dict[str, str] = {}
+        self.dec: Dict[str, str] = {}
+        for a, a_pos in pos.items():
+            for b, b_pos in pos.items():
+                for enc, out in ((True, self.enc), (False, self.dec)):
+                    (ra, ca), (rb, cb) = _shift_rowcol(a_pos, b_pos, W, H, enc)
+                    out[a + b] = tbl[ra][ca] + tbl[rb][cb]
+
+    def process(self, pairs: List[Tuple[str, str]], enc: bool) -> str:
+        table = self.enc if enc else self.dec
+        # если после нормализации символа нет в алфавите — пропустим пару
+        return "".join(table[d] for d in (a + b for a, b in pairs) if d in table)
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def get_playfair_key(key: str, is_rus: bool) -> PlayfairKey:
+    """PlayfairKey из LRU-кэша (ключ кэша — (ключ, алфавит))."""
+    return PlayfairKey(key, is_rus)
+
 def _process(text: str, key: str, enc: bool) -> str:
     is_rus = _detect_is_russian(text, key)
-    tbl, pos, W, H = _build_table(key, is_rus)
     pairs = _prep_pairs(text, is_rus)
-    out = []
-    for a, b in pairs:
-        # если после нормализации символа нет в алфавите — пропустим пару
-        if a not in pos or b not in pos:
-            continue
-        a2pos, b2pos = _shift_rowcol(pos[a], pos[b], W, H, enc)
-        ra, ca = a2pos; rb, cb = b2pos
-        out.append(tbl[ra][ca] + tbl[rb][cb])
-    return "".join(out)
+    return get_playfair_key(key, is_rus).process(pairs, enc)
 
+@instrument('playfair', 'encrypt')
 def playfair_encrypt(text: str, key: str) -> str:
     return _process(text, key, enc=True)
 
+@instrument('playfair', 'decrypt')
 def playfair_decrypt(text: str, key: str) -> str:
     return _process(text, key, enc=False)
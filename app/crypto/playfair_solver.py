@@ -0,0 +1,343 @@
+# app/crypto/playfair_solver.py
+# -*- coding: utf-8 -*-
+"""
+Взлом Playfair без ключа: имитация отжига по таблицам ключа
+(латиница 5×5 и кириллица 8×4, как в playfair.py).
+
+Кандидаты оцениваются по квадграммам: log10-вероятности (интерполяция
+порядков 4…1) лежат в плоском array('f') размера N⁴, индекс квадграммы —
+((a·N + b)·N + c)·N + d.
+Таблицы строятся из корпуса (по умолчанию — app/crypto/data/corpus_*.txt).
+
+Независимые перезапуски идут по всем ядрам (ProcessPoolExecutor); как только
+один из процессов находит решение, общее событие останавливает остальные.
+Для веба есть режим с одним процессом и лимитом времени.
+
+Решение — не просто кандидат выше порога оценки: порог по корпусу грубый
+(на коротком шифртексте ложные ключи подбираются к нему вплотную). Кандидат
+выше THRESHOLD_FACTOR засчитывается, только когда второй перезапуск дошёл
+до порога с тем же открытым текстом: ложные локальные максимумы от
+перезапуска к перезапуску разные, а настоящий — один (эквивалентные таблицы
+дают тот же текст). Без сверки — только выше строгого ACCEPT_FACTOR.
+"""
+
+import math
+import multiprocessing
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+from ..metrics import instrument
+from .playfair import (
+    LAT_ALPH, LAT_W, LAT_H, RUS_ALPH, RUS_W, RUS_H,
+    _norm_lat, _norm_rus, _detect_is_russian,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+DEFAULT_CORPUS = {
+    'en': os.path.join(DATA_DIR, 'corpus_en.txt'),
+    'ru': os.path.join(DATA_DIR, 'corpus_ru.txt'),
+}
+# Пороги на среднюю log10-оценку квадграммы в долях оценки самого корпуса
+# (оценки отрицательные: больше коэффициент — хуже текст). Замер: настоящий
+# открытый текст (со вставками X) — 1.12 из корпуса, 1.23…1.28 вне его;
+# перемешанный — около 1.65; ложные максимумы отжига на ~80 буквах — от 1.33.
+# THRESHOLD_FACTOR — кандидат, которого сверяют с другими перезапусками;
+# ACCEPT_FACTOR — засчитывается сразу
+THRESHOLD_FACTOR = 1.3
+ACCEPT_FACTOR = 1.2
+# Шагов отжига на один перезапуск (температура линейно падает до нуля)
+DEFAULT_STEPS = 200_000
+
+
+class QuadgramModel(NamedTuple):
+    alph: str
+    width: int
+    height: int
+    table: array       # log10 P(abcd), плоский массив N⁴
+    floor: float       # нижняя граница оценки квадграммы
+    corpus_avg: float  # средняя оценка квадграммы по самому корпусу
+
+
+def _lang_params(lang: str):
+    if lang == 'ru':
+        return RUS_ALPH, RUS_W, RUS_H, _norm_rus
+    return LAT_ALPH, LAT_W, LAT_H, _norm_lat
+
+
+# Веса интерполяции для P(d | abc), P(d | bc), P(d | c), P(d): небольшой корпус
+# редко содержит квадграмму целиком, а младшие порядки всё равно дают сигнал
+INTERPOLATION = (0.4, 0.3, 0.2, 0.1)
+
+
+def _ngram_counts(seq: List[int], n: int) -> dict:
+    counts = {}
+    for i in range(len(seq) - n + 1):
+        key = tuple(seq[i:i + n])
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+@lru_cache(maxsize=4)
+def load_quadgrams(lang: str, corpus_path: Optional[str] = None) -> QuadgramModel:
+    """
+    Строит (и кэширует в процессе) квадграммную модель из корпуса:
+    table[abcd] = log10 P(abcd), каждый множитель цепочки интерполирован
+    с младшими порядками.
+    """
+    alph, W, H, norm = _lang_params(lang)
+    with open(corpus_path or DEFAULT_CORPUS[lang], encoding='utf-8') as f:
+        text = norm(f.read())
+    N = len(alph)
+    idx = {ch: i for i, ch in enumerate(alph)}
+    seq = [idx[ch] for ch in text if ch in idx]
+    if len(seq) < 4:
+        raise ValueError('Корпус слишком мал для квадграмм')
+
+    c1, c2, c3, c4 = (_ngram_counts(seq, n) for n in (1, 2, 3, 4))
+    total = len(seq)
+    l4, l3, l2, l1 = INTERPOLATION
+    # униграммы со сглаживанием: невстреченная буква не даёт log(0)
+    p1 = [(c1.get((d,), 0) + 0.5) / (total + 0.5 * N) for d in range(N)]
+
+    # префикс цепочки P(a) P(b|a) P(c|ab) — тоже с откатом к младшим порядкам
+    cond2 = [
+        0.2 * p1[c] + 0.8 * c2.get((b, c), 0) / c1[(b,)] if (b,) in c1 else p1[c]
+        for b in range(N) for c in range(N)
+    ]
+
+    def cond3(a, b, c):
+        n_ab = c2.get((a, b), 0)
+        low = cond2[b * N + c]
+        return 0.3 * low + 0.7 * c3.get((a, b, c), 0) / n_ab if n_ab else low
+
+    # table[abcd] = log10 P(abcd) = log10 P(a) P(b|a) P(c|ab) P(d|abc)
+    table = array('f', bytes(4 * N ** 4))
+    for c in range(N):
+        n_c = c1.get((c,), 0)
+        base_c = [l1 * p1[d] + (l2 * c2.get((c, d), 0) / n_c if n_c else 0.0) for d in range(N)]
+        for b in range(N):
+            n_bc = c2.get((b, c), 0)
+            base_bc = [base_c[d] + l3 * c3.get((b, c, d), 0) / n_bc for d in range(N)] if n_bc else base_c
+            log_bc = [math.log10(x) for x in base_bc]
+            for a in range(N):
+                prefix = math.log10(p1[a] * cond2[a * N + b] * cond3(a, b, c))
+                n_abc = c3.get((a, b, c), 0)
+                off = ((a * N + b) * N + c) * N
+                if n_abc:
+                    for d in range(N):
+                        table[off + d] = prefix + math.log10(base_bc[d] + l4 * c4.get((a, b, c, d), 0) / n_abc)
+                else:
+                    table[off:off + N] = array('f', [prefix + x for x in log_bc])
+    floor = min(table)
+    nq = len(seq) - 3
+    avg = sum(table[((seq[i] * N + seq[i + 1]) * N + seq[i + 2]) * N + seq[i + 3]] for i in range(nq)) / nq
+    return QuadgramModel(alph, W, H, table, floor, avg)
+
+
+def _score(plain: List[int], table: array, N: int) -> float:
+    N2 = N * N
+    N3 = N2 * N
+    return sum([table[a * N3 + b * N2 + c * N + d]
+                for a, b, c, d in zip(plain, plain[1:], plain[2:], plain[3:])])
+
+
+@lru_cache(maxsize=4)
+def _position_map(W: int, H: int) -> tuple:
+    """
+    Расшифровка пары зависит только от позиций в таблице, не от букв:
+    (pa, pb) -> (qa, qb) считается один раз на геометрию сетки.
+    """
+    size = W * H
+    out = [None] * (size * size)
+    for pa in range(size):
+        ra, ca = divmod(pa, W)
+        for pb in range(size):
+            rb, cb = divmod(pb, W)
+            if ra == rb:
+                q = (ra * W + (ca - 1) % W, rb * W + (cb - 1) % W)
+            elif ca == cb:
+                q = (((ra - 1) % H) * W + ca, ((rb - 1) % H) * W + cb)
+            else:
+                q = (ra * W + cb, rb * W + ca)
+            out[pa * size + pb] = q
+    return tuple(out)
+
+
+def _decrypt(ct: List[int], key: List[int], W: int, H: int) -> List[int]:
+    size = len(key)
+    posmap = _position_map(W, H)
+    pos = [0] * size
+    for i, c in enumerate(key):
+        pos[c] = i
+    out = []
+    append = out.append
+    for k in range(0, len(ct) - 1, 2):
+        qa, qb = posmap[pos[ct[k]] * size + pos[ct[k + 1]]]
+        append(key[qa])
+        append(key[qb])
+    return out
+
+
+def _mutate(key: List[int], W: int, H: int, rnd: random.Random) -> List[int]:
+    k = key[:]
+    r = rnd.random()
+    if r < 0.9:
+        i, j = rnd.randrange(len(k)), rnd.randrange(len(k))
+        k[i], k[j] = k[j], k[i]
+    elif r < 0.92:
+        a, b = rnd.randrange(H), rnd.randrange(H)
+        k[a * W:(a + 1) * W], k[b * W:(b + 1) * W] = k[b * W:(b + 1) * W], k[a * W:(a + 1) * W]
+    elif r < 0.94:
+        a, b = rnd.randrange(W), rnd.randrange(W)
+        for row in range(H):
+            k[row * W + a], k[row * W + b] = k[row * W + b], k[row * W + a]
+    elif r < 0.96:
+        k = [k[row * W + c] for row in reversed(range(H)) for c in range(W)]
+    elif r < 0.98:
+        k = [k[row * W + c] for row in range(H) for c in reversed(range(W))]
+    else:
+        k.reverse()
+    return k
+
+
+class SolveResult(NamedTuple):
+    key: str
+    score: float
+    plaintext: str
+    per_quadgram: float
+    reached_threshold: bool  # решение засчитано: выше ACCEPT_FACTOR или подтверждено перезапуском
+    iterations: int
+    restarts: int
+    elapsed: float
+
+
+_stop_event = None
+
+
+def _init_worker(event):
+    global _stop_event
+    _stop_event = event
+
+
+def _anneal(args) -> SolveResult:
+    """
+    Перезапуски отжига до дедлайна или решения: оценка выше accept либо
+    два перезапуска дошли до threshold с одним текстом. Возвращает лучший
+    ключ. Работает и в воркере пула, и в текущем процессе (веб-режим).
+    """
+    ct_text, lang, corpus_path, deadline, threshold, accept, seed, steps = args
+    model = load_quadgrams(lang, corpus_path)
+    alph, W, H, table = model.alph, model.width, model.height, model.table
+    N = len(alph)
+    idx = {ch: i for i, ch in enumerate(alph)}
+    ct = [idx[ch] for ch in ct_text]
+    nq = max(1, len(ct) - 3)
+    target = threshold * nq
+    accept_target = accept * nq
+    rnd = random.Random(seed)
+    t0 = time.monotonic()
+
+    best_key, best_score = list(range(N)), float('-inf')
+    iterations = restarts = 0
+    # открытые тексты перезапусков, дошедших до порога
+    seen = set()
+    stop = reached = False
+    while not stop:
+        restarts += 1
+        key = list(range(N))
+        rnd.shuffle(key)
+        cur = _score(_decrypt(ct, key, W, H), table, N)
+        run_key, run_score = key, cur
+        # температура по длине шифртекста (эмпирика для квадграмм log10)
+        t_start = max(1.0, 10 + 0.087 * (len(ct) - 84))
+        for step in range(steps):
+            temp = t_start * (1 - step / steps) + 0.01
+            cand = _mutate(key, W, H, rnd)
+            s = _score(_decrypt(ct, cand, W, H), table, N)
+            d = s - cur
+            if d >= 0 or rnd.random() < math.exp(d / temp):
+                key, cur = cand, s
+                if cur > run_score:
+                    run_key, run_score = key, cur
+            iterations += 1
+            if step & 255 == 0:
+                if run_score >= target:
+                    # дальше решит сверка с другими перезапусками
+                    break
+                if time.monotonic() >= deadline or (_stop_event is not None and _stop_event.is_set()):
+                    stop = True
+                    break
+        if run_score > best_score:
+            best_key, best_score = run_key, run_score
+        if run_score >= target:
+            plain = tuple(_decrypt(ct, run_key, W, H))
+            if run_score >= accept_target or plain in seen:
+                best_key, best_score = run_key, run_score
+                stop = reached = True
+            seen.add(plain)
+        if time.monotonic() >= deadline:
+            stop = True
+
+    if reached and _stop_event is not None:
+        _stop_event.set()
+    plain = ''.join(alph[i] for i in _decrypt(ct, best_key, W, H))
+    return SolveResult(''.join(alph[i] for i in best_key), best_score, plain,
+                       best_score / nq, reached, iterations, restarts, time.monotonic() - t0)
+
+
+def prepare_ciphertext(text: str, lang: str = 'auto') -> Tuple[str, str]:
+    """Нормализует шифртекст как playfair.py; возвращает (язык, буквы)."""
+    if lang not in ('ru', 'en'):
+        lang = 'ru' if _detect_is_russian(text, '') else 'en'
+    _, _, _, norm = _lang_params(lang)
+    letters = norm(text)
+    if len(letters) % 2:
+        letters = letters[:-1]
+    return lang, letters
+
+
+@instrument('playfair', 'solve')
+def solve_playfair(text: str, lang: str = 'auto', time_limit: float = 30.0,
+                   workers: Optional[int] = None, threshold: Optional[float] = None,
+                   corpus_path: Optional[str] = None, steps: int = DEFAULT_STEPS,
+                   seed: Optional[int] = None) -> SolveResult:
+    """
+    Подбирает ключ Playfair за не более чем time_limit секунд.
+
+    workers=1 — всё в текущем процессе (для веба); иначе по перезапуску
+    на ядро, с ранней остановкой всех, как только один нашёл решение.
+    threshold — средняя log10-оценка квадграммы, с которой кандидата сверяют
+    с другими перезапусками (по умолчанию из корпуса, см. THRESHOLD_FACTOR);
+    без сверки засчитывается оценка выше ACCEPT_FACTOR (или выше threshold,
+    если он строже).
+    """
+    lang, letters = prepare_ciphertext(text, lang)
+    if len(letters) < 8:
+        raise ValueError('Слишком короткий шифртекст для анализа')
+    model = load_quadgrams(lang, corpus_path)
+    if threshold is None:
+        threshold = model.corpus_avg * THRESHOLD_FACTOR
+    accept = max(threshold, model.corpus_avg * ACCEPT_FACTOR)
+    deadline = time.monotonic() + time_limit
+    base_seed = seed if seed is not None else random.randrange(1 << 30)
+    workers = workers or os.cpu_count() or 1
+    jobs = [(letters, lang, corpus_path, deadline, threshold, accept, base_seed + i, steps)
+            for i in range(workers)]
+
+    if workers == 1:
+        return _anneal(jobs[0])
+
+    ctx = multiprocessing.get_context()
+    event = ctx.Event()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(event,)) as pool:
+        results = list(pool.map(_anneal, jobs))
+    best = max(results, key=lambda r: (r.reached_threshold, r.score))
+    return best._replace(iterations=sum(r.iterations for r in results),
+                         restarts=sum(r.restarts for r in results),
+                         reached_threshold=any(r.reached_threshold for r in results))
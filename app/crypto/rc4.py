@@ -7,6 +7,10 @@ API:
 - rc4_encrypt(plaintext:str, key:str) -> str           # Base64(шифртекст) — имя, которого ждут твои views
 - rc4_decrypt(cipher_b64:str, key:str) -> str          # расшифровка из Base64 в UTF-8 строку
 
+Потоковый режим:
+- RC4Stream(key_bytes).update(chunk) -> bytes      # состояние сохраняется между кусками
+- rc4_stream(chunks, key_bytes)                    # генератор поверх RC4Stream
+
 Дополнительно оставлены функции:
 - rc4_encrypt_b64 / rc4_decrypt_b64 (идентичные по поведению)
 - rc4(text, key, encrypt=True) — совместимая обёртка
@@ -14,6 +18,8 @@ API:
 import base64
 from typing import Iterable
 
+from ..metrics import instrument
+
 
 def _ksa(key_bytes: bytes) -> list:
     S = list(range(256))
@@ -24,25 +30,81 @@ def _ksa(key_bytes: bytes) -> list:
     return S
 
 
-def _prga(S: list) -> Iterable[int]:
-    i = j = 0
-    while True:
-        i = (i + 1) % 256
-        j = (j + S[i]) % 256
-        S[i], S[j] = S[j], S[i]
-        yield S[(S[i] + S[j]) % 256]
+class RC4Stream:
+    """
+    Потоковый RC4 с сохранением состояния S/i/j между вызовами update().
+
+    Ключевой поток генерируется блоками в заранее выделенный bytearray,
+    а XOR делается сразу по всему блоку через int.from_bytes — так большие
+    входы можно шифровать кусками с постоянным расходом памяти:
+
+        stream = RC4Stream(key)
+        for chunk in chunks:
+            out.write(stream.update(chunk))
+    """
+
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, key_bytes: bytes, block_size: int = BLOCK_SIZE):
+        if not (1 <= len(key_bytes) <= 256):
+            raise ValueError("Длина ключа RC4 должна быть от 1 до 256 байт")
+        self._S = bytearray(_ksa(key_bytes))
+        self._i = self._j = 0
+        self._buf = bytearray(block_size)
+
+    def _fill(self, n: int) -> memoryview:
+        """Генерирует n байт ключевого потока в self._buf (n <= block_size)."""
+        S, out = self._S, self._buf
+        i, j = self._i, self._j
+        for k in range(n):
+            i = (i + 1) & 0xFF
+            si = S[i]
+            j = (j + si) & 0xFF
+            sj = S[j]
+            S[i] = sj
+            S[j] = si
+            out[k] = S[(si + sj) & 0xFF]
+        self._i, self._j = i, j
+        return memoryview(out)[:n]
+
+    def keystream(self, n: int) -> bytes:
+        """Следующие n байт ключевого потока (состояние сдвигается)."""
+        parts = []
+        step = len(self._buf)
+        while n > 0:
+            m = min(n, step)
+            parts.append(bytes(self._fill(m)))
+            n -= m
+        return b"".join(parts)
+
+    def update(self, data: bytes) -> bytes:
+        """XOR очередного куска данных с ключевым потоком."""
+        out = bytearray(len(data))
+        view = memoryview(data)
+        step = len(self._buf)
+        for off in range(0, len(data), step):
+            block = view[off:off + step]
+            n = len(block)
+            ks = self._fill(n)
+            x = int.from_bytes(block, "little") ^ int.from_bytes(ks, "little")
+            out[off:off + n] = x.to_bytes(n, "little")
+        return bytes(out)
+
+
+def rc4_stream(chunks: Iterable[bytes], key_bytes: bytes) -> Iterable[bytes]:
+    """Шифрует/дешифрует поток кусков байт одним RC4Stream."""
+    stream = RC4Stream(key_bytes)
+    for chunk in chunks:
+        yield stream.update(chunk)
 
 
 def _rc4_bytes(key_bytes: bytes, data: bytes) -> bytes:
-    if not (1 <= len(key_bytes) <= 256):
-        raise ValueError("Длина ключа RC4 должна быть от 1 до 256 байт")
-    S = _ksa(key_bytes)
-    keystream = _prga(S)
-    return bytes([b ^ next(keystream) for b in data])
+    return RC4Stream(key_bytes).update(data)
 
 
 # ===== Основные функции, которых ждут твои views =====
 
+@instrument('rc4', 'encrypt')
 def rc4_encrypt(plaintext: str, key: str) -> str:
     """Шифрует строку UTF-8 и возвращает Base64(шифртекст)."""
     pt = plaintext.encode("utf-8")
@@ -51,6 +113,7 @@ def rc4_encrypt(plaintext: str, key: str) -> str:
     return base64.b64encode(ct).decode("utf-8")
 
 
+@instrument('rc4', 'decrypt')
 def rc4_decrypt(cipher_b64: str, key: str) -> str:
     """Дешифрует Base64(шифртекст) и возвращает строку UTF-8."""
     ct = base64.b64decode(cipher_b64.encode("utf-8"))
@@ -2,10 +2,19 @@
 # -*- coding: utf-8 -*-
 
 import base64
-from typing import Tuple
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, Tuple
 
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from ..metrics import instrument, metrics
+from .aes import lookahead, rechunk
 
 
 # ===== Генерация ключей =====
@@ -49,51 +58,205 @@ def pem_to_public(pem: str) -> rsa.RSAPublicKey:
     return serialization.load_pem_public_key(pem.encode("utf-8"))
 
 
+# ===== LRU разобранных ключей =====
+
+KEY_CACHE_SIZE = 128
+
+
+def pem_fingerprint(pem: str) -> str:
+    """
+    SHA-256 от DER внутри PEM. Для публичного ключа это отпечаток SPKI;
+    считается без ASN.1-разбора — только base64 тела.
+    """
+    body = "".join(line for line in pem.strip().splitlines() if not line.startswith("-----"))
+    return hashlib.sha256(base64.b64decode(body)).hexdigest()
+
+
+class _KeyCache:
+    """Небольшой потокобезопасный LRU: отпечаток -> десериализованный ключ."""
+
+    def __init__(self, maxsize: int = KEY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pem: str, loader):
+        fp = pem_fingerprint(pem)
+        with self._lock:
+            key = self._data.get(fp)
+            if key is not None:
+                self._data.move_to_end(fp)
+                return key
+        key = loader(pem)
+        with self._lock:
+            self._data[fp] = key
+            self._data.move_to_end(fp)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_public_cache = _KeyCache()
+_private_cache = _KeyCache()
+
+
+def cached_public(pem: str) -> rsa.RSAPublicKey:
+    """Как pem_to_public, но повторный ключ берётся из LRU."""
+    return _public_cache.get(pem, pem_to_public)
+
+
+def cached_private(pem: str) -> rsa.RSAPrivateKey:
+    """Как pem_to_private, но повторный ключ берётся из LRU."""
+    return _private_cache.get(pem, pem_to_private)
+
+
+def _oaep() -> padding.OAEP:
+    return padding.OAEP(
+        mgf=padding.MGF1(algorithm=hashes.SHA256()),
+        algorithm=hashes.SHA256(),
+        label=None,
+    )
+
+
 # ===== Шифрование / расшифрование OAEP(SHA-256) =====
 
+@instrument('rsa', 'encrypt_oaep')
 def rsa_encrypt_b64(plaintext: str, public_pem: str) -> str:
     """
     Шифрует строку UTF-8 публичным ключом (PEM) с OAEP(SHA-256).
     Возвращает Base64(шифртекст).
     """
-    pub = pem_to_public(public_pem)
-    ct = pub.encrypt(
-        plaintext.encode("utf-8"),
-        padding.OAEP(
-            mgf=padding.MGF1(algorithm=hashes.SHA256()),
-            algorithm=hashes.SHA256(),
-            label=None,
-        ),
-    )
+    pub = cached_public(public_pem)
+    ct = pub.encrypt(plaintext.encode("utf-8"), _oaep())
     return base64.b64encode(ct).decode("utf-8")
 
 
+@instrument('rsa', 'decrypt_oaep')
 def rsa_decrypt_b64(cipher_b64: str, private_pem: str) -> str:
     """
     Дешифрует Base64(шифртекст) приватным ключом (PEM) с OAEP(SHA-256).
     Возвращает исходную строку UTF-8.
     """
-    priv = pem_to_private(private_pem)
+    priv = cached_private(private_pem)
     # убираем пробелы/переводы строк и валидируем Base64
     ct = base64.b64decode("".join(cipher_b64.split()).encode("utf-8"), validate=True)
-    pt = priv.decrypt(
-        ct,
-        padding.OAEP(
-            mgf=padding.MGF1(algorithm=hashes.SHA256()),
-            algorithm=hashes.SHA256(),
-            label=None,
-        ),
-    )
+    pt = priv.decrypt(ct, _oaep())
     return pt.decode("utf-8")
 
 
+# ===== Гибридная схема: RSA-OAEP оборачивает ключ AES-GCM =====
+#
+# Формат (всё big-endian):
+#   версия (1 байт) | длина обёрнутого ключа (2) | RSA-OAEP(ключ AES-256)
+#   | префикс nonce (8)
+#   | далее куски: длина шифртекста (4) | AES-GCM(кусок) вместе с тегом (16)
+# nonce куска = префикс || номер куска (4 байта); в AAD — номер куска и
+# флаг «последний», так что перестановка и обрезка кусков ловятся тегом.
+
+HYBRID_VERSION = 1
+HYBRID_CHUNK = 64 * 1024
+_GCM_TAG = 16
+
+
+def _chunk_aad(index: int, last: bool) -> bytes:
+    return struct.pack(">IB", index, 1 if last else 0)
+
+
+def hybrid_encrypt_stream(chunks: Iterable[bytes], public_pem: str,
+                          chunk_size: int = HYBRID_CHUNK) -> Iterator[bytes]:
+    """Шифрует поток байт: сначала заголовок, затем зашифрованные куски."""
+    pub = cached_public(public_pem)
+    dek = AESGCM.generate_key(bit_length=256)
+    wrapped = pub.encrypt(dek, _oaep())
+    prefix = os.urandom(8)
+    yield struct.pack(">BH", HYBRID_VERSION, len(wrapped)) + wrapped + prefix
+
+    gcm = AESGCM(dek)
+    for index, (chunk, last) in enumerate(lookahead(rechunk(chunks, chunk_size))):
+        nonce = prefix + struct.pack(">I", index)
+        ct = gcm.encrypt(nonce, chunk, _chunk_aad(index, last))
+        yield struct.pack(">I", len(ct)) + ct
+
+
+def hybrid_decrypt_stream(chunks: Iterable[bytes], private_pem: str) -> Iterator[bytes]:
+    """Обратное к hybrid_encrypt_stream; бросает ValueError на битых данных."""
+    priv = cached_private(private_pem)
+    buf = bytearray()
+    it = iter(chunks)
+
+    def need(n: int) -> bool:
+        while len(buf) < n:
+            chunk = next(it, None)
+            if chunk is None:
+                return False
+            buf.extend(chunk)
+        return True
+
+    def take(n: int) -> bytes:
+        out = bytes(buf[:n])
+        del buf[:n]
+        return out
+
+    if not need(3):
+        raise ValueError("Обрезан заголовок гибридного шифртекста")
+    version, wlen = struct.unpack(">BH", take(3))
+    if version != HYBRID_VERSION:
+        raise ValueError(f"Неизвестная версия формата: {version}")
+    if not need(wlen + 8):
+        raise ValueError("Обрезан заголовок гибридного шифртекста")
+    dek = priv.decrypt(take(wlen), _oaep())
+    prefix = take(8)
+
+    gcm = AESGCM(dek)
+    index = 0
+    while True:
+        if not need(4):
+            raise ValueError("Шифртекст обрезан: нет последнего куска")
+        (clen,) = struct.unpack(">I", take(4))
+        if clen < _GCM_TAG or not need(clen):
+            raise ValueError("Шифртекст обрезан")
+        ct = take(clen)
+        nonce = prefix + struct.pack(">I", index)
+        # последний кусок определяется по тому, остались ли данные
+        last = not need(1)
+        try:
+            yield gcm.decrypt(nonce, ct, _chunk_aad(index, last))
+        except Exception:
+            raise ValueError("Проверка целостности (GCM tag) не пройдена")
+        if last:
+            return
+        index += 1
+
+
+@instrument('rsa', 'encrypt_hybrid')
+def rsa_hybrid_encrypt_b64(plaintext: str, public_pem: str) -> str:
+    """
+    RSA-OAEP + AES-GCM: длина сообщения не ограничена размером ключа.
+    Возвращает Base64(контейнер).
+    """
+    ct = b"".join(hybrid_encrypt_stream([plaintext.encode("utf-8")], public_pem))
+    return base64.b64encode(ct).decode("utf-8")
+
+
+@instrument('rsa', 'decrypt_hybrid')
+def rsa_hybrid_decrypt_b64(cipher_b64: str, private_pem: str) -> str:
+    """Обратное к rsa_hybrid_encrypt_b64."""
+    raw = base64.b64decode("".join(cipher_b64.split()).encode("utf-8"), validate=True)
+    return b"".join(hybrid_decrypt_stream([raw], private_pem)).decode("utf-8")
+
+
 # ===== Утилиты для UI =====
 
 def generate_keypair_pem(bits: int = 2048) -> Tuple[str, str]:
     """
     Возвращает пару PEM-строк (private_pem, public_pem) для отображения/сохранения.
     """
-    priv, pub = generate_keypair(bits)
+    with metrics.timer('cryptolab_rsa_keygen_seconds', bits=bits):
+        priv, pub = generate_keypair(bits)
     return private_to_pem(priv), public_to_pem(pub)
 
 
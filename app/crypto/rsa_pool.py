@@ -0,0 +1,161 @@
+# app/crypto/rsa_pool.py
+# -*- coding: utf-8 -*-
+"""
+Пул заранее сгенерированных пар RSA-ключей.
+
+Фоновый поток держит ограниченную очередь готовых пар (PEM) для каждого
+поддерживаемого размера и доливает её после каждой выдачи. Выдача — O(1)
+из очереди; если очередь пуста, пара генерируется прямо в запросе (miss).
+
+Поток стартует лениво при первом обращении и перезапускается после fork,
+поэтому пул безопасно использовать в префорк-воркерах. Держит пары только
+размеров RSA_POOL_SIZES (по умолчанию 2048 — его берёт песочница): каждый
+размер — очередь в каждом воркере и фоновая генерация, а 4096 генерируется
+секундами. Остальные размеры генерируются на месте.
+
+Попадания/промахи и глубина очередей — в /admin/metrics
+(cryptolab_rsa_pool_*), подробности по процессу — stats().
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Dict, Tuple
+
+from ..metrics import metrics, _labelstr
+from .rsa import generate_keypair_pem
+
+SUPPORTED_BITS = (2048, 3072, 4096)
+DEFAULT_SIZES = (2048,)
+DEFAULT_DEPTH = 4
+
+
+class KeyPool:
+    def __init__(self, sizes: Tuple[int, ...] = DEFAULT_SIZES, depth: int = DEFAULT_DEPTH):
+        self.sizes = tuple(sizes)
+        self.depth = depth
+        self._queues: Dict[int, queue.Queue] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._queues = {bits: queue.Queue(maxsize=self.depth) for bits in self.sizes}
+        self._stats = {
+            bits: {'hits': 0, 'misses': 0, 'generated': 0,
+                   'gen_seconds_total': 0.0, 'gen_seconds_max': 0.0, 'gen_seconds_last': 0.0}
+            for bits in self.sizes
+        }
+
+    def init_app(self, app):
+        """
+        Глубина очереди (RSA_POOL_DEPTH, 0 — пул выключен) и размеры
+        (RSA_POOL_SIZES, например '2048,4096') из конфига.
+        """
+        self.depth = int(app.config.get('RSA_POOL_DEPTH', self.depth))
+        sizes = app.config.get('RSA_POOL_SIZES')
+        if sizes:
+            bits = tuple(int(b) for b in str(sizes).replace(' ', '').split(',') if b)
+            bad = [b for b in bits if b not in SUPPORTED_BITS]
+            if bad:
+                raise ValueError(f'RSA_POOL_SIZES: допустимо {", ".join(map(str, SUPPORTED_BITS))}')
+            self.sizes = bits
+        with self._lock:
+            self._reset()
+
+    # ===== Фоновое пополнение =====
+
+    def _ensure_started(self):
+        if self.depth <= 0:
+            return
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # после fork очереди/счётчики родителя нам не принадлежат
+                self._reset()
+            self._pid = pid
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._fill_loop, name='rsa-key-pool', daemon=True)
+            self._thread.start()
+
+    def _generate(self, bits: int) -> Tuple[str, str]:
+        t0 = time.perf_counter()
+        pair = generate_keypair_pem(bits)
+        dt = time.perf_counter() - t0
+        with self._lock:
+            # _reset() после fork подменяет словарь — берём под блокировкой
+            st = self._stats[bits]
+            st['generated'] += 1
+            st['gen_seconds_total'] += dt
+            st['gen_seconds_last'] = dt
+            st['gen_seconds_max'] = max(st['gen_seconds_max'], dt)
+        return pair
+
+    def _fill_loop(self):
+        while not self._stop.is_set():
+            # меньшие размеры в приоритете: после каждой пары начинаем сначала
+            bits = next((b for b in self.sizes if not self._queues[b].full()), None)
+            if bits is None:
+                self._wakeup.wait(timeout=5.0)
+                self._wakeup.clear()
+                continue
+            pair = self._generate(bits)
+            try:
+                self._queues[bits].put_nowait(pair)
+            except queue.Full:
+                pass
+            self._report_depth(bits)
+
+    def _report_depth(self, bits: int):
+        metrics.set('cryptolab_rsa_pool_depth', _labelstr({'bits': bits}), self._queues[bits].qsize())
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    # ===== Выдача =====
+
+    def get_pem(self, bits: int = 2048) -> Tuple[str, str]:
+        """Пара (private_pem, public_pem): из пула, либо сгенерированная на месте."""
+        if bits not in self._queues:
+            return generate_keypair_pem(bits)
+        self._ensure_started()
+        try:
+            pair = self._queues[bits].get_nowait()
+            hit = True
+        except queue.Empty:
+            pair = None
+            hit = False
+        with self._lock:
+            self._stats[bits]['hits' if hit else 'misses'] += 1
+        metrics.inc('cryptolab_rsa_pool_requests_total',
+                    _labelstr({'bits': bits, 'result': 'hit' if hit else 'miss'}))
+        self._report_depth(bits)
+        self._wakeup.set()
+        return pair if hit else self._generate(bits)
+
+    def stats(self) -> Dict[int, dict]:
+        """Глубина очереди, hit/miss и время генерации по каждому размеру."""
+        with self._lock:
+            out = {}
+            for bits, st in self._stats.items():
+                row = dict(st)
+                row['depth'] = self._queues[bits].qsize()
+                row['capacity'] = self.depth
+                row['gen_seconds_avg'] = (st['gen_seconds_total'] / st['generated']) if st['generated'] else 0.0
+                out[bits] = row
+            return out
+
+
+key_pool = KeyPool()
+
+metrics.counter('cryptolab_rsa_pool_requests_total', 'Выдачи пар RSA из пула: hit — готовая, miss — генерация в запросе')
+metrics.gauge('cryptolab_rsa_pool_depth', 'Готовых пар RSA в очередях пула (сумма по процессам)')
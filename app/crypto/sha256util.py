@@ -1,4 +1,64 @@
 import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable, List, NamedTuple, Optional
 
+from ..metrics import instrument
+
+# Куски по 1 МБ: hashlib отпускает GIL на больших буферах
+CHUNK_SIZE = 1024 * 1024
+
+@instrument('sha256', 'hash')
 def sha256_hex(text: str) -> str:
     return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def sha256_stream(chunks: Iterable[bytes]) -> str:
+    """Хэш потока кусков байт (в памяти только текущий кусок)."""
+    h = hashlib.sha256()
+    for chunk in chunks:
+        h.update(chunk)
+    return h.hexdigest()
+
+@instrument('sha256', 'hash_file')
+def sha256_fileobj(fobj: BinaryIO, chunk_size: int = CHUNK_SIZE) -> str:
+    """Хэш файлового объекта (например, загруженного файла), читая кусками."""
+    return sha256_stream(iter(lambda: fobj.read(chunk_size), b''))
+
+def sha256_file(path: str) -> str:
+    """Хэш локального файла через mmap — без копирования в память процесса."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256(b'').hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha256(mm).hexdigest()
+
+class FileDigest(NamedTuple):
+    path: str
+    size: int
+    digest: Optional[str]
+    error: Optional[str] = None
+
+def _digest_one(path: str) -> FileDigest:
+    try:
+        return FileDigest(path, os.path.getsize(path), sha256_file(path))
+    except OSError as e:
+        return FileDigest(path, 0, None, str(e))
+
+def iter_files(root: str) -> Iterable[str]:
+    """Все обычные файлы под root (симлинки не разворачиваем)."""
+    if os.path.isfile(root):
+        yield root
+        return
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                yield path
+
+def sha256_tree(root: str, workers: Optional[int] = None) -> List[FileDigest]:
+    """Хэширует дерево каталогов пулом потоков; порядок — как у iter_files."""
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_digest_one, iter_files(root)))
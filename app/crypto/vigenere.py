@@ -1,7 +1,12 @@
 # app/crypto/vigenere.py
 # -*- coding: utf-8 -*-
 
-from typing import Tuple
+import re
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Tuple
+
+from .caesar import TABLE_CACHE_SIZE, shift_table
+from ..metrics import instrument
 
 # Алфавиты (включая ё/Ё)
 RU_LOW = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
@@ -9,6 +14,10 @@ RU_UP  = RU_LOW.upper()
 EN_LOW = "abcdefghijklmnopqrstuvwxyz"
 EN_UP  = EN_LOW.upper()
 
+# Разбиение текста на куски «буквы / небуквы»: split с группой даёт
+# чётные элементы — буквенные куски, нечётные — разделители.
+_NON_LETTERS_RE = re.compile("([^" + re.escape(RU_LOW + RU_UP + EN_LOW + EN_UP) + "]+)")
+
 def _alpha_sets(ch: str) -> Tuple[str, str] | None:
     """Возвращает (нижний, верхний) алфавит под символ (RU/EN), иначе None."""
     if ch in RU_LOW or ch in RU_UP:
@@ -32,6 +41,73 @@ def _shift_for_key_char(kch: str, alpha_low: str, alpha_up: str) -> int:
     # не буква — сдвиг 0
     return 0
 
+class VigenereCipher:
+    """
+    Скомпилированный Виженер: по таблице str.maketrans на каждую позицию ключа.
+    Текст режется на буквенные куски, буквы склеиваются, и каждая позиция
+    ключа обрабатывается одним translate по срезу letters[p::m].
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        # берём из ключа только буквы RU/EN; сдвиг буквы ключа — её номер
+        # в собственном алфавите, поэтому он не зависит от языка текста
+        self.shifts = [_shift_for_key_char(c, *_alpha_sets(c)) for c in key if _alpha_sets(c)]
+        self._enc = [shift_table(s) for s in self.shifts]
+        self._dec = [shift_table(-s) for s in self.shifts]
+
+    @instrument('vigenere', 'encrypt')
+    def encrypt(self, text: str) -> str:
+        return self._apply(text, self._enc)
+
+    @instrument('vigenere', 'decrypt')
+    def decrypt(self, text: str) -> str:
+        return self._apply(text, self._dec)
+
+    def stream(self, chunks: Iterable[str], encrypt: bool = True) -> Iterator[str]:
+        """Поток кусков: позиция в ключе переносится через границы кусков."""
+        tables = self._enc if encrypt else self._dec
+        m = len(tables)
+        pos = 0
+        for chunk in chunks:
+            if not m:
+                yield chunk
+                continue
+            yield self._apply(chunk, tables[pos:] + tables[:pos])
+            pos = (pos + letter_count(chunk)) % m
+
+    @staticmethod
+    def _apply(text: str, tables: List[dict]) -> str:
+        m = len(tables)
+        if not m:
+            return text
+        if m == 1:
+            return text.translate(tables[0])
+
+        parts = _NON_LETTERS_RE.split(text)
+        letters = "".join(parts[0::2])
+        out = [""] * len(letters)
+        for p, tbl in enumerate(tables):
+            out[p::m] = letters[p::m].translate(tbl)
+        out = "".join(out)
+
+        # возвращаем разделители на место (ключ по ним не продвигался)
+        pos = 0
+        for i in range(0, len(parts), 2):
+            n = len(parts[i])
+            parts[i] = out[pos:pos + n]
+            pos += n
+        return "".join(parts)
+
+def letter_count(text: str) -> int:
+    """Число букв RU/EN в тексте — на столько шагов сдвигается позиция ключа."""
+    return len(text) - sum(map(len, _NON_LETTERS_RE.findall(text)))
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def get_vigenere_cipher(key: str) -> VigenereCipher:
+    """VigenereCipher из LRU-кэша (ключ кэша — строка ключа)."""
+    return VigenereCipher(key)
+
 def vigenere(text: str, key: str, encrypt: bool = True) -> str:
     """
     Виженер для RU/EN (с ё/Ё), сохраняет регистр.
@@ -39,39 +115,5 @@ def vigenere(text: str, key: str, encrypt: bool = True) -> str:
     """
     if not key:
         return text
-
-    out = []
-    k = [c for c in key if _alpha_sets(c)]  # берём из ключа только буквы RU/EN
-    if not k:
-        return text
-
-    ki = 0  # индекс по ключу
-    for ch in text:
-        sets = _alpha_sets(ch)
-        if not sets:
-            # цифры/пробелы/пунктуация — как есть, ключ не продвигаем
-            out.append(ch)
-            continue
-
-        alpha_low, alpha_up = sets
-        # текущий сдвиг по букве ключа
-        kch = k[ki % len(k)]
-        shift = _shift_for_key_char(kch, alpha_low, alpha_up)
-
-        if ch in alpha_low:
-            idx = alpha_low.index(ch)
-            if encrypt:
-                out.append(alpha_low[(idx + shift) % len(alpha_low)])
-            else:
-                out.append(alpha_low[(idx - shift) % len(alpha_low)])
-            ki += 1
-        elif ch in alpha_up:
-            idx = alpha_up.index(ch)
-            if encrypt:
-                out.append(alpha_up[(idx + shift) % len(alpha_up)])
-            else:
-                out.append(alpha_up[(idx - shift) % len(alpha_up)])
-            ki += 1
-        else:
-            out.append(ch)  # на всякий
-    return ''.join(out)
+    cipher = get_vigenere_cipher(key)
+    return cipher.encrypt(text) if encrypt else cipher.decrypt(text)
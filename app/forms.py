@@ -1,10 +1,22 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired
 from wtforms import StringField, PasswordField, SubmitField, TextAreaField, IntegerField, RadioField
 from wtforms.validators import DataRequired, Email, Length, EqualTo, NumberRange, Optional
 from wtforms.validators import ValidationError
 
 
 MAX_TEXT = 5000
+# Rail Fence — перестановка индексов за O(n), но ~80 байт памяти на символ
+MAX_RAILFENCE_TEXT = 200_000
+# Криптоанализ: текст читается один раз в вектор частот
+MAX_ANALYSIS_TEXT = 1_000_000
+# Подбор ключа Виженера идёт в запросе, ~3–5 мкс на символ (1 млн — секунды);
+# Касиски и χ² по столбцам сходятся задолго до 100 тыс. символов
+MAX_VIGENERE_BREAK_TEXT = 100_000
+# RSA-OAEP + AES-GCM: лимит только ради размера страницы
+MAX_RSA_HYBRID_TEXT = 100_000
+# Конвейер шифров: стадии потоковые, лимит — ради размера страницы
+MAX_PIPELINE_TEXT = 100_000
 
 
 # Мягкий email-валидатор: позволяет любые домены (в т.ч. .local),
@@ -39,6 +51,17 @@ class CaesarForm(FlaskForm, ModeMixin):
     shift = IntegerField('Сдвиг', default=3, validators=[DataRequired(), NumberRange(min=-100, max=100)])
     submit = SubmitField('Выполнить')
 
+class CaesarBruteForm(FlaskForm):
+    text = TextAreaField('Шифртекст', validators=[DataRequired(), Length(max=MAX_ANALYSIS_TEXT)])
+    lang = RadioField('Язык', choices=[('auto', 'Авто'), ('ru', 'RU'), ('en', 'EN')], default='auto')
+    submit = SubmitField('Перебрать сдвиги')
+
+class VigenereBreakForm(FlaskForm):
+    text = TextAreaField('Шифртекст', validators=[DataRequired(), Length(max=MAX_VIGENERE_BREAK_TEXT)])
+    lang = RadioField('Язык', choices=[('auto', 'Авто'), ('ru', 'RU'), ('en', 'EN')], default='auto')
+    max_len = IntegerField('Макс. длина ключа', default=24, validators=[Optional(), NumberRange(min=1, max=64)])
+    submit = SubmitField('Подобрать ключ')
+
 class VigenereForm(FlaskForm, ModeMixin):
     text = TextAreaField('Текст', validators=[DataRequired(), Length(max=5000)])
     key = StringField('Ключ', validators=[DataRequired(), Length(min=1, max=64)])
@@ -55,8 +78,15 @@ class RC4Form(FlaskForm, ModeMixin):
     submit = SubmitField('Выполнить')
 
 class RailFenceForm(FlaskForm, ModeMixin):
-    text = TextAreaField('Текст', validators=[DataRequired(), Length(max=5000)])
+    text = TextAreaField('Текст', validators=[DataRequired(), Length(max=MAX_RAILFENCE_TEXT)])
     rails = IntegerField('Число рельс (2–10)', default=3, validators=[DataRequired(), NumberRange(min=2, max=10)])
+    offset = IntegerField('Смещение', default=0, validators=[Optional(), NumberRange(min=0, max=100)])
+    submit = SubmitField('Выполнить')
+
+# Конвейер шифров: JSON-спецификация стадий (app/crypto/pipeline.py)
+class PipelineForm(FlaskForm, ModeMixin):
+    spec = TextAreaField('Стадии (JSON)', validators=[DataRequired(), Length(max=4000)])
+    text = TextAreaField('Текст', validators=[DataRequired(), Length(max=MAX_PIPELINE_TEXT)])
     submit = SubmitField('Выполнить')
 
 # AES — два поля для шифрования/дешифрования
@@ -67,7 +97,19 @@ class AESForm(FlaskForm):
     key = StringField('Ключ (16/24/32 байта)', validators=[DataRequired(), Length(min=16, max=32)])
     submit = SubmitField('Выполнить (CBC)')
 
+# AES для файлов: потоковая обработка, размер файла не ограничен формой
+class AESFileForm(FlaskForm, ModeMixin):
+    file = FileField('Файл', validators=[FileRequired()])
+    cipher = RadioField('Режим AES', choices=[('cbc', 'CBC'), ('ctr', 'CTR'), ('gcm', 'GCM')], default='gcm')
+    key = StringField('Ключ (16/24/32 байта)', validators=[DataRequired(), Length(min=16, max=32)])
+    submit = SubmitField('Выполнить')
+
 class RSAForm(FlaskForm):
+    scheme = RadioField(
+        'Схема',
+        choices=[('oaep', 'RSA-OAEP'), ('hybrid', 'RSA-OAEP + AES-GCM')],
+        default='oaep'
+    )
     text = TextAreaField('Текст / Base64(шифртекст)', validators=[DataRequired()])
 
     submit = SubmitField('Выполнить')
@@ -76,13 +118,28 @@ class RSAForm(FlaskForm):
     def validate_text(self, field):
         # Если мы шифруем — проверим лимит байтов. При расшифровке можно быть длиннее,
         # но здесь у нас режим только шифрования/демо, см. view ниже.
-        if len(field.data.encode('utf-8')) > 190:
+        size = len(field.data.encode('utf-8'))
+        if self.scheme.data == 'hybrid':
+            # ключ RSA оборачивает только ключ AES — размер ограничен лишь формой
+            if size > MAX_RSA_HYBRID_TEXT:
+                raise ValidationError(f'Для гибридной схемы сообщение не должно превышать {MAX_RSA_HYBRID_TEXT} байт.')
+        elif size > 190:
             raise ValidationError('Для RSA-2048 + OAEP(SHA-256) размер сообщения не должен превышать ~190 байт (в UTF-8 меньше 190 символов).')
 
 class SHA256Form(FlaskForm):
-    text = TextAreaField('Текст', validators=[DataRequired(), Length(max=10000)])
+    text = TextAreaField('Текст', validators=[Optional(), Length(max=10000)])
+    file = FileField('…или файл (хэшируется потоком)', validators=[Optional()])
     submit = SubmitField('Посчитать хэш')
 
+    # Optional() обрывает цепочку валидаторов, поэтому «хотя бы одно из двух» — здесь
+    def validate(self, extra_validators=None):
+        if not super().validate(extra_validators):
+            return False
+        if not self.text.data and not self.file.data:
+            self.text.errors.append('Введите текст или выберите файл.')
+            return False
+        return True
+
 
 # Админ
 class LabForm(FlaskForm):
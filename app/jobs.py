@@ -0,0 +1,516 @@
+# app/jobs.py
+# -*- coding: utf-8 -*-
+"""
+Фоновые задачи без брокера: очередь — таблица job, исполнители —
+процессы `flask jobs_worker`.
+
+    вьюха:   job = jobs.enqueue('op', {'op': 'rsa.keygen', 'params': {'bits': 4096}}, user_id=...)
+    клиент:  GET /api/v1/jobs/<id> (или /events — поток прогресса SSE)
+    воркер:  claim() -> run_one() -> done | failed | cancelled
+
+- Приоритет: следующей берётся queued-задача с наибольшим priority, при
+  равном — самая старая (индекс ix_job_queue). Захват — условный UPDATE
+  ... WHERE status = 'queued', на PostgreSQL ещё и FOR UPDATE SKIP LOCKED,
+  так что два воркера одну задачу не получат.
+- Прогресс: обработчик зовёт ctx.progress(доля, сообщение); поток-пульс
+  раз в JOB_HEARTBEAT_SECONDS пишет прогресс и heartbeat_at и читает флаг
+  отмены.
+- Отмена: queued-задача отменяется сразу; у running ставится
+  cancel_requested — обработчик получает JobCancelled на ближайшем
+  ctx.progress()/ctx.check(), а результат несотрудничающего выбрасывается.
+- Результат (JSON в job.result, файлы — в JOB_DIR) хранится JOB_RESULT_TTL
+  секунд после завершения, потом задача и её файлы удаляются.
+- Упавший воркер: running-задача без пульса дольше JOB_STALE_SECONDS
+  возвращается в очередь, но не больше JOB_MAX_ATTEMPTS захватов — потом
+  она завершается ошибкой (задача, которая сама роняет воркер, не крутится вечно).
+"""
+
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from hashlib import sha256
+from typing import Callable, Dict, NamedTuple, Optional
+
+from sqlalchemy import select, update
+
+from . import db
+from .metrics import metrics, _labelstr
+from .models import Job, Lab, Submission
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+ACTIVE = (QUEUED, RUNNING)
+FINISHED = (DONE, FAILED, CANCELLED)
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_STALE_SECONDS = 120
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_SECONDS = 1.0
+DEFAULT_HEARTBEAT_SECONDS = 1.0
+DEFAULT_MAX_ACTIVE = 5
+DEFAULT_UPLOAD_BYTES = 256 * 1024 * 1024
+# параметры, которые не храним после завершения задачи — на любой глубине:
+# у 'op' ключ лежит в params.params.key, у pipeline.run — в каждой стадии spec
+SECRET_PARAMS = ('key', 'private_pem')
+
+
+class JobError(ValueError):
+    """Неизвестный тип задачи или неверные параметры."""
+
+
+class JobCancelled(Exception):
+    """Задачу отменили, пока она выполнялась."""
+
+
+class Handler(NamedTuple):
+    fn: Callable[['JobContext'], object]
+    admin_only: bool
+
+
+JOBS: Dict[str, Handler] = {}
+
+
+def job(kind: str, admin_only: bool = False):
+    def deco(fn):
+        JOBS[kind] = Handler(fn, admin_only)
+        return fn
+    return deco
+
+
+class JobContext:
+    """То, что видит обработчик: параметры, каталог файлов, прогресс и отмена."""
+
+    def __init__(self, job_id: int, params: dict, directory: str):
+        self.id = job_id
+        self.params = params
+        self.dir = directory
+        self.fraction = 0.0
+        self.message: Optional[str] = None
+        self.cancel_requested = False
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dir, os.path.basename(name))
+
+    def check(self):
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        self.fraction = max(0.0, min(1.0, float(fraction)))
+        if message is not None:
+            self.message = message[:255]
+        self.check()
+
+
+# ===== Обработчики =====
+
+@job('op')
+def _run_operation(ctx: JobContext):
+    """Любая операция JSON API (rsa.keygen 4096, vigenere.break, ...) — целиком."""
+    from .crypto.operations import run_op
+    name = ctx.params.get('op') or ''
+    ctx.progress(0.0, name)
+    return run_op(name, ctx.params.get('params') or {})
+
+
+@job('aes.file')
+def _aes_file(ctx: JobContext):
+    """Большой файл через потоковый AES; прогресс — по прочитанным байтам."""
+    from .crypto.aes import encrypt_stream, decrypt_stream, read_chunks
+    p = ctx.params
+    src = ctx.path(p['input'])
+    total = os.path.getsize(src) or 1
+    out_name = f'{ctx.id}.out'
+    key = p['key'].encode('utf-8')
+    done = 0
+    try:
+        with open(src, 'rb') as f, open(ctx.path(out_name), 'wb') as out:
+            def chunks():
+                nonlocal done
+                for chunk in read_chunks(f):
+                    done += len(chunk)
+                    ctx.progress(done / total)
+                    yield chunk
+            if p.get('mode') == 'dec':
+                gen = decrypt_stream(chunks(), key)
+            else:
+                gen = encrypt_stream(chunks(), key, p.get('cipher') or 'gcm')
+            for piece in gen:
+                out.write(piece)
+    except BaseException:
+        # недописанный выход не отдаём
+        if os.path.exists(ctx.path(out_name)):
+            os.remove(ctx.path(out_name))
+        raise
+    return {'file': out_name, 'filename': p.get('filename') or out_name,
+            'bytes': os.path.getsize(ctx.path(out_name))}
+
+
+@job('labs.regrade', admin_only=True)
+def _regrade_lab(ctx: JobContext):
+    """Перепроверка всех отправок лабы по текущему answer_hash (после правки ответа)."""
+    from . import stats
+    lab = db.session.get(Lab, int(ctx.params.get('lab_id') or 0))
+    if lab is None:
+        raise JobError('лаба не найдена')
+    expected = lab.answer_hash.lower()
+    total = Submission.query.filter_by(lab_id=lab.id).count() or 1
+    seen = changed = last_id = 0
+    while True:
+        rows = (db.session.query(Submission.id, Submission.submitted_text, Submission.is_correct)
+                .filter(Submission.lab_id == lab.id, Submission.id > last_id)
+                .order_by(Submission.id)
+                .limit(1000)
+                .all())
+        if not rows:
+            break
+        fixes = []
+        for sid, text, ok in rows:
+            new = sha256(text.encode()).hexdigest() == expected
+            if new != bool(ok):
+                fixes.append({'id': sid, 'is_correct': new})
+        if fixes:
+            db.session.bulk_update_mappings(Submission, fixes)
+            db.session.commit()
+            changed += len(fixes)
+        seen += len(rows)
+        last_id = rows[-1][0]
+        ctx.progress(seen / total, f'{seen} отправок')
+    if changed:
+        # счётчики ok/first_solved_at зависят от is_correct — пересобираем
+        # строки этой лабы и итоги её решавших
+        stats.rebuild_lab(lab.id)
+        db.session.commit()
+    return {'checked': seen, 'changed': changed}
+
+
+@job('labs.playfair_check', admin_only=True)
+def _playfair_check(ctx: JobContext):
+    """Решаемость Playfair-лабы без ключа: отжиг до PLAYFAIR_SOLVER_SECONDS."""
+    from flask import current_app
+    from .crypto.playfair_solver import solve_playfair
+    lab = db.session.get(Lab, int(ctx.params.get('lab_id') or 0))
+    if lab is None:
+        raise JobError('лаба не найдена')
+    ctx.progress(0.0, 'подбор ключа')
+    res = solve_playfair(lab.payload, workers=1,
+                         time_limit=current_app.config['PLAYFAIR_SOLVER_SECONDS'])
+    expected = lab.answer_hash.lower()
+    matches = any(sha256(v.encode()).hexdigest() == expected
+                  for v in (res.plaintext, res.plaintext.upper()))
+    return dict(res._asdict(), matches=matches)
+
+
+# ===== Пульс =====
+
+class _Heartbeat(threading.Thread):
+    """Пишет прогресс/heartbeat_at выполняемой задачи и подхватывает отмену."""
+
+    def __init__(self, engine, ctx: JobContext, interval: float):
+        super().__init__(name=f'job-{ctx.id}-heartbeat', daemon=True)
+        self.engine = engine
+        self.ctx = ctx
+        self.interval = interval
+        self._halt = threading.Event()
+
+    def beat(self):
+        t = Job.__table__
+        with self.engine.begin() as conn:
+            conn.execute(update(t).where(t.c.id == self.ctx.id).values(
+                progress=self.ctx.fraction, message=self.ctx.message, heartbeat_at=datetime.utcnow()))
+            if conn.execute(select(t.c.cancel_requested).where(t.c.id == self.ctx.id)).scalar():
+                self.ctx.cancel_requested = True
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            try:
+                self.beat()
+            except Exception:
+                # база моргнула — попробуем на следующем такте
+                pass
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+# ===== Очередь =====
+
+def scrub(value):
+    """Копия value без SECRET_PARAMS во вложенных объектах и списках."""
+    if isinstance(value, dict):
+        return {k: scrub(v) for k, v in value.items() if k not in SECRET_PARAMS}
+    if isinstance(value, list):
+        return [scrub(v) for v in value]
+    return value
+
+
+def _now() -> datetime:
+    return datetime.utcnow()
+
+
+class JobQueue:
+    def __init__(self):
+        self.dir = None
+        self.ttl = DEFAULT_TTL
+        self.stale_seconds = DEFAULT_STALE_SECONDS
+        self.max_attempts = DEFAULT_MAX_ATTEMPTS
+        self.poll_seconds = DEFAULT_POLL_SECONDS
+        self.heartbeat_seconds = DEFAULT_HEARTBEAT_SECONDS
+        self.max_active = DEFAULT_MAX_ACTIVE
+        self.max_upload = DEFAULT_UPLOAD_BYTES
+
+    def init_app(self, app):
+        self.dir = app.config.get('JOB_DIR') or os.path.join(app.instance_path, 'jobs')
+        self.ttl = float(app.config.get('JOB_RESULT_TTL', self.ttl))
+        self.stale_seconds = float(app.config.get('JOB_STALE_SECONDS', self.stale_seconds))
+        self.max_attempts = int(app.config.get('JOB_MAX_ATTEMPTS', self.max_attempts))
+        self.poll_seconds = float(app.config.get('JOB_POLL_SECONDS', self.poll_seconds))
+        self.heartbeat_seconds = float(app.config.get('JOB_HEARTBEAT_SECONDS', self.heartbeat_seconds))
+        self.max_active = int(app.config.get('JOB_MAX_ACTIVE', self.max_active))
+        self.max_upload = int(app.config.get('JOB_UPLOAD_MAX_BYTES', self.max_upload))
+        os.makedirs(self.dir, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dir, os.path.basename(name))
+
+    # ----- со стороны вьюх -----
+
+    def active_count(self, user_id: int) -> int:
+        return Job.query.filter(Job.user_id == user_id, Job.status.in_(ACTIVE)).count()
+
+    def enqueue(self, kind: str, params: dict, user_id: Optional[int] = None, priority: int = 0) -> Job:
+        if kind not in JOBS:
+            raise JobError(f'неизвестный тип задачи {kind!r}')
+        row = Job(kind=kind, params=json.dumps(params, ensure_ascii=False), priority=priority,
+                  user_id=user_id, status=QUEUED)
+        db.session.add(row)
+        db.session.commit()
+        metrics.inc('cryptolab_jobs_total', _labelstr({'kind': kind, 'status': 'queued'}))
+        return row
+
+    def cancel(self, row: Job) -> str:
+        """Отменяет задачу; возвращает новый статус."""
+        now = _now()
+        res = db.session.execute(
+            update(Job).where(Job.id == row.id, Job.status == QUEUED)
+            .values(status=CANCELLED, finished_at=now, expires_at=now + timedelta(seconds=self.ttl)))
+        if not res.rowcount:
+            db.session.execute(update(Job).where(Job.id == row.id, Job.status == RUNNING)
+                               .values(cancel_requested=True))
+        db.session.commit()
+        db.session.refresh(row)
+        return row.status
+
+    # ----- со стороны воркера -----
+
+    def claim(self, worker_id: str, min_priority: Optional[int] = None) -> Optional[Job]:
+        """Забирает следующую задачу (или None, если очередь пуста)."""
+        for _ in range(5):
+            q = select(Job.id).where(Job.status == QUEUED)
+            if min_priority is not None:
+                q = q.where(Job.priority >= min_priority)
+            q = q.order_by(Job.priority.desc(), Job.id).limit(1)
+            if db.session.get_bind().dialect.name == 'postgresql':
+                q = q.with_for_update(skip_locked=True)
+            job_id = db.session.execute(q).scalar()
+            if job_id is None:
+                db.session.commit()
+                return None
+            now = _now()
+            res = db.session.execute(
+                update(Job).where(Job.id == job_id, Job.status == QUEUED)
+                .values(status=RUNNING, worker=worker_id, started_at=now, heartbeat_at=now,
+                        attempts=Job.attempts + 1))
+            db.session.commit()
+            if res.rowcount == 1:
+                return db.session.get(Job, job_id)
+            # задачу перехватил другой воркер — берём следующую
+        return None
+
+    def run_one(self, row: Job):
+        params = json.loads(row.params or '{}')
+        ctx = JobContext(row.id, params, self.dir)
+        beat = _Heartbeat(db.engine, ctx, self.heartbeat_seconds)
+        beat.start()
+        status, result, error = DONE, None, None
+        t0 = time.perf_counter()
+        try:
+            result = JOBS[row.kind].fn(ctx)
+            if ctx.cancel_requested:
+                raise JobCancelled()
+        except JobCancelled:
+            status = CANCELLED
+        except ValueError as e:
+            status, error = FAILED, str(e)
+        except Exception as e:
+            status, error = FAILED, f'{type(e).__name__}: {e}'
+            from flask import current_app
+            current_app.logger.exception('Задача %s (%s) упала', row.id, row.kind)
+        finally:
+            beat.stop()
+        db.session.rollback()
+
+        now = _now()
+        params = scrub(params)
+        # загруженный вход больше не нужен (при сбое воркера сюда не дойдём — он сохранится)
+        if params.get('input'):
+            try:
+                os.remove(self.path(params.pop('input')))
+            except OSError:
+                pass
+        db.session.execute(update(Job).where(Job.id == row.id).values(
+            status=status,
+            result=json.dumps(result, ensure_ascii=False) if status == DONE else None,
+            error=error,
+            progress=1.0 if status == DONE else ctx.fraction,
+            message=ctx.message,
+            params=json.dumps(params, ensure_ascii=False),
+            heartbeat_at=now, finished_at=now, expires_at=now + timedelta(seconds=self.ttl)))
+        db.session.commit()
+        metrics.inc('cryptolab_jobs_total', _labelstr({'kind': row.kind, 'status': status}))
+        metrics.observe('cryptolab_job_duration_seconds', _labelstr({'kind': row.kind}), time.perf_counter() - t0)
+        metrics.flush(force=True)
+        return status
+
+    # ----- обслуживание -----
+
+    def requeue_stale(self) -> int:
+        """
+        running без пульса дольше stale_seconds (воркер умер) — обратно в
+        очередь. Задача, которую уже брали max_attempts раз, скорее всего сама
+        роняет воркер (OOM, segfault) — она завершается с ошибкой.
+        """
+        now = _now()
+        stale = (Job.status == RUNNING, Job.heartbeat_at < now - timedelta(seconds=self.stale_seconds))
+        db.session.execute(
+            update(Job).where(*stale, Job.attempts >= self.max_attempts)
+            .values(status=FAILED, worker=None, finished_at=now,
+                    expires_at=now + timedelta(seconds=self.ttl),
+                    error=f'воркер падал на этой задаче {self.max_attempts} раз подряд'))
+        res = db.session.execute(
+            update(Job).where(*stale)
+            .values(status=QUEUED, worker=None, progress=0.0, message='перезапуск после сбоя воркера'))
+        db.session.commit()
+        return res.rowcount
+
+    def _delete(self, row: Job):
+        """Удаляет задачу и её файлы (вход и результат); commit — за вызывающим."""
+        names = [json.loads(row.params or '{}').get('input')]
+        if row.result:
+            res = json.loads(row.result)
+            names.append(res.get('file') if isinstance(res, dict) else None)
+        for name in filter(None, names):
+            try:
+                os.remove(self.path(name))
+            except OSError:
+                pass
+        db.session.delete(row)
+
+    def purge_expired(self, limit: int = 500) -> int:
+        """Удаляет задачи с истёкшим сроком хранения вместе с их файлами."""
+        rows = (Job.query.filter(Job.expires_at < _now())
+                .order_by(Job.expires_at).limit(limit).all())
+        for row in rows:
+            self._delete(row)
+        db.session.commit()
+        return len(rows)
+
+    def forget_user(self, user_id: int) -> int:
+        """
+        Перед удалением пользователя: его задачи и файлы удаляются сразу,
+        а выполняющиеся отвязываются (user_id = NULL) с просьбой отмены —
+        воркер допишет их статус, файлы уберёт purge_expired. Commit — за вызывающим.
+        """
+        db.session.execute(update(Job).where(Job.user_id == user_id, Job.status == RUNNING)
+                           .values(user_id=None, cancel_requested=True))
+        rows = Job.query.filter(Job.user_id == user_id).all()
+        for row in rows:
+            self._delete(row)
+        return len(rows)
+
+    def maintain(self):
+        n = self.requeue_stale()
+        m = self.purge_expired()
+        return n, m
+
+    # ----- процессы воркеров -----
+
+    def _worker_main(self, app, stop, min_priority):
+        from .crypto.rsa_pool import key_pool
+        with app.app_context():
+            # соединения родителя не наши; ключи RSA генерируем на месте
+            db.engine.dispose(close=False)
+            key_pool.depth = 0
+            worker_id = f'{socket.gethostname()}:{os.getpid()}'
+            while not stop.is_set():
+                try:
+                    row = self.claim(worker_id, min_priority)
+                    if row is None:
+                        stop.wait(self.poll_seconds)
+                        continue
+                    self.run_one(row)
+                except Exception:
+                    app.logger.exception('jobs_worker: ошибка цикла')
+                    db.session.rollback()
+                    stop.wait(self.poll_seconds)
+                finally:
+                    db.session.remove()
+
+    def serve(self, app, concurrency: int, min_priority: Optional[int] = None,
+              graceful: float = 30.0, echo: Callable[[str], None] = print):
+        """
+        Держит concurrency процессов-исполнителей, перезапускает упавшие,
+        раз в полминуты обслуживает очередь. TERM/INT — доделать текущие
+        задачи (до graceful секунд) и выйти.
+        """
+        mp = multiprocessing.get_context('fork')
+        stop = mp.Event()
+        # в обработчике только флаг: stop.set() из обработчика, прерывающего
+        # stop.wait() того же потока, может зависнуть на условии Event
+        signalled = []
+        signal.signal(signal.SIGTERM, lambda *a: signalled.append(1))
+        signal.signal(signal.SIGINT, lambda *a: signalled.append(1))
+        procs = [None] * concurrency
+        last_maintain = 0.0
+        with app.app_context():
+            db.engine.dispose()
+        while not signalled:
+            for i, p in enumerate(procs):
+                if p is None or not p.is_alive():
+                    if p is not None:
+                        echo(f'[!] воркер {p.pid} завершился с кодом {p.exitcode}, перезапуск')
+                        metrics.reap(p.pid)
+                    procs[i] = mp.Process(target=self._worker_main, args=(app, stop, min_priority),
+                                          name=f'jobs-worker-{i}', daemon=False)
+                    procs[i].start()
+            if time.monotonic() - last_maintain > 30:
+                last_maintain = time.monotonic()
+                with app.app_context():
+                    requeued, purged = self.maintain()
+                    db.session.remove()
+                if requeued or purged:
+                    echo(f'[i] возвращено в очередь: {requeued}, удалено устаревших: {purged}')
+            time.sleep(1.0)
+        stop.set()
+        echo('[i] остановка: ждём текущие задачи')
+        deadline = time.monotonic() + graceful
+        for p in procs:
+            if p is not None:
+                p.join(max(0.0, deadline - time.monotonic()))
+                if p.is_alive():
+                    # задача останется running и вернётся в очередь по requeue_stale
+                    p.terminate()
+                    p.join()
+                metrics.reap(p.pid)
+
+
+jobs = JobQueue()
+
+metrics.counter('cryptolab_jobs_total', 'Фоновые задачи по типу и статусу')
+metrics.histogram('cryptolab_job_duration_seconds', 'Время выполнения фоновой задачи по типу',
+                  (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
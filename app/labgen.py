@@ -0,0 +1,298 @@
+# app/labgen.py
+# -*- coding: utf-8 -*-
+"""
+Массовая генерация лаб: flask generate_labs.
+
+Лаба = фрагмент корпуса, зашифрованный по шаблону алгоритма (TEMPLATES)
+со случайным ключом из заданного диапазона:
+
+    flask generate_labs -n 500 -a caesar -a vigenere --key vigenere=4-7 --seed 2026
+
+- Открытый текст — случайное окно корпуса (по умолчанию
+  app/crypto/data/corpus_{en,ru}.txt) длиной --length символов,
+  по границам слов, в одну строку (ответ вводится в однострочное поле).
+- answer_hash — SHA-256 hex ответа, как его проверяет solve_lab; каждая
+  лаба перед вставкой расшифровывается обратно и сверяется с ответом.
+- Варианты считаются в процессах (ProcessPoolExecutor) пачками по
+  --batch; мастер вставляет пачку одним executemany и одним commit.
+- Один и тот же --seed даёт те же лабы (пачка получает свой Random от
+  seed, алгоритма и номера пачки).
+"""
+
+import os
+import random
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from hashlib import sha256
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .crypto.aes import decrypt_cbc, encrypt_cbc
+from .crypto.analysis import detect_lang
+from .crypto.caesar import caesar_decrypt, caesar_encrypt
+from .crypto.playfair import LAT_ALPH, RUS_ALPH, playfair_decrypt, playfair_encrypt
+from .crypto.playfair_solver import DEFAULT_CORPUS
+from .crypto.railfence import railfence_decrypt, railfence_encrypt
+from .crypto.rc4 import rc4_decrypt, rc4_encrypt
+from .crypto.vigenere import vigenere
+
+DEFAULT_BATCH = 500
+DEFAULT_LENGTH = (80, 200)
+AES_KEY_SIZES = (16, 24, 32)
+# буквы для случайных ключей Виженера и Playfair (без ё)
+KEY_LETTERS = {'en': 'abcdefghijklmnopqrstuvwxyz', 'ru': RUS_ALPH}
+PLAYFAIR_LETTERS = {'en': LAT_ALPH, 'ru': RUS_ALPH}  # j -> i в латинской таблице
+# печатные ASCII без пробела и кавычек — ключ RC4/AES вводится в поле формы
+KEY_CHARS = ''.join(chr(c) for c in range(33, 127) if chr(c) not in '"\'`\\')
+
+# Диапазоны ключей по умолчанию: сдвиг, длина ключа, число рельсов, байты AES
+DEFAULT_KEYS: Dict[str, Tuple[int, int]] = {
+    'caesar': (1, 25),
+    'vigenere': (3, 8),
+    'playfair': (5, 10),
+    'railfence': (2, 6),
+    'rc4': (5, 16),
+    'aes': (16, 32),
+}
+
+
+class Variant(NamedTuple):
+    payload: str
+    answer: str
+    params: dict  # для текста задания (ключ, если он выдаётся студенту)
+
+
+class LabTemplate(NamedTuple):
+    title: str
+    description: str  # str.format(lo=, hi=, **Variant.params)
+    make: Callable[[random.Random, str, str, Tuple[int, int]], Variant]
+    check: Callable[[Variant], str]  # расшифровка payload — должна совпасть с answer
+
+
+class LabGenError(ValueError):
+    """Неверные параметры генерации."""
+
+
+# ===== Шаблоны =====
+
+def _make_caesar(rng, text, lang, keys):
+    shift = rng.randint(*keys)
+    return Variant(caesar_encrypt(text, shift), text, {'shift': shift})
+
+
+def _make_vigenere(rng, text, lang, keys):
+    key = ''.join(rng.choice(KEY_LETTERS[lang]) for _ in range(rng.randint(*keys)))
+    return Variant(vigenere(text, key, encrypt=True), text, {'key': key})
+
+
+def _make_playfair(rng, text, lang, keys):
+    key = ''.join(rng.choice(PLAYFAIR_LETTERS[lang]) for _ in range(rng.randint(*keys)))
+    payload = playfair_encrypt(text, key)
+    # Playfair теряет пробелы/регистр и вставляет x/х — ответ в том виде,
+    # в котором его выдаёт расшифровка песочницы
+    return Variant(payload, playfair_decrypt(payload, key), {'key': key})
+
+
+def _make_railfence(rng, text, lang, keys):
+    rails = rng.randint(*keys)
+    return Variant(railfence_encrypt(text, rails), text, {'rails': rails})
+
+
+def _random_key(rng, length: int) -> str:
+    return ''.join(rng.choice(KEY_CHARS) for _ in range(length))
+
+
+def _make_rc4(rng, text, lang, keys):
+    key = _random_key(rng, rng.randint(*keys))
+    return Variant(rc4_encrypt(text, key), text, {'key': key})
+
+
+def _make_aes(rng, text, lang, keys):
+    sizes = [n for n in AES_KEY_SIZES if keys[0] <= n <= keys[1]]
+    key = _random_key(rng, rng.choice(sizes))
+    # IV берётся из os.urandom — payload не воспроизводим по seed, ответ и ключ — да
+    return Variant(encrypt_cbc(text, key.encode('utf-8')), text, {'key': key})
+
+
+TEMPLATES: Dict[str, LabTemplate] = {
+    'caesar': LabTemplate(
+        'Цезарь',
+        'Текст зашифрован шифром Цезаря с неизвестным сдвигом ({lo}–{hi}). '
+        'Ответ — исходный текст целиком.',
+        _make_caesar,
+        lambda v: caesar_decrypt(v.payload, v.params['shift'])),
+    'vigenere': LabTemplate(
+        'Виженер',
+        'Текст зашифрован шифром Виженера, длина ключа от {lo} до {hi} букв. '
+        'Ответ — исходный текст целиком.',
+        _make_vigenere,
+        lambda v: vigenere(v.payload, v.params['key'], encrypt=False)),
+    'playfair': LabTemplate(
+        'Playfair',
+        'Текст зашифрован шифром Playfair, ключевое слово из {lo}–{hi} случайных букв. '
+        'Ответ — расшифровка в виде, который выдаёт песочница Playfair '
+        '(строчные буквы без пробелов, со вставленными x/х).',
+        _make_playfair,
+        lambda v: playfair_decrypt(v.payload, v.params['key'])),
+    'railfence': LabTemplate(
+        'Забор',
+        'Текст переставлен шифром «забор» (rail fence) на {lo}–{hi} рельсов, смещение 0; '
+        'пробелы и знаки препинания участвуют в зигзаге. Ответ — исходный текст целиком.',
+        _make_railfence,
+        lambda v: railfence_decrypt(v.payload, v.params['rails'])),
+    'rc4': LabTemplate(
+        'RC4',
+        'Payload — Base64 шифртекста RC4, ключ (UTF-8): {key}\n'
+        'Ответ — открытый текст.',
+        _make_rc4,
+        lambda v: rc4_decrypt(v.payload, v.params['key'])),
+    'aes': LabTemplate(
+        'AES-CBC',
+        'Payload — Base64(IV || шифртекст) AES-CBC с PKCS#7, ключ (UTF-8): {key}\n'
+        'Ответ — открытый текст.',
+        _make_aes,
+        lambda v: decrypt_cbc(v.payload, v.params['key'].encode('utf-8'))),
+}
+
+
+# ===== Параметры =====
+
+def parse_range(value: str) -> Tuple[int, int]:
+    """'5' -> (5, 5), '3-8' -> (3, 8)."""
+    lo, _, hi = value.partition('-')
+    try:
+        lo, hi = int(lo), int(hi or lo)
+    except ValueError:
+        raise LabGenError(f'диапазон должен быть N или N-M: {value!r}')
+    if lo > hi:
+        lo, hi = hi, lo
+    return lo, hi
+
+
+def key_ranges(overrides: Sequence[str] = ()) -> Dict[str, Tuple[int, int]]:
+    """DEFAULT_KEYS с заменами вида 'vigenere=4-7'."""
+    ranges = dict(DEFAULT_KEYS)
+    for item in overrides:
+        algo, sep, value = item.partition('=')
+        if not sep or algo not in TEMPLATES:
+            raise LabGenError(f'--key: ожидается алгоритм=N-M ({"|".join(TEMPLATES)}): {item!r}')
+        ranges[algo] = parse_range(value)
+    if ranges['caesar'][0] < 1:
+        raise LabGenError('caesar: сдвиг от 1')
+    for algo in ('vigenere', 'playfair', 'rc4'):
+        if ranges[algo][0] < 1:
+            raise LabGenError(f'{algo}: длина ключа от 1')
+    if ranges['railfence'][0] < 2:
+        raise LabGenError('railfence: рельсов от 2')
+    if not any(ranges['aes'][0] <= n <= ranges['aes'][1] for n in AES_KEY_SIZES):
+        raise LabGenError(f'aes: в диапазон должен попасть размер ключа {AES_KEY_SIZES}')
+    return ranges
+
+
+# ===== Корпус =====
+
+@lru_cache(maxsize=8)
+def load_corpus(path: str) -> Tuple[str, Tuple[str, ...]]:
+    """(язык, слова) — корпус читается один раз на процесс."""
+    with open(path, encoding='utf-8') as f:
+        words = tuple(re.split(r'\s+', f.read().strip()))
+    lang = detect_lang(' '.join(words[:2000]))
+    return lang, words
+
+
+def sample_text(rng: random.Random, words: Sequence[str], length: Tuple[int, int]) -> str:
+    """Случайное окно корпуса длиной length символов по границам слов."""
+    target = rng.randint(*length)
+    start = rng.randrange(len(words))
+    out: List[str] = []
+    size = 0
+    i = start
+    while size < target:
+        w = words[i % len(words)]
+        out.append(w)
+        size += len(w) + 1
+        i += 1
+    return ' '.join(out)
+
+
+# ===== Генерация =====
+
+class Chunk(NamedTuple):
+    algo: str
+    start: int  # номер первого варианта пачки (для заголовков)
+    count: int
+    seed: int
+    corpora: Tuple[str, ...]
+    keys: Tuple[int, int]
+    length: Tuple[int, int]
+    prefix: str
+
+
+def generate_chunk(chunk: Chunk) -> List[dict]:
+    """Строки для insert(Lab): выполняется в процессе пула."""
+    tpl = TEMPLATES[chunk.algo]
+    rng = random.Random(f'{chunk.seed}:{chunk.algo}:{chunk.start}')
+    corpora = [load_corpus(p) for p in chunk.corpora]
+    rows = []
+    for n in range(chunk.start, chunk.start + chunk.count):
+        lang, words = rng.choice(corpora)
+        variant = tpl.make(rng, sample_text(rng, words, chunk.length), lang, chunk.keys)
+        if tpl.check(variant) != variant.answer:
+            raise LabGenError(f'{chunk.algo}: вариант {n + 1} не расшифровывается обратно')
+        params = dict(variant.params, lo=chunk.keys[0], hi=chunk.keys[1])
+        rows.append({
+            'title': f'{chunk.prefix}{tpl.title} — вариант {n + 1}',
+            'description': tpl.description.format(**params),
+            'algorithm': chunk.algo,
+            'payload': variant.payload,
+            'answer_hash': sha256(variant.answer.encode()).hexdigest(),
+        })
+    return rows
+
+
+def plan(algos: Sequence[str], count: int, seed: int, corpora: Sequence[str],
+         keys: Dict[str, Tuple[int, int]], length: Tuple[int, int] = DEFAULT_LENGTH,
+         prefix: str = '', batch: int = DEFAULT_BATCH) -> List[Chunk]:
+    """Делит count вариантов каждого алгоритма на пачки по batch."""
+    unknown = [a for a in algos if a not in TEMPLATES]
+    if unknown:
+        raise LabGenError(f'неизвестные алгоритмы: {", ".join(unknown)} ({"|".join(TEMPLATES)})')
+    if count < 1 or batch < 1:
+        raise LabGenError('--count и --batch должны быть положительными')
+    if length[0] < 1:
+        raise LabGenError('--length: от 1 символа')
+    corpora = tuple(os.path.abspath(p) for p in (corpora or DEFAULT_CORPUS.values()))
+    return [Chunk(a, start, min(batch, count - start), seed, corpora, keys[a], length, prefix)
+            for a in algos for start in range(0, count, batch)]
+
+
+def generate(chunks: Sequence[Chunk], workers: Optional[int] = None) -> Iterator[List[dict]]:
+    """Пачки строк в порядке chunks; workers=1 — без пула."""
+    if workers == 1 or len(chunks) == 1:
+        for chunk in chunks:
+            yield generate_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(generate_chunk, chunks)
+
+
+def insert_batches(batches: Iterator[List[dict]],
+                   progress: Optional[Callable[[int], None]] = None) -> int:
+    """Вставка: одна пачка = один executemany и один commit. Возвращает число лаб."""
+    from sqlalchemy import insert
+
+    from . import db
+    from .models import Lab
+
+    total = 0
+    for rows in batches:
+        try:
+            db.session.execute(insert(Lab), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        total += len(rows)
+        if progress:
+            progress(total)
+    return total
@@ -0,0 +1,321 @@
+# app/metrics.py
+# -*- coding: utf-8 -*-
+"""
+Метрики в текстовом формате Prometheus без внешних зависимостей.
+
+- init_app(app): хуки запроса — гистограмма латентности и счётчик ответов
+  по endpoint/method/status, число SQL-запросов на запрос.
+- @instrument(algorithm, op): латентность и длина входа точек входа
+  app/crypto; metrics.timer(...) — для произвольного блока (генерация RSA).
+
+Несколько воркеров: если задан METRICS_DIR, каждый процесс раз в
+METRICS_FLUSH_SECONDS (и при выходе) сбрасывает свои значения в
+METRICS_DIR/metrics_<pid>.json (атомарно, через os.replace), а
+/admin/metrics суммирует все файлы плюс живые значения текущего процесса.
+Файл завершившегося процесса reap() вливает в metrics_exited.json —
+счётчики не убывают, а каталог не растёт с каждым перезапуском воркера;
+зовут его мастер gunicorn (child_exit) и flask jobs_worker. Каталог
+чистится при старте сервера.
+"""
+
+import atexit
+import glob
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+KEYGEN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+DEFAULT_FLUSH_SECONDS = 1.0
+# metrics_exited.json — сумма по завершившимся процессам
+EXITED = 'exited'
+_PID_FILE = re.compile(r'metrics_(\d+)\.json$')
+
+
+def _labelstr(labels: Dict[str, object]) -> str:
+    return ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                    for k, v in sorted(labels.items()))
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {}
+        self._pid = os.getpid()
+        self._values: Dict[str, Dict[str, list]] = {}
+        self.dir: Optional[str] = None
+        self.flush_seconds = DEFAULT_FLUSH_SECONDS
+        self._last_flush = 0.0
+        self._hooked = False
+
+    # ===== Описание метрик =====
+
+    def counter(self, name: str, help_text: str):
+        self._meta[name] = ('counter', help_text, ())
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float]):
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+
+    def gauge(self, name: str, help_text: str):
+        """Текущее значение процесса; в /admin/metrics — сумма по процессам."""
+        self._meta[name] = ('gauge', help_text, ())
+
+    # ===== Запись =====
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            # после fork значения родителя не наши — иначе посчитаем дважды
+            self._pid = os.getpid()
+            self._values = {}
+            self._last_flush = 0.0
+
+    def _series(self, name: str, labels: str) -> list:
+        self._check_fork()
+        kind, _, buckets = self._meta[name]
+        by_label = self._values.setdefault(name, {})
+        s = by_label.get(labels)
+        if s is None:
+            # counter/gauge: [value]; histogram: [b1..bN, +Inf, sum]
+            s = by_label[labels] = [0] if kind != 'histogram' else [0] * (len(buckets) + 1) + [0.0]
+        return s
+
+    def inc(self, name: str, labels: str = '', value: float = 1):
+        with self._lock:
+            self._series(name, labels)[0] += value
+
+    def set(self, name: str, labels: str, value: float):
+        with self._lock:
+            self._series(name, labels)[0] = value
+
+    def observe(self, name: str, labels: str, value: float):
+        buckets = self._meta[name][2]
+        i = 0
+        while i < len(buckets) and value > buckets[i]:
+            i += 1
+        with self._lock:
+            s = self._series(name, labels)
+            s[i] += 1
+            s[-1] += value
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, _labelstr(labels), time.perf_counter() - t0)
+
+    # ===== Несколько процессов =====
+
+    def _path(self, pid) -> str:
+        return os.path.join(self.dir, f'metrics_{pid}.json')
+
+    @staticmethod
+    def _load(path: str) -> Optional[dict]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save(path: str, data: str):
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def flush(self, force: bool = False):
+        if not self.dir:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_seconds:
+            return
+        self._last_flush = now
+        with self._lock:
+            self._check_fork()
+            data = json.dumps(self._values)
+        self._save(self._path(os.getpid()), data)
+
+    def reap(self, pid: Optional[int] = None) -> int:
+        """
+        Вливает файл завершившегося процесса pid (без pid — всех, кого уже
+        нет) в metrics_exited.json и удаляет его. Гауги умершего процесса
+        отбрасываются. Возвращает число влитых файлов.
+        """
+        if not self.dir:
+            return 0
+        if pid is not None:
+            paths = [self._path(pid)]
+        else:
+            paths = []
+            for path in glob.glob(os.path.join(self.dir, 'metrics_*.json')):
+                m = _PID_FILE.search(path)
+                if m and int(m.group(1)) != os.getpid() and not _alive(int(m.group(1))):
+                    paths.append(path)
+        archive_path = self._path(EXITED)
+        archive = self._load(archive_path) or {}
+        merged = []
+        for path in paths:
+            data = self._load(path)
+            if data is None:
+                continue
+            _merge(archive, {name: series for name, series in data.items()
+                             if name in self._meta and self._meta[name][0] != 'gauge'})
+            merged.append(path)
+        if merged:
+            self._save(archive_path, json.dumps(archive))
+            for path in merged:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return len(merged)
+
+    def collect(self) -> Dict[str, Dict[str, list]]:
+        """Сумма по всем процессам: файлы других воркеров + свои живые значения."""
+        with self._lock:
+            self._check_fork()
+            merged = {name: {k: list(v) for k, v in series.items()} for name, series in self._values.items()}
+        if not self.dir:
+            return merged
+        own = self._path(os.getpid())
+        for path in glob.glob(os.path.join(self.dir, 'metrics_*.json')):
+            if path == own:
+                continue
+            other = self._load(path)
+            if other is not None:
+                _merge(merged, {name: series for name, series in other.items() if name in self._meta})
+        return merged
+
+    # ===== Экспорт =====
+
+    def render(self) -> str:
+        data = self.collect()
+        lines: List[str] = []
+        for name in sorted(self._meta):
+            kind, help_text, buckets = self._meta[name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, vals in sorted(data.get(name, {}).items()):
+                if kind != 'histogram':
+                    lines.append(f'{name}{{{labels}}} {vals[0]}' if labels else f'{name} {vals[0]}')
+                    continue
+                sep = ',' if labels else ''
+                acc = 0
+                for b, n in zip(buckets, vals):
+                    acc += n
+                    lines.append(f'{name}_bucket{{{labels}{sep}le="{b}"}} {acc}')
+                count = acc + vals[len(buckets)]
+                lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {vals[-1]}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    # ===== Flask =====
+
+    def init_app(self, app):
+        from flask import g, has_request_context, request
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        self.dir = app.config.get('METRICS_DIR') or None
+        self.flush_seconds = float(app.config.get('METRICS_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS))
+        if self.dir:
+            os.makedirs(self.dir, exist_ok=True)
+
+        if not self._hooked:
+            # последнее окно не теряем; воркеры gunicorn — ещё и worker_exit (app/server.py)
+            atexit.register(self.flush, True)
+
+            @event.listens_for(Engine, 'before_cursor_execute')
+            def _count_query(conn, cursor, statement, parameters, context, executemany):
+                self.inc('cryptolab_db_queries_total')
+                if has_request_context() and '_metrics_queries' in g:
+                    g._metrics_queries += 1
+
+            self._hooked = True
+
+        @app.before_request
+        def _metrics_start():
+            g._metrics_t0 = time.perf_counter()
+            g._metrics_queries = 0
+
+        @app.after_request
+        def _metrics_stop(response):
+            t0 = g.pop('_metrics_t0', None)
+            if t0 is not None:
+                endpoint = request.endpoint or 'unknown'
+                route = _labelstr({'endpoint': endpoint, 'method': request.method})
+                self.observe('cryptolab_http_request_duration_seconds', route, time.perf_counter() - t0)
+                self.inc('cryptolab_http_requests_total',
+                         _labelstr({'endpoint': endpoint, 'method': request.method,
+                                    'status': response.status_code}))
+                self.observe('cryptolab_db_queries_per_request', _labelstr({'endpoint': endpoint}),
+                             g.pop('_metrics_queries', 0))
+            self.flush()
+            return response
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(dst: Dict[str, Dict[str, list]], src: Dict[str, Dict[str, list]]):
+    """Поэлементно прибавляет ряды src к dst."""
+    for name, series in src.items():
+        out = dst.setdefault(name, {})
+        for labels, vals in series.items():
+            cur = out.get(labels)
+            if cur is None or len(cur) != len(vals):
+                out[labels] = list(vals)
+            else:
+                for i, v in enumerate(vals):
+                    cur[i] += v
+
+
+metrics = Metrics()
+
+metrics.histogram('cryptolab_http_request_duration_seconds',
+                  'Время обработки запроса по endpoint/method', LATENCY_BUCKETS)
+metrics.counter('cryptolab_http_requests_total', 'Ответы по endpoint/method/status')
+metrics.histogram('cryptolab_db_queries_per_request', 'SQL-запросов на один HTTP-запрос', QUERY_BUCKETS)
+metrics.counter('cryptolab_db_queries_total', 'Всего SQL-запросов')
+metrics.histogram('cryptolab_crypto_duration_seconds',
+                  'Время вызова функций app/crypto по алгоритму/операции', LATENCY_BUCKETS)
+metrics.histogram('cryptolab_crypto_input_length',
+                  'Длина входа (символов/байт) функций app/crypto', SIZE_BUCKETS)
+metrics.histogram('cryptolab_rsa_keygen_seconds', 'Время генерации пары RSA по размеру', KEYGEN_BUCKETS)
+
+
+def instrument(algorithm: str, op: str):
+    """Декоратор точки входа app/crypto: латентность и длина первого str/bytes-аргумента."""
+    labels = _labelstr({'algorithm': algorithm, 'op': op})
+
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.observe('cryptolab_crypto_duration_seconds', labels, time.perf_counter() - t0)
+                data = next((a for a in args if isinstance(a, (str, bytes))), None)
+                if data is not None:
+                    metrics.observe('cryptolab_crypto_input_length', labels, len(data))
+        return wrapper
+    return deco
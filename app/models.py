@@ -1,7 +1,6 @@
 from . import db, login_manager
 from flask_login import UserMixin
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash  # <-- добавь
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -11,13 +10,18 @@ class User(db.Model, UserMixin):
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     submissions = db.relationship('Submission', backref='author', lazy=True)
+    # списки в админке: ORDER BY created_at DESC, id DESC (app/pagination.py)
+    __table_args__ = (db.Index('ix_user_created', 'created_at', 'id'),)
 
     # ===== работа с паролем =====
+    # хэш считается в пуле процессов по политике PASSWORD_HASH_METHOD (app/passwords.py)
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        from .passwords import passwords
+        self.password_hash = passwords.hash(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        from .passwords import passwords
+        return passwords.verify(self.password_hash, password)
 
     def __repr__(self):
         return f"<User {self.email}>"
@@ -30,6 +34,7 @@ class Lab(db.Model):
     payload = db.Column(db.Text, nullable=False)          # входные данные/задание
     answer_hash = db.Column(db.String(128), nullable=False)  # ожидаемый ответ (SHA-256)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.Index('ix_lab_created', 'created_at', 'id'),)
 
 class Submission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -39,7 +44,65 @@ class Submission(db.Model):
     is_correct = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     lab = db.relationship('Lab', backref='submissions')
+    __table_args__ = (
+        # история пользователя: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        db.Index('ix_submission_user_created', 'user_id', 'created_at', 'id'),
+        # отправки по лабе (удаление лабы, выборки по лабе)
+        db.Index('ix_submission_lab_created', 'lab_id', 'created_at'),
+    )
+
+# Счётчики решений, которые обновляются при каждой вставке Submission
+# (app/stats.py) и пересобираются командой rebuild_stats
+class UserStats(db.Model):
+    __tablename__ = 'user_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    ok = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    first_solved_at = db.Column(db.DateTime, nullable=True)
+    user = db.relationship('User')
+    # рейтинг на дашборде: ORDER BY ok DESC, total DESC LIMIT n
+    __table_args__ = (db.Index('ix_user_stats_rank', 'ok', 'total'),)
+
+class UserLabStats(db.Model):
+    __tablename__ = 'user_lab_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    lab_id = db.Column(db.Integer, db.ForeignKey('lab.id'), primary_key=True)
+    ok = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    first_solved_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (db.Index('ix_user_lab_stats_lab', 'lab_id'),)
+
+# Фоновые задачи (app/jobs.py): очередь в самой базе, без брокера
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)           # 'op' | 'aes.file' | 'labs.regrade'
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    priority = db.Column(db.Integer, nullable=False, default=0)  # больше — раньше
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued|running|done|failed|cancelled
+    progress = db.Column(db.Float, nullable=False, default=0.0)  # 0..1
+    message = db.Column(db.String(255), nullable=True)
+    result = db.Column(db.Text, nullable=True)                 # JSON
+    error = db.Column(db.Text, nullable=True)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # сколько раз задачу брал воркер
+    worker = db.Column(db.String(100), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True)         # после — задача и файлы удаляются
+    __table_args__ = (
+        # выборка следующей: WHERE status = 'queued' ORDER BY priority DESC, id
+        db.Index('ix_job_queue', 'status', 'priority', 'id'),
+        db.Index('ix_job_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_job_expires', 'expires_at'),
+    )
+
+from .user_cache import user_cache, register_events
+register_events(User)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # снимок из кэша процесса — без запроса к БД на каждый запрос (app/user_cache.py)
+    return user_cache.load(int(user_id))
@@ -0,0 +1,187 @@
+# app/page_cache.py
+# -*- coding: utf-8 -*-
+"""
+Кэш отрендеренных GET-страниц песочниц и лаб со строгими ETag.
+
+Страница GET /playground/*, /labs, /labs/<id> меняется только когда
+правят лабы или меняется пользователь, поэтому готовый HTML хранится в
+LRU процесса, ограниченном по размеру (PAGE_CACHE_BYTES). Ключ:
+
+    endpoint с аргументами URL (/labs/1 и /labs/2 — разные записи) +
+    query string, пользователь и его роль (шапка показывает
+    email и ссылку в админку), CSRF-токен сессии (он вшит в формы),
+    для лаб — версия лаб.
+
+Ответ идёт с ETag = SHA-256 тела и Cache-Control: private, no-cache —
+браузер каждый раз переспрашивает с If-None-Match и при совпадении
+получает пустой 304.
+
+Версия лаб — mtime файла PAGE_CACHE_STAMP, общего для воркеров хоста:
+labs_new/labs_edit/labs_delete зовут invalidate('labs'), файл
+обновляется, и все процессы перестают попадать в старые записи.
+
+Не кэшируется: не-GET, запросы с ожидающими flash-сообщениями, сессии
+без CSRF-токена. Записи живут не дольше PAGE_CACHE_TTL — меньше срока
+жизни CSRF-токена в форме.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Optional
+
+from flask import Response, current_app, request, session
+from flask_login import current_user
+
+from .metrics import metrics
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL = 600.0
+
+
+class PageCache:
+    def __init__(self):
+        self.enabled = True
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self.ttl = DEFAULT_TTL
+        self.stamp = os.path.join(tempfile.gettempdir(), 'cryptolab_pages.stamp')
+        self._lock = threading.Lock()
+        # key -> (expires, body, etag, mimetype)
+        self._items: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._bytes = 0
+        self._local_version = 0
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('PAGE_CACHE_ENABLED', True))
+        self.max_bytes = int(app.config.get('PAGE_CACHE_BYTES', self.max_bytes))
+        ttl = float(app.config.get('PAGE_CACHE_TTL', self.ttl))
+        csrf_limit = app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+        # токен в закэшированной форме должен оставаться действительным
+        self.ttl = min(ttl, csrf_limit / 2) if csrf_limit else ttl
+        self.stamp = app.config.get('PAGE_CACHE_STAMP') or self.stamp
+        self.clear()
+
+    # ===== Версия лаб =====
+
+    def version(self, scope: Optional[str]) -> tuple:
+        if scope != 'labs':
+            return ()
+        try:
+            st = os.stat(self.stamp)
+            # размер растёт на байт за сброс — не зависит от точности mtime ФС
+            shared = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            shared = (0, 0)
+        return shared + (self._local_version,)
+
+    def invalidate(self, scope: str = 'labs'):
+        """Сдвигает версию: в этом процессе сразу, в остальных — через файл-метку."""
+        self._local_version += 1
+        try:
+            with open(self.stamp, 'ab') as f:
+                f.write(b'.')
+        except OSError:
+            current_app.logger.exception('page_cache: не удалось обновить %s', self.stamp)
+        metrics.inc('cryptolab_page_cache_invalidations_total', f'scope="{scope}"')
+
+    # ===== LRU =====
+
+    def _get(self, key) -> Optional[tuple]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] <= now:
+                self._drop(key)
+                return None
+            self._items.move_to_end(key)
+            return item
+
+    def _drop(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._bytes -= len(item[1])
+
+    def _put(self, key, body: bytes, etag: str, mimetype: str):
+        if len(body) > self.max_bytes // 8:
+            return  # одна огромная страница не должна вытеснять всё остальное
+        with self._lock:
+            self._drop(key)
+            self._items[key] = (time.monotonic() + self.ttl, body, etag, mimetype)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes and self._items:
+                old, _ = next(iter(self._items.items()))
+                self._drop(old)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._items), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+    # ===== Flask =====
+
+    def _key(self, scope: Optional[str]) -> Optional[tuple]:
+        token = session.get('csrf_token', '')
+        if session.get('_flashes'):
+            return None
+        if not token and current_app.config.get('WTF_CSRF_ENABLED', True):
+            return None
+        user = (current_user.id, bool(getattr(current_user, 'is_admin', False))) \
+            if current_user.is_authenticated else (None, False)
+        args = tuple(sorted((request.view_args or {}).items()))
+        return (request.endpoint, args, request.query_string, user,
+                hashlib.sha256(str(token).encode()).hexdigest()[:16], self.version(scope))
+
+    @staticmethod
+    def _respond(body: bytes, etag: str, mimetype: str) -> Response:
+        resp = Response(body, mimetype=mimetype)
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        return resp.make_conditional(request)
+
+    def cached(self, scope: Optional[str] = None):
+        """Декоратор GET-вьюхи; scope='labs' — страница зависит от лаб."""
+        def deco(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+                flashed = bool(session.get('_flashes'))
+                # из кэша flash-сообщение не показалось бы
+                key = None if flashed else self._key(scope)
+                if key is not None:
+                    item = self._get(key)
+                    if item is not None:
+                        metrics.inc('cryptolab_page_cache_total', 'result="hit"')
+                        return self._respond(item[1], item[2], item[3])
+                metrics.inc('cryptolab_page_cache_total', 'result="miss"')
+                rv = current_app.make_response(view(*args, **kwargs))
+                if rv.status_code != 200 or rv.direct_passthrough:
+                    return rv
+                body = rv.get_data()
+                etag = hashlib.sha256(body).hexdigest()
+                # ключ — после рендера: он мог завести CSRF-токен в сессии;
+                # страницу с показанными flash-сообщениями не храним
+                key = key or (None if flashed else self._key(scope))
+                if key is not None:
+                    self._put(key, body, etag, rv.mimetype)
+                rv.set_etag(etag)
+                rv.headers['Cache-Control'] = 'private, no-cache'
+                return rv.make_conditional(request)
+            return wrapper
+        return deco
+
+
+page_cache = PageCache()
+
+metrics.counter('cryptolab_page_cache_total', 'GET-страницы из кэша: hit/miss')
+metrics.counter('cryptolab_page_cache_invalidations_total', 'Сбросы версии кэша страниц')
@@ -0,0 +1,119 @@
+# app/pagination.py
+# -*- coding: utf-8 -*-
+"""
+Keyset-пагинация (seek) для списков в профиле и админке.
+
+Список упорядочен по убыванию ключа (например, (created_at, id)), а
+страница продолжается с последнего показанного ключа:
+
+    WHERE (created_at, id) < (:last_created_at, :last_id)
+    ORDER BY created_at DESC, id DESC LIMIT :per_page + 1
+
+В отличие от OFFSET стоимость не растёт с номером страницы (индекс
+ix_*_created и т.п. из миграции 0003), а вставки в начало списка не
+сдвигают уже открытые страницы — строки не дублируются и не теряются.
+
+Курсор — непрозрачная строка (urlsafe Base64 от JSON): направление и
+значения ключа. Битый курсор не ошибка — отдаётся первая страница.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+from flask import current_app, request
+from sqlalchemy import DateTime, tuple_
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+class KeysetPage(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]   # более старые строки
+    prev_cursor: Optional[str]   # более новые строки
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+
+def encode_cursor(direction: str, values: Sequence) -> str:
+    raw = [direction] + [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    data = json.dumps(raw, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> Optional[tuple]:
+    """(направление, значения) или None, если курсор не разбирается."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        direction, values = raw[0], raw[1:]
+        if direction not in ('next', 'prev') or len(values) != len(keys):
+            return None
+        out = []
+        for key, v in zip(keys, values):
+            if v is None:
+                return None
+            out.append(datetime.fromisoformat(v) if isinstance(key.type, DateTime) else v)
+        return direction, out
+    except (ValueError, TypeError, IndexError, AttributeError):
+        return None
+
+
+def _key_of(row, keys: Sequence) -> list:
+    return [getattr(row, k.key) for k in keys]
+
+
+def keyset_page(query, keys: Sequence, cursor: Optional[str] = None,
+                per_page: int = DEFAULT_PER_PAGE) -> KeysetPage:
+    """
+    Страница query, упорядоченного по keys по убыванию. keys — столбцы
+    модели, последний из них должен быть уникальным (обычно id), иначе
+    порядок при равных значениях не определён.
+    """
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    decoded = decode_cursor(cursor, keys) if cursor else None
+    direction, values = decoded if decoded else ('next', None)
+
+    base = query
+    lhs = tuple_(*keys) if len(keys) > 1 else keys[0]
+    rhs = (tuple_(*values) if len(keys) > 1 else values[0]) if values is not None else None
+    if direction == 'next':
+        if rhs is not None:
+            query = query.filter(lhs < rhs)
+        query = query.order_by(*[k.desc() for k in keys])
+    else:
+        # назад идём по возрастанию от первой строки и разворачиваем
+        query = query.filter(lhs > rhs).order_by(*[k.asc() for k in keys])
+
+    rows = query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, values is not None
+
+    if not rows:
+        if direction == 'prev':
+            # более новых строк не осталось (их удалили) — просто первая страница
+            return keyset_page(base, keys, None, per_page)
+        return KeysetPage([], None, None)
+    return KeysetPage(
+        rows,
+        encode_cursor('next', _key_of(rows[-1], keys)) if has_next else None,
+        encode_cursor('prev', _key_of(rows[0], keys)) if has_prev else None,
+    )
+
+
+def paginate(query, keys: Sequence) -> KeysetPage:
+    """keyset_page с курсором из ?cursor= и размером страницы LIST_PAGE_SIZE."""
+    return keyset_page(query, keys, request.args.get('cursor'),
+                       current_app.config.get('LIST_PAGE_SIZE', DEFAULT_PER_PAGE))
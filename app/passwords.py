@@ -0,0 +1,195 @@
+# app/passwords.py
+# -*- coding: utf-8 -*-
+"""
+Хэширование паролей вне потоков веб-воркера.
+
+scrypt/pbkdf2 медленные намеренно, поэтому вход целой группы в начале
+пары занимал все потоки воркеров. Здесь хэш считается в небольшом пуле
+процессов (PASSWORD_HASH_WORKERS), а число ожидающих задач ограничено
+(PASSWORD_HASH_QUEUE): если очередь полна дольше PASSWORD_HASH_WAIT
+секунд — PasswordBusy, и вьюха сразу отвечает 503, а не висит.
+
+Пул свой у каждого воркера gunicorn, так что на хосте хэшируют
+SERVE_WORKERS × PASSWORD_HASH_WORKERS процессов (по scrypt:32768:8:1 —
+по 32 МБ памяти на хэш). По умолчанию это (CPU+1) × 1 — примерно процесс
+на ядро; больше ядер хэширование всё равно не получит. Процессы пула
+запускаются через forkserver (или spawn), а не fork из многопоточного воркера.
+
+Политика — строка метода werkzeug (PASSWORD_HASH_METHOD, например
+'scrypt:32768:8:1' или 'pbkdf2:sha256:600000'). Старые хэши продолжают
+проверяться; при успешном входе хэш с другим методом пересчитывается
+по текущей политике (verify_and_update). Сокращения вроде 'scrypt' или
+'pbkdf2' разворачиваются в полный метод с параметрами. Подобрать стоимость под железо:
+flask password_bench --target 0.25.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .metrics import metrics
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_WORKERS = 1
+DEFAULT_WAIT = 5.0
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class PasswordBusy(RuntimeError):
+    """Очередь хэширования переполнена — клиенту 503, пусть повторит позже."""
+
+
+# функции верхнего уровня — их выполняют процессы пула
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+
+def _check(stored: str, password: str) -> bool:
+    return check_password_hash(stored, password)
+
+
+def method_of(stored: str) -> str:
+    """'scrypt:32768:8:1$salt$hash' -> 'scrypt:32768:8:1'."""
+    return stored.split('$', 1)[0]
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.method = DEFAULT_METHOD
+        self.workers = DEFAULT_WORKERS
+        self.queue = DEFAULT_WORKERS * 8
+        self.wait = DEFAULT_WAIT
+        self._slots = threading.BoundedSemaphore(self.queue)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        # 'scrypt' -> 'scrypt:32768:8:1': иначе needs_rehash сравнивал бы с
+        # сокращением и пересчитывал хэш при каждом входе. Заодно битая
+        # политика видна при старте, а не на первом входе
+        self.method = method_of(generate_password_hash(
+            '', method=app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_METHOD))
+        self.workers = int(app.config.get('PASSWORD_HASH_WORKERS', self.workers))
+        self.queue = int(app.config.get('PASSWORD_HASH_QUEUE') or max(1, self.workers) * 8)
+        self.wait = float(app.config.get('PASSWORD_HASH_WAIT', self.wait))
+        self._slots = threading.BoundedSemaphore(self.queue)
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        pid = os.getpid()
+        with self._lock:
+            if self._pool is None or self._pid != pid:
+                # после fork пул родителя не наш — заводим свой
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(START_METHOD))
+                self._pid = pid
+            return self._pool
+
+    def _discard(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _call(self, op: str, fn, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            metrics.inc('cryptolab_password_rejected_total', f'op="{op}"')
+            raise PasswordBusy('слишком много одновременных входов, повторите через несколько секунд')
+        try:
+            with metrics.timer('cryptolab_password_hash_seconds', op=op):
+                pool = self._executor()
+                if pool is None:
+                    return fn(*args)
+                try:
+                    return pool.submit(fn, *args).result()
+                except BrokenProcessPool:
+                    # упавший процесс пула: считаем здесь, пул пересоздастся
+                    self._discard(pool)
+                    return fn(*args)
+        finally:
+            self._slots.release()
+
+    # ===== API =====
+
+    def hash(self, password: str) -> str:
+        return self._call('hash', _hash, password, self.method)
+
+    def verify(self, stored: str, password: str) -> bool:
+        return self._call('verify', _check, stored, password)
+
+    def needs_rehash(self, stored: str) -> bool:
+        return method_of(stored) != self.method
+
+    def verify_and_update(self, user, password: str) -> bool:
+        """
+        Проверяет пароль user; при успехе и устаревшем методе записывает
+        новый хэш в user.password_hash (commit — за вызывающим).
+        """
+        if not self.verify(user.password_hash, password):
+            return False
+        if self.needs_rehash(user.password_hash):
+            user.password_hash = self.hash(password)
+            metrics.inc('cryptolab_password_rehash_total')
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+passwords = PasswordHasher()
+
+metrics.histogram('cryptolab_password_hash_seconds', 'Время хэширования/проверки пароля с ожиданием пула',
+                  (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+metrics.counter('cryptolab_password_rejected_total', 'Отказы 503: очередь хэширования паролей полна')
+metrics.counter('cryptolab_password_rehash_total', 'Хэши, пересчитанные при входе по новой политике')
+
+
+# ===== Подбор стоимости =====
+
+def _time_method(method: str, repeats: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        generate_password_hash('correct horse battery staple', method=method)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def calibrate(target: float, algo: str = 'scrypt') -> Tuple[str, List[Tuple[str, float]]]:
+    """
+    Подбирает самый дорогой метод, укладывающийся в target секунд на этой
+    машине. scrypt: N = 2^14..2^20 при r=8, p=1; pbkdf2: число итераций
+    (время линейно — экстраполируем от замера и уточняем).
+    Возвращает (метод, [(метод, секунды), ...]).
+    """
+    tried: List[Tuple[str, float]] = []
+    if algo == 'scrypt':
+        best = None
+        for log_n in range(14, 21):
+            method = f'scrypt:{1 << log_n}:8:1'
+            dt = _time_method(method)
+            tried.append((method, dt))
+            if dt > target:
+                break
+            best = method
+        return best or tried[0][0], tried
+    if algo == 'pbkdf2':
+        probe = 100_000
+        dt = _time_method(f'pbkdf2:sha256:{probe}')
+        tried.append((f'pbkdf2:sha256:{probe}', dt))
+        iterations = max(10_000, int(probe * target / dt) // 10_000 * 10_000)
+        method = f'pbkdf2:sha256:{iterations}'
+        tried.append((method, _time_method(method)))
+        return method, tried
+    raise ValueError(f'неизвестный алгоритм: {algo} (scrypt|pbkdf2)')
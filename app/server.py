@@ -0,0 +1,105 @@
+# app/server.py
+# -*- coding: utf-8 -*-
+"""
+Боевой запуск: gunicorn с предзагрузкой приложения (flask serve).
+
+Приложение создаётся один раз в мастере (preload_app) — импорты,
+шаблоны, таблицы квадграмм и модули app/crypto загружаются до fork и
+делятся воркерами copy-on-write. Всё, что не переживает fork (соединения
+с БД, потоки пулов), воркеры заводят сами: пулы app/ уже fork-aware,
+а пул соединений SQLAlchemy сбрасывается в post_fork.
+
+Сигналы мастера (стандартные для gunicorn):
+- HUP  — мягкий перезапуск воркеров: новые форкаются, старые дорабатывают
+  запросы. Код при этом не перечитывается (он загружен в мастере до fork);
+  для нового кода — USR2 (новый мастер рядом со старым), затем QUIT старому;
+- TERM — мягкая остановка (ждёт graceful_timeout);
+- TTIN/TTOU — ±1 воркер.
+Воркер перезапускается после max_requests (± jitter) запросов — против
+утечек памяти в долгоживущих процессах.
+"""
+
+import glob
+import os
+from typing import Optional
+
+from gunicorn.app.base import BaseApplication
+
+
+def default_workers() -> int:
+    """CPU-тяжёлые запросы: по воркеру на ядро (+1, пока другой ждёт БД)."""
+    return (os.cpu_count() or 1) + 1
+
+
+class Server(BaseApplication):
+    def __init__(self, app, options: dict):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None and key in self.cfg.settings:
+                self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def _on_starting(app):
+    def hook(server):
+        # файлы метрик прошлого запуска (и его pid) к этому запуску не относятся
+        metrics_dir = app.config.get('METRICS_DIR')
+        if metrics_dir:
+            for path in glob.glob(os.path.join(metrics_dir, 'metrics_*.json')):
+                os.remove(path)
+    return hook
+
+
+def _post_fork(app):
+    def hook(server, worker):
+        from . import db
+        with app.app_context():
+            # соединения мастера (preload, проверки при старте) воркеру не принадлежат;
+            # close=False — не закрывать сокеты, которыми ещё пользуется мастер
+            db.engine.dispose(close=False)
+    return hook
+
+
+def _worker_exit(app):
+    def hook(server, worker):
+        # дописываем очередь отправок и метрики до выхода (atexit при SIGQUIT не сработает)
+        from .metrics import metrics
+        from .submission_sink import submission_sink
+        submission_sink.shutdown()
+        metrics.flush(force=True)
+    return hook
+
+
+def _child_exit(app):
+    def hook(server, worker):
+        # в мастере: файл метрик ушедшего воркера — в общий metrics_exited.json
+        from .metrics import metrics
+        metrics.reap(worker.pid)
+    return hook
+
+
+def serve(app, bind: str, workers: Optional[int] = None, threads: int = 4,
+          max_requests: int = 1000, timeout: int = 120, graceful_timeout: int = 30):
+    options = {
+        'bind': bind,
+        'workers': workers or default_workers(),
+        'worker_class': 'gthread',
+        'threads': threads,
+        'preload_app': True,
+        'max_requests': max_requests,
+        'max_requests_jitter': max_requests // 10 if max_requests else 0,
+        'timeout': timeout,
+        'graceful_timeout': graceful_timeout,
+        'accesslog': '-',
+        'on_starting': _on_starting(app),
+        'post_fork': _post_fork(app),
+        'worker_exit': _worker_exit(app),
+        'child_exit': _child_exit(app),
+    }
+    Server(app, options).run()
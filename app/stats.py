@@ -0,0 +1,160 @@
+# app/stats.py
+# -*- coding: utf-8 -*-
+"""
+Статистика решений: user_stats (на пользователя) и user_lab_stats
+(на пользователя и лабу) — ok / total / время первого верного решения.
+
+Таблицы обновляются в той же транзакции, что и вставка Submission
+(after_insert), одним UPSERT на строку; rebuild() пересчитывает их целиком
+из submission агрегирующим INSERT ... SELECT, rebuild_lab() — только строки
+одной лабы (перепроверка, удаление). Дашборд читает топ и KPI отсюда —
+стоимость не растёт с числом отправок.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import case, event, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from .models import User, Lab, Submission, UserStats, UserLabStats
+
+
+def _upsert(conn, table, keys: dict, ok: int, total: int, first):
+    values = {**keys, 'ok': ok, 'total': total, 'first_solved_at': first}
+    dialect = {'postgresql': postgresql, 'sqlite': sqlite}.get(conn.dialect.name)
+    if dialect is not None:
+        ins = dialect.insert(table).values(**values)
+        conn.execute(ins.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={
+                'ok': table.c.ok + ins.excluded.ok,
+                'total': table.c.total + ins.excluded.total,
+                'first_solved_at': func.coalesce(table.c.first_solved_at, ins.excluded.first_solved_at),
+            },
+        ))
+        return
+    # прочие СУБД: UPDATE, а если строки ещё нет — INSERT
+    where = [table.c[k] == v for k, v in keys.items()]
+    res = conn.execute(update(table).where(*where).values(
+        ok=table.c.ok + ok,
+        total=table.c.total + total,
+        first_solved_at=func.coalesce(table.c.first_solved_at, first),
+    ))
+    if not res.rowcount:
+        conn.execute(insert(table).values(**values))
+
+
+def apply_submissions(conn, rows: Iterable[dict]):
+    """
+    Учитывает пачку новых отправок (dict с user_id, lab_id, is_correct,
+    created_at): сначала агрегирует в памяти, затем по одному UPSERT на
+    пользователя и на пару (пользователь, лаба).
+    """
+    per_user: Dict[int, list] = {}
+    per_lab: Dict[Tuple[int, int], list] = {}
+    for r in rows:
+        ok = 1 if r.get('is_correct') else 0
+        when = (r.get('created_at') or datetime.utcnow()) if ok else None
+        for acc in (per_user.setdefault(r['user_id'], [0, 0, None]),
+                    per_lab.setdefault((r['user_id'], r['lab_id']), [0, 0, None])):
+            acc[0] += ok
+            acc[1] += 1
+            if when is not None and (acc[2] is None or when < acc[2]):
+                acc[2] = when
+    for user_id, (ok, total, first) in per_user.items():
+        _upsert(conn, UserStats.__table__, {'user_id': user_id}, ok, total, first)
+    for (user_id, lab_id), (ok, total, first) in per_lab.items():
+        _upsert(conn, UserLabStats.__table__, {'user_id': user_id, 'lab_id': lab_id}, ok, total, first)
+
+
+@event.listens_for(Submission, 'after_insert')
+def _on_submission_insert(mapper, connection, target):
+    apply_submissions(connection, [{
+        'user_id': target.user_id, 'lab_id': target.lab_id,
+        'is_correct': target.is_correct, 'created_at': target.created_at,
+    }])
+
+
+def _aggregates():
+    s = Submission.__table__
+    ok = func.sum(case((s.c.is_correct, 1), else_=0))
+    first = func.min(case((s.c.is_correct, s.c.created_at)))
+    return s, ok, first
+
+
+def rebuild_statements() -> List:
+    """DELETE + INSERT ... SELECT для обеих таблиц."""
+    s, ok, first = _aggregates()
+    us, uls = UserStats.__table__, UserLabStats.__table__
+    return [
+        uls.delete(),
+        us.delete(),
+        insert(us).from_select(
+            ['user_id', 'ok', 'total', 'first_solved_at'],
+            select(s.c.user_id, ok, func.count(), first).group_by(s.c.user_id)),
+        insert(uls).from_select(
+            ['user_id', 'lab_id', 'ok', 'total', 'first_solved_at'],
+            select(s.c.user_id, s.c.lab_id, ok, func.count(), first).group_by(s.c.user_id, s.c.lab_id)),
+    ]
+
+
+def rebuild() -> int:
+    """Полный пересчёт из submission; возвращает число строк user_stats."""
+    for stmt in rebuild_statements():
+        db.session.execute(stmt)
+    db.session.commit()
+    return db.session.query(func.count()).select_from(UserStats).scalar()
+
+
+def lab_statements(lab_id: int) -> List:
+    """
+    DELETE + INSERT ... SELECT только для лабы lab_id: её строки
+    user_lab_stats и user_stats тех, у кого они есть. Кто решал лабу,
+    берётся из user_lab_stats до их удаления — так пересчёт годится и
+    после удаления отправок лабы.
+    """
+    s, ok, first = _aggregates()
+    us, uls = UserStats.__table__, UserLabStats.__table__
+    solvers = select(uls.c.user_id).where(uls.c.lab_id == lab_id).scalar_subquery()
+    return [
+        us.delete().where(us.c.user_id.in_(solvers)),
+        insert(us).from_select(
+            ['user_id', 'ok', 'total', 'first_solved_at'],
+            select(s.c.user_id, ok, func.count(), first)
+            .where(s.c.user_id.in_(solvers)).group_by(s.c.user_id)),
+        uls.delete().where(uls.c.lab_id == lab_id),
+        insert(uls).from_select(
+            ['user_id', 'lab_id', 'ok', 'total', 'first_solved_at'],
+            select(s.c.user_id, s.c.lab_id, ok, func.count(), first)
+            .where(s.c.lab_id == lab_id).group_by(s.c.user_id, s.c.lab_id)),
+    ]
+
+
+def rebuild_lab(lab_id: int):
+    """Пересчёт строк одной лабы в текущей транзакции; commit — за вызывающим."""
+    for stmt in lab_statements(lab_id):
+        db.session.execute(stmt)
+
+
+# ===== Запросы для дашборда =====
+
+def kpis() -> Dict[str, int]:
+    """Пользователи, лабы и отправки — одним запросом из подзапросов."""
+    row = db.session.execute(select(
+        select(func.count()).select_from(User).scalar_subquery(),
+        select(func.count()).select_from(Lab).scalar_subquery(),
+        select(func.coalesce(func.sum(UserStats.total), 0)).scalar_subquery(),
+    )).one()
+    return {'users': row[0], 'labs': row[1], 'submissions': row[2]}
+
+
+def top_users(limit: int = 5) -> List[Tuple[User, int, int]]:
+    """[(user, ok, total)] по индексу ix_user_stats_rank, пользователь — тем же JOIN."""
+    rows = (db.session.query(User, UserStats.ok, UserStats.total)
+            .join(UserStats, UserStats.user_id == User.id)
+            .order_by(UserStats.ok.desc(), UserStats.total.desc())
+            .limit(limit)
+            .all())
+    return [(u, ok, total) for u, ok, total in rows]
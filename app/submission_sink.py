@@ -0,0 +1,187 @@
+# app/submission_sink.py
+# -*- coding: utf-8 -*-
+"""
+Отложенная запись отправок (write-behind).
+
+solve_lab проверяет ответ сразу, а строку Submission кладёт в очередь.
+Фоновый поток забирает очередь пачками — по SUBMISSION_BATCH_SIZE строк
+или раз в SUBMISSION_FLUSH_SECONDS — и пишет пачку одной транзакцией:
+bulk_insert_mappings + обновление user_stats (app/stats.py).
+
+Гарантии:
+- при штатной остановке процесса (atexit, в т.ч. SIGTERM у gunicorn)
+  очередь дописывается синхронно;
+- при аварийном завершении (SIGKILL, OOM) теряется всё, что лежит в
+  очереди: обычно одно окно SUBMISSION_FLUSH_SECONDS, но если база
+  отстаёт — до SUBMISSION_QUEUE_SIZE отправок;
+- если очередь переполнена, отправка пишется синхронно в запросе;
+- SUBMISSION_SINK=sync (и app.testing) — каждая отправка пишется сразу.
+
+Запись всегда идёт в отдельной сессии: синхронная запись из запроса не
+коммитит и не откатывает db.session вьюхи.
+
+Недавняя отправка может появиться в профиле с задержкой до одного окна.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Submission
+from .stats import apply_submissions
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_SECONDS = 0.5
+# Предел потерь при аварийном завершении: ~2.5 с записи при пачках по 200
+# раз в 0.5 с; дальше запросы пишут сами — это и есть обратное давление
+DEFAULT_QUEUE_SIZE = 1000
+
+
+class SubmissionSink:
+    def __init__(self):
+        self.mode = 'async'
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self.flush_seconds = DEFAULT_FLUSH_SECONDS
+        self.queue_size = DEFAULT_QUEUE_SIZE
+        self._app = None
+        self._queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._atexit = False
+        self.written = 0
+        self.sync_writes = 0
+
+    def init_app(self, app):
+        self._app = app
+        self.mode = app.config.get('SUBMISSION_SINK', self.mode)
+        self.batch_size = int(app.config.get('SUBMISSION_BATCH_SIZE', self.batch_size))
+        self.flush_seconds = float(app.config.get('SUBMISSION_FLUSH_SECONDS', self.flush_seconds))
+        self.queue_size = int(app.config.get('SUBMISSION_QUEUE_SIZE', self.queue_size))
+        self._queue = queue.Queue(maxsize=self.queue_size)
+
+    @property
+    def synchronous(self) -> bool:
+        return self.mode == 'sync' or self._app is None or self._app.testing
+
+    # ===== Приём =====
+
+    def submit(self, user_id: int, lab_id: int, text: str, is_correct: bool):
+        row = {'user_id': user_id, 'lab_id': lab_id, 'submitted_text': text,
+               'is_correct': bool(is_correct), 'created_at': datetime.utcnow()}
+        if self.synchronous:
+            self._write([row])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # поток не успевает — пишем сами, но запрос не теряем
+            self.sync_writes += 1
+            self._write([row])
+
+    # ===== Запись =====
+
+    def _write(self, rows: List[dict]):
+        """Пачка одной транзакцией; при ошибке — по строке, чтобы не терять соседей."""
+        with Session(db.engine) as session:
+            try:
+                session.bulk_insert_mappings(Submission, rows)
+                apply_submissions(session.connection(), rows)
+                session.commit()
+                self.written += len(rows)
+                return
+            except Exception:
+                session.rollback()
+                if len(rows) == 1:
+                    raise
+        for row in rows:
+            try:
+                self._write([row])
+            except Exception:
+                # например, лабу удалили, пока строка ждала в очереди
+                self._app.logger.exception('Не удалось записать отправку: %r',
+                                           {k: row[k] for k in ('user_id', 'lab_id', 'created_at')})
+
+    def _drain(self, first: Optional[dict] = None, wait: bool = True) -> List[dict]:
+        """Набирает пачку: до batch_size строк или до конца окна flush_seconds."""
+        batch = [first] if first is not None else []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if wait and timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self._app.app_context():
+            while not self._stop.is_set():
+                try:
+                    first = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                batch = self._drain(first)
+                try:
+                    self._write(batch)
+                except Exception:
+                    self._app.logger.exception('Ошибка записи пачки отправок')
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != pid:
+                # очередь родителя после fork не наша — её допишет родитель
+                self._queue = queue.Queue(maxsize=self.queue_size)
+            self._pid = pid
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='submission-sink', daemon=True)
+            self._thread.start()
+            if not self._atexit:
+                atexit.register(self.shutdown)
+                self._atexit = True
+
+    # ===== Остановка =====
+
+    def flush(self):
+        """Синхронно дописывает всё, что сейчас лежит в очереди."""
+        if self._app is None:
+            return
+        with self._app.app_context():
+            while True:
+                batch = self._drain(wait=False)
+                if not batch:
+                    return
+                self._write(batch)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Останавливает поток и дописывает остаток очереди (вызывается из atexit)."""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        return {'mode': 'sync' if self.synchronous else 'async', 'queued': self._queue.qsize(),
+                'written': self.written, 'sync_writes': self.sync_writes}
+
+
+submission_sink = SubmissionSink()
@@ -0,0 +1,143 @@
+# app/user_cache.py
+# -*- coding: utf-8 -*-
+"""
+Кэш пользователей для Flask-Login.
+
+load_user вызывается на каждом запросе с сессией — даже песочницы, которым
+база не нужна. Здесь хранятся отвязанные от сессии снимки (id, email,
+name, is_admin) в LRU на процесс с TTL: на попадании запрос к БД не идёт.
+
+Инвалидация:
+- любое изменение или удаление User через ORM (user_delete, смена
+  is_admin) — сразу при flush и ещё раз после commit;
+- в остальных процессах снимок живёт не дольше USER_CACHE_TTL секунд;
+  админские страницы проверяют is_admin по базе (_ensure_admin), так что
+  снятие прав действует сразу.
+
+USER_CACHE_TTL=0 выключает кэш — load_user ходит в базу, как раньше.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .metrics import metrics
+
+DEFAULT_TTL = 30.0
+DEFAULT_SIZE = 1024
+
+
+class UserSnapshot(UserMixin):
+    """Неизменяемая копия полей User, которые нужны шаблонам и проверкам доступа."""
+    __slots__ = ('id', 'email', 'name', 'is_admin')
+
+    def __init__(self, id: int, email: str, name: str, is_admin: bool):
+        self.id = id
+        self.email = email
+        self.name = name
+        self.is_admin = bool(is_admin)
+
+    @classmethod
+    def of(cls, user) -> 'UserSnapshot':
+        return cls(user.id, user.email, user.name, user.is_admin)
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.email}>"
+
+
+class UserCache:
+    def __init__(self):
+        self.ttl = DEFAULT_TTL
+        self.size = DEFAULT_SIZE
+        self._lock = threading.Lock()
+        self._items: 'OrderedDict[int, tuple]' = OrderedDict()   # id -> (expires, snapshot)
+
+    def init_app(self, app):
+        self.ttl = float(app.config.get('USER_CACHE_TTL', self.ttl))
+        self.size = int(app.config.get('USER_CACHE_SIZE', self.size))
+        self.clear()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.size > 0
+
+    def get(self, user_id: int) -> Optional[UserSnapshot]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None:
+                return None
+            if item[0] <= now:
+                del self._items[user_id]
+                return None
+            self._items.move_to_end(user_id)
+            return item[1]
+
+    def put(self, snapshot: UserSnapshot):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._items[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+            self._items.move_to_end(snapshot.id)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def load(self, user_id: int):
+        """Снимок из кэша или из базы; None, если пользователя нет."""
+        if not self.enabled:
+            from .models import User
+            return User.query.get(user_id)
+        snap = self.get(user_id)
+        if snap is not None:
+            metrics.inc('cryptolab_user_cache_total', 'result="hit"')
+            return snap
+        metrics.inc('cryptolab_user_cache_total', 'result="miss"')
+        from .models import User
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        snap = UserSnapshot.of(user)
+        self.put(snap)
+        return snap
+
+
+user_cache = UserCache()
+
+metrics.counter('cryptolab_user_cache_total', 'Загрузки пользователя Flask-Login: hit/miss кэша')
+
+
+def register_events(user_model):
+    """Сбрасывает снимок при изменении/удалении User (вызывается из models)."""
+
+    def _dirty(mapper, connection, target):
+        user_cache.invalidate(target.id)
+        # после commit — ещё раз: параллельный запрос мог успеть
+        # закэшировать старую строку между flush и commit
+        sess = Session.object_session(target)
+        if sess is not None:
+            sess.info.setdefault('user_cache_dirty', set()).add(target.id)
+
+    event.listen(user_model, 'after_update', _dirty)
+    event.listen(user_model, 'after_delete', _dirty)
+
+    @event.listens_for(Session, 'after_commit')
+    def _after_commit(session):
+        for user_id in session.info.pop('user_cache_dirty', ()):
+            user_cache.invalidate(user_id)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop('user_cache_dirty', None)
@@ -1,55 +1,63 @@
-from flask import Blueprint, render_template, abort, redirect, url_for, flash, request
+import hmac
+import json
+
+from flask import Blueprint, Response, render_template, abort, redirect, url_for, flash, request, current_app
 from flask_login import login_required, current_user
-from ..models import User, Lab, Submission
+from ..models import User, Lab, Submission, UserStats, UserLabStats, Job
 from ..forms import LabForm
-from .. import db
+from ..metrics import metrics
+from ..pagination import paginate
+from ..user_cache import user_cache
+from ..page_cache import page_cache
+from ..jobs import jobs, ACTIVE, DONE
+from .. import db, stats
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
 def _ensure_admin():
     if not current_user.is_authenticated or not getattr(current_user, 'is_admin', False):
         abort(403)
+    # current_user — снимок из кэша (app/user_cache.py); права сверяем с базой,
+    # чтобы снятие is_admin в другом воркере действовало сразу, а не через TTL
+    user = db.session.get(User, current_user.id)
+    if user is None or not user.is_admin:
+        user_cache.invalidate(current_user.id)
+        abort(403)
 
 # ===== DASHBOARD (у тебя уже есть, оставь как есть) =====
 @bp.route('/dashboard')
 @login_required
 def dashboard():
     _ensure_admin()
-    users_count = User.query.count()
-    labs_count = Lab.query.count()
-    subs_count = Submission.query.count()
-
+    counts = stats.kpis()
     last_subs = Submission.query.order_by(Submission.id.desc()).limit(5).all()
-
-    # Топ-5 по числу верных решений (на небольших объёмах ок)
-    stats = {}
-    for s in Submission.query.all():
-        st = stats.setdefault(s.user_id, {'ok': 0, 'total': 0})
-        st['total'] += 1
-        if s.is_correct:
-            st['ok'] += 1
-    top_users = []
-    for uid, st in stats.items():
-        u = User.query.get(uid)
-        if u:
-            top_users.append((u, st['ok'], st['total']))
-    top_users.sort(key=lambda x: (-x[1], -x[2]))
-    top_users = top_users[:5]
+    # топ-5 — один запрос по индексу user_stats, без обхода всех отправок
+    top_users = stats.top_users(5)
 
     return render_template('admin/dashboard.html',
-                           users_count=users_count,
-                           labs_count=labs_count,
-                           subs_count=subs_count,
+                           users_count=counts['users'],
+                           labs_count=counts['labs'],
+                           subs_count=counts['submissions'],
                            last_subs=last_subs,
                            top_users=top_users)
 
+# ===== МЕТРИКИ (формат Prometheus) =====
+# Админская сессия или заголовок «Authorization: Bearer <METRICS_TOKEN>» для сборщика
+@bp.route('/metrics')
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    auth = request.headers.get('Authorization', '')
+    if not (token and hmac.compare_digest(auth, f'Bearer {token}')):
+        _ensure_admin()
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # ===== ЛАБЫ: список / создание / редактирование / удаление =====
 @bp.route('/labs')
 @login_required
 def labs_list():
     _ensure_admin()
-    labs = Lab.query.order_by(Lab.created_at.desc()).all()
-    return render_template('admin/labs_list.html', labs=labs)
+    page = paginate(Lab.query, (Lab.created_at, Lab.id))
+    return render_template('admin/labs_list.html', labs=page.items, page=page)
 
 @bp.route('/labs/new', methods=['GET', 'POST'])
 @login_required
@@ -66,6 +74,7 @@ def labs_new():
         )
         db.session.add(lab)
         db.session.commit()
+        page_cache.invalidate('labs')
         flash('Лаба создана', 'success')
         return redirect(url_for('admin.labs_list'))
     return render_template('admin/labs_form.html', form=form, lab=None)
@@ -77,9 +86,15 @@ def labs_edit(lab_id):
     lab = Lab.query.get_or_404(lab_id)
     form = LabForm(obj=lab)
     if form.validate_on_submit():
+        old_hash = lab.answer_hash
         form.populate_obj(lab)
         db.session.commit()
+        page_cache.invalidate('labs')
         flash('Лаба обновлена', 'success')
+        if lab.answer_hash.lower() != (old_hash or '').lower():
+            # ответ поменялся — старые отправки перепроверит flask jobs_worker
+            job = jobs.enqueue('labs.regrade', {'lab_id': lab.id}, user_id=current_user.id, priority=5)
+            flash(f'Перепроверка отправок поставлена в очередь (задача #{job.id})', 'info')
         return redirect(url_for('admin.labs_list'))
     return render_template('admin/labs_form.html', form=form, lab=lab)
 
@@ -88,29 +103,54 @@ def labs_edit(lab_id):
 def labs_delete(lab_id):
     _ensure_admin()
     lab = Lab.query.get_or_404(lab_id)
+    # отправки и счётчики лабы — в той же транзакции, что и сама лаба
+    Submission.query.filter_by(lab_id=lab.id).delete()
+    stats.rebuild_lab(lab.id)
     db.session.delete(lab)
     db.session.commit()
+    page_cache.invalidate('labs')
     flash('Лаба удалена', 'info')
     return redirect(url_for('admin.labs_list'))
 
+# Проверка решаемости Playfair-лабы без ключа: отжиг идёт до
+# PLAYFAIR_SOLVER_SECONDS, поэтому — задачей labs.playfair_check в
+# flask jobs_worker, а страница результата обновляется, пока задача не завершится
+@bp.route('/labs/<int:lab_id>/playfair-check', methods=['POST'])
+@login_required
+def labs_playfair_check(lab_id):
+    _ensure_admin()
+    lab = Lab.query.get_or_404(lab_id)
+    job = jobs.enqueue('labs.playfair_check', {'lab_id': lab.id}, user_id=current_user.id, priority=5)
+    return redirect(url_for('admin.labs_playfair_result', lab_id=lab.id, job_id=job.id))
+
+@bp.route('/labs/<int:lab_id>/playfair-check/<int:job_id>')
+@login_required
+def labs_playfair_result(lab_id, job_id):
+    _ensure_admin()
+    lab = Lab.query.get_or_404(lab_id)
+    job = db.session.get(Job, job_id)
+    if job is None or job.kind != 'labs.playfair_check':
+        abort(404)
+    res = json.loads(job.result) if job.status == DONE and job.result else None
+    return render_template('admin/playfair_check.html', lab=lab, job=job, res=res,
+                           active=job.status in ACTIVE)
+
 # ===== ПОЛЬЗОВАТЕЛИ: список / карточка / (опц.) удаление =====
 @bp.route('/users')
 @login_required
 def users_list():
     _ensure_admin()
-    users = User.query.order_by(User.created_at.desc()).all()
-    return render_template('admin/users_list.html', users=users)
+    page = paginate(User.query, (User.created_at, User.id))
+    return render_template('admin/users_list.html', users=page.items, page=page)
 
 @bp.route('/users/<int:user_id>')
 @login_required
 def user_detail(user_id):
     _ensure_admin()
     user = User.query.get_or_404(user_id)
-    subs = (Submission.query
-            .filter_by(user_id=user.id)
-            .order_by(Submission.created_at.desc())
-            .all())
-    return render_template('admin/user_detail.html', user=user, subs=subs)
+    page = paginate(Submission.query.filter_by(user_id=user.id),
+                    (Submission.created_at, Submission.id))
+    return render_template('admin/user_detail.html', user=user, subs=page.items, page=page)
 
 @bp.route('/users/<int:user_id>/delete', methods=['POST'])
 @login_required
@@ -125,6 +165,9 @@ def user_delete(user_id):
         return redirect(url_for('admin.users_list'))
     # каскад для submissions — если не настроен на модели, удалим вручную
     Submission.query.filter_by(user_id=user.id).delete()
+    UserLabStats.query.filter_by(user_id=user.id).delete()
+    UserStats.query.filter_by(user_id=user.id).delete()
+    jobs.forget_user(user.id)
     db.session.delete(user)
     db.session.commit()
     flash('Пользователь удалён', 'info')
@@ -0,0 +1,318 @@
+# app/views/api.py
+# -*- coding: utf-8 -*-
+"""
+JSON API /api/v1 для скриптов и автопроверки: без форм и шаблонов.
+Вместо CSRF-токена POST с сессионной cookie должен быть JSON или нести
+заголовок X-Requested-With — чужая страница не отправит ни того, ни
+другого без CORS-preflight.
+
+    POST /api/v1/auth/login        {"email", "password"} -> сессионная cookie
+    GET  /api/v1/ops               список операций
+    POST /api/v1/<cipher>/<action> параметры операции -> {"result": ...}
+    POST /api/v1/batch             {"ops": [{"op": "caesar.encrypt", "params": {...}}, ...]}
+                                   -> {"results": [{"ok": true, "result": ...} | {"ok": false, "error": ...}]}
+
+Фоновые задачи (app/jobs.py) — для долгой работы: ответ сразу, результат потом.
+
+    POST /api/v1/jobs              {"kind": "op", "params": {"op": "rsa.keygen", "params": {"bits": 4096}},
+                                    "priority": 0} -> 202 {"id": ...}
+                                   aes.file — multipart: file, key, mode=enc|dec, cipher
+                                   (+ заголовок X-Requested-With)
+                                   (с Content-Length не больше JOB_UPLOAD_MAX_BYTES, иначе 413)
+    GET  /api/v1/jobs              свои задачи (keyset, ?cursor=)
+    GET  /api/v1/jobs/<id>         статус, прогресс, результат
+    GET  /api/v1/jobs/<id>/events  поток прогресса (text/event-stream), до 25 с на соединение
+    GET  /api/v1/jobs/<id>/file    выходной файл (aes.file)
+    POST /api/v1/jobs/<id>/cancel  (JSON-тело или заголовок X-Requested-With)
+"""
+
+import json
+import os
+import time
+import uuid
+from functools import wraps
+
+from flask import Blueprint, Response, abort, jsonify, request, send_file, stream_with_context
+from flask_login import login_user, current_user
+
+from .. import db
+from ..models import User, Job
+from ..passwords import passwords, PasswordBusy
+from ..admission import admission, op_cost_rates
+from ..crypto.operations import OPERATIONS, OperationError, run_op, run_batch
+from ..crypto.aes import STREAM_MODES
+from ..jobs import jobs, JOBS, JobError, FINISHED
+from ..pagination import paginate
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _error(message: str, status: int = 400):
+    return jsonify({'error': message}), status
+
+
+def api_login_required(view):
+    """Как login_required, но 401 в JSON вместо редиректа на форму входа."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return _error('требуется вход: POST /api/v1/auth/login', 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# Свой заголовок вместо CSRF-токена для POST без JSON-тела
+CSRF_HEADER = 'X-Requested-With'
+
+
+def api_csrf_required(view):
+    """
+    POST без JSON-тела (multipart, пустое тело) принимается только с
+    заголовком CSRF_HEADER: HTML-форма чужого сайта его не поставит.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not request.is_json and CSRF_HEADER not in request.headers:
+            return _error(f'POST без JSON — только с заголовком {CSRF_HEADER}', 403)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _single_cost() -> float:
+    name = f"{request.view_args['cipher']}.{request.view_args['action']}"
+    base, per_kb = op_cost_rates(name, request.get_json(silent=True))
+    return base + per_kb * (request.content_length or 0) / 1024
+
+
+def _batch_cost() -> float:
+    """
+    Один запрос + дорогие операции по базовой цене, дешёвые — по 0.05
+    (их база — в основном накладные расходы запроса) + тело по самой
+    высокой ставке за КБ.
+    """
+    data = request.get_json(silent=True)
+    ops = data.get('ops') if isinstance(data, dict) else None
+    rates = [op_cost_rates(str(op.get('op') or ''), op.get('params'))
+             for op in ops if isinstance(op, dict)] if isinstance(ops, list) else []
+    per_kb = max((r[1] for r in rates), default=0)
+    return 1 + sum(r[0] if r[0] > 1 else 0.05 for r in rates) + per_kb * (request.content_length or 0) / 1024
+
+
+def _json_body() -> dict:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise OperationError('тело запроса — JSON-объект')
+    return data
+
+
+@bp.route('/auth/login', methods=['POST'])
+def login():
+    try:
+        data = _json_body()
+    except OperationError as e:
+        return _error(str(e))
+    user = User.query.filter_by(email=data.get('email') or '').first()
+    try:
+        ok = bool(user) and passwords.verify_and_update(user, data.get('password') or '')
+    except PasswordBusy as e:
+        return _error(str(e), 503)
+    if not ok:
+        return _error('неверные креды', 401)
+    if db.session.is_modified(user):
+        db.session.commit()
+    login_user(user)
+    return jsonify({'id': user.id, 'email': user.email, 'is_admin': bool(user.is_admin)})
+
+
+@bp.route('/ops')
+@api_login_required
+def ops():
+    return jsonify({'ops': sorted(OPERATIONS)})
+
+
+@bp.route('/<cipher>/<action>', methods=['POST'])
+@api_login_required
+@admission.limit(_single_cost)
+def single(cipher, action):
+    name = f'{cipher}.{action}'
+    if name not in OPERATIONS:
+        return _error(f'неизвестная операция {name!r}', 404)
+    try:
+        return jsonify({'result': run_op(name, _json_body())})
+    except ValueError as e:
+        return _error(str(e))
+
+
+@bp.route('/batch', methods=['POST'])
+@api_login_required
+@admission.limit(_batch_cost)
+def batch():
+    try:
+        ops = _json_body().get('ops')
+        if not isinstance(ops, list):
+            raise OperationError('ops: ожидается список операций')
+        results = run_batch(ops)
+    except OperationError as e:
+        return _error(str(e))
+    failed = sum(1 for r in results if not r['ok'])
+    return jsonify({'results': results, 'failed': failed})
+
+
+# ===== Фоновые задачи =====
+
+# Приоритет из запроса: студенты — только понижают свой, админ — в обе стороны
+USER_PRIORITY = (-10, 0)
+ADMIN_PRIORITY = (-10, 10)
+# Поток /events занимает поток воркера gunicorn, поэтому он короткий: через
+# EVENTS_MAX_SECONDS ответ закрывается, EventSource переподключается сам
+# через EVENTS_RETRY_MS. Скриптам проще опрашивать GET /jobs/<id>.
+EVENTS_MAX_SECONDS = 25
+EVENTS_RETRY_MS = 2000
+
+
+def _job_json(job: Job) -> dict:
+    def iso(dt):
+        return dt.isoformat() + 'Z' if dt else None
+    return {
+        'id': job.id, 'kind': job.kind, 'status': job.status, 'priority': job.priority,
+        'progress': round(job.progress or 0.0, 4), 'message': job.message,
+        'result': json.loads(job.result) if job.result else None, 'error': job.error,
+        'created_at': iso(job.created_at), 'started_at': iso(job.started_at),
+        'finished_at': iso(job.finished_at), 'expires_at': iso(job.expires_at),
+    }
+
+
+def _own_job(job_id: int) -> Job:
+    job = db.session.get(Job, job_id)
+    if job is None or (job.user_id != current_user.id and not current_user.is_admin):
+        abort(404)
+    return job
+
+
+def _job_request():
+    """(kind, params, priority) из JSON или из multipart (aes.file с файлом)."""
+    if request.mimetype == 'multipart/form-data':
+        form = request.form
+        kind = form.get('kind') or 'aes.file'
+        f = request.files.get('file')
+        if kind != 'aes.file' or f is None:
+            raise JobError('multipart — только для aes.file с полем file')
+        key = form.get('key') or ''
+        if len(key.encode('utf-8')) not in (16, 24, 32):
+            raise JobError('key: AES-ключ должен быть 16/24/32 байта')
+        mode = form.get('mode') or 'enc'
+        cipher = form.get('cipher') or 'gcm'
+        if mode not in ('enc', 'dec') or cipher not in STREAM_MODES:
+            raise JobError('mode: enc|dec, cipher: ' + '|'.join(STREAM_MODES))
+        name = f'{uuid.uuid4().hex}.in'
+        f.save(jobs.path(name))
+        params = {'input': name, 'key': key, 'mode': mode, 'cipher': cipher,
+                  'filename': (f.filename or 'data.bin') + ('.clab' if mode == 'enc' else '.dec')}
+        return kind, params, form.get('priority', 0, type=int)
+    data = _json_body()
+    kind = data.get('kind') or ''
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        raise JobError('params: ожидается объект')
+    if kind == 'op' and params.get('op') not in OPERATIONS:
+        raise JobError(f"неизвестная операция {params.get('op')!r}")
+    if kind == 'aes.file':
+        raise JobError('aes.file — multipart с файлом')
+    priority = data.get('priority', 0)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise JobError('priority: ожидается целое число')
+    return kind, params, priority
+
+
+@bp.route('/jobs', methods=['POST'])
+@api_login_required
+@api_csrf_required
+def job_create():
+    if jobs.active_count(current_user.id) >= jobs.max_active:
+        resp = jsonify({'error': f'не больше {jobs.max_active} незавершённых задач'})
+        resp.status_code = 429
+        resp.headers['Retry-After'] = '5'
+        return resp
+    if request.mimetype == 'multipart/form-data':
+        # проверяем до разбора формы: werkzeug иначе сам вычитает тело на диск
+        size = request.content_length
+        if size is None:
+            return _error('загрузка файла — только с Content-Length', 411)
+        if size > jobs.max_upload:
+            return _error(f'файл больше {jobs.max_upload // (1024 * 1024)} МБ', 413)
+    try:
+        kind, params, priority = _job_request()
+        handler = JOBS.get(kind)
+        if handler is None:
+            raise JobError(f'неизвестный тип задачи {kind!r}')
+        if handler.admin_only and not current_user.is_admin:
+            return _error('задача доступна только администратору', 403)
+        lo, hi = ADMIN_PRIORITY if current_user.is_admin else USER_PRIORITY
+        job = jobs.enqueue(kind, params, user_id=current_user.id, priority=max(lo, min(hi, priority)))
+    except ValueError as e:
+        return _error(str(e))
+    return jsonify(_job_json(job)), 202
+
+
+@bp.route('/jobs')
+@api_login_required
+def job_list():
+    page = paginate(Job.query.filter_by(user_id=current_user.id), (Job.created_at, Job.id))
+    return jsonify({'jobs': [_job_json(j) for j in page.items], 'next_cursor': page.next_cursor})
+
+
+@bp.route('/jobs/<int:job_id>')
+@api_login_required
+def job_get(job_id):
+    return jsonify(_job_json(_own_job(job_id)))
+
+
+@bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@api_login_required
+@api_csrf_required
+def job_cancel(job_id):
+    job = _own_job(job_id)
+    if job.status not in FINISHED:
+        jobs.cancel(job)
+    return jsonify(_job_json(job))
+
+
+@bp.route('/jobs/<int:job_id>/file')
+@api_login_required
+def job_file(job_id):
+    job = _own_job(job_id)
+    res = json.loads(job.result) if job.result else None
+    if not isinstance(res, dict) or not res.get('file') or not os.path.exists(jobs.path(res['file'])):
+        return _error('у задачи нет выходного файла', 404)
+    return send_file(jobs.path(res['file']), as_attachment=True,
+                     download_name=res.get('filename') or res['file'])
+
+
+@bp.route('/jobs/<int:job_id>/events')
+@api_login_required
+def job_events(job_id):
+    """
+    Server-Sent Events: событие на каждое изменение, пока задача не
+    завершится или не пройдёт EVENTS_MAX_SECONDS (тогда — переподключение).
+    """
+    _own_job(job_id)
+    poll = jobs.poll_seconds
+
+    def gen():
+        yield f'retry: {EVENTS_RETRY_MS}\n\n'
+        last = None
+        deadline = time.monotonic() + EVENTS_MAX_SECONDS
+        while True:
+            job = db.session.get(Job, job_id, populate_existing=True)
+            data = _job_json(job) if job else {'id': job_id, 'status': 'deleted'}
+            if data != last:
+                yield f'event: job\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+                last = data
+            if job is None or job.status in FINISHED or time.monotonic() > deadline:
+                return
+            # соединение с БД между опросами не держим
+            db.session.close()
+            time.sleep(poll)
+
+    return Response(stream_with_context(gen()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
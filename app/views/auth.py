@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from ..passwords import passwords, PasswordBusy
 from ..forms import LoginForm, RegisterForm
 from ..models import User
 from .. import db
@@ -14,9 +14,17 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
-        if not user or not check_password_hash(user.password_hash, form.password.data):
+        try:
+            ok = bool(user) and passwords.verify_and_update(user, form.password.data)
+        except PasswordBusy as e:
+            flash(f'Сервер занят: {e}', 'warning')
+            return render_template('auth/login.html', form=form), 503
+        if not ok:
             flash('Неверные креды', 'danger')
             return redirect(url_for('auth.login'))
+        if db.session.is_modified(user):
+            # хэш пересчитан по новой политике (PASSWORD_HASH_METHOD)
+            db.session.commit()
         login_user(user)
         return redirect(url_for('main.index'))
     return render_template('auth/login.html', form=form)
@@ -31,10 +39,15 @@ def register():
         if User.query.filter_by(email=email).first():
             flash('Пользователь уже существует', 'warning')
             return redirect(url_for('auth.register'))
+        try:
+            password_hash = passwords.hash(form.password.data)
+        except PasswordBusy as e:
+            flash(f'Сервер занят: {e}', 'warning')
+            return render_template('auth/register.html', form=form), 503
         user = User(
             email=email,
             name=email.split('@')[0],  # дефолт вместо имени
-            password_hash=generate_password_hash(form.password.data)
+            password_hash=password_hash
         )
         db.session.add(user)
         db.session.commit()
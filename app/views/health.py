@@ -0,0 +1,64 @@
+# app/views/health.py
+# -*- coding: utf-8 -*-
+"""
+Пробы для оркестратора и балансировщика (без входа, без шаблонов).
+
+    GET /healthz — процесс жив и отвечает (liveness)
+    GET /readyz  — готов принимать трафик (readiness): база отвечает и
+                   схема на последней миграции; иначе 503
+"""
+
+import os
+
+from alembic.script import ScriptDirectory
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import text
+
+from .. import db
+
+bp = Blueprint('health', __name__)
+
+_head = None
+
+
+def migrations_head() -> str:
+    global _head
+    if _head is None:
+        directory = current_app.extensions['migrate'].directory
+        if not os.path.isabs(directory):
+            directory = os.path.join(current_app.root_path, '..', directory)
+        _head = ScriptDirectory(directory).get_current_head()
+    return _head
+
+
+def readiness() -> dict:
+    """{'database': 'ok'|ошибка, 'schema': 'ok'|...} — общая для /readyz и flask wait_ready."""
+    checks = {}
+    try:
+        db.session.execute(text('SELECT 1'))
+        checks['database'] = 'ok'
+    except Exception as e:
+        db.session.rollback()
+        checks['database'] = f'недоступна: {e.__class__.__name__}'
+        checks['schema'] = 'не проверена'
+        return checks
+    try:
+        current = db.session.execute(text('SELECT version_num FROM alembic_version')).scalar()
+    except Exception:
+        db.session.rollback()
+        current = None
+    head = migrations_head()
+    checks['schema'] = 'ok' if current == head else f'ревизия {current}, нужна {head}'
+    return checks
+
+
+@bp.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok'})
+
+
+@bp.route('/readyz')
+def readyz():
+    checks = readiness()
+    ready = all(v == 'ok' for v in checks.values())
+    return jsonify({'status': 'ready' if ready else 'not ready', 'checks': checks}), 200 if ready else 503
@@ -1,27 +1,43 @@
 # app/views/main.py
 # -*- coding: utf-8 -*-
 
-from flask import Blueprint, render_template, request, flash
+import base64
+import tempfile
+from itertools import chain
+
+from flask import Blueprint, Response, render_template, request, flash, stream_with_context
 from flask_login import login_required, current_user
 from hashlib import sha256
+from werkzeug.utils import secure_filename
 
 from .. import db
-from ..models import Lab, Submission
+from ..models import Lab, Submission, UserStats
+from ..pagination import paginate
+from ..admission import admission, cost_of
+from ..page_cache import page_cache
+from ..submission_sink import submission_sink
 
 # Формы
 from ..forms import (
-    CaesarForm, VigenereForm, AESForm, RSAForm,
-    RC4Form, PlayfairForm, RailFenceForm, SHA256Form
+    CaesarForm, CaesarBruteForm, VigenereForm, VigenereBreakForm, AESForm, AESFileForm, RSAForm,
+    RC4Form, PlayfairForm, RailFenceForm, SHA256Form, PipelineForm
 )
 
 # Крипто-утилиты
 from ..crypto.caesar import caesar_encrypt, caesar_decrypt
 from ..crypto.vigenere import vigenere
-from ..crypto.aes import encrypt_cbc, decrypt_cbc
-from ..crypto.rsa import generate_keypair_pem, rsa_encrypt_b64, rsa_decrypt_b64
+from ..crypto.aes import encrypt_cbc, decrypt_cbc, encrypt_stream, decrypt_stream, read_chunks, STREAM_MODES
+from ..crypto.rsa import (
+    rsa_encrypt_b64, rsa_decrypt_b64,
+    rsa_hybrid_encrypt_b64, rsa_hybrid_decrypt_b64
+)
+from ..crypto.rsa_pool import key_pool
 from ..crypto.rc4 import rc4_encrypt_b64, rc4_decrypt_b64
 from ..crypto.playfair import playfair_encrypt, playfair_decrypt
 from ..crypto.railfence import railfence_encrypt, railfence_decrypt
+from ..crypto.analysis import caesar_bruteforce, vigenere_break, detect_lang
+from ..crypto.sha256util import sha256_hex, sha256_fileobj
+from ..crypto.pipeline import Pipeline, CIPHERS, BYTES
 
 bp = Blueprint('main', __name__)
 
@@ -32,16 +48,19 @@ def index():
 @bp.route('/profile')
 @login_required
 def profile():
-    subs = (Submission.query
-            .filter_by(user_id=current_user.id)
-            .order_by(Submission.id.desc())
-            .all())
-    return render_template('profile.html', subs=subs)
+    page = paginate(Submission.query.filter_by(user_id=current_user.id),
+                    (Submission.created_at, Submission.id))
+    # общее число — из user_stats, а не len() по странице
+    us = db.session.get(UserStats, current_user.id)
+    return render_template('profile.html', subs=page.items, page=page,
+                           total=us.total if us else 0)
 
 # ===== Песочницы =====
 
 @bp.route('/playground/caesar', methods=['GET', 'POST'])
 @login_required
+@admission.limit(cost_of('caesar'))
+@page_cache.cached()
 def pg_caesar():
     form = CaesarForm()
     result = None
@@ -55,8 +74,25 @@ def pg_caesar():
             result = caesar_decrypt(txt, shift)
     return render_template('playground/caesar.html', form=form, result=result)
 
+@bp.route('/playground/caesar/bruteforce', methods=['GET', 'POST'])
+@login_required
+@admission.limit(cost_of('caesar.bruteforce'))
+@page_cache.cached()
+def pg_caesar_brute():
+    form = CaesarBruteForm()
+    candidates = best = lang = None
+    if form.validate_on_submit():
+        txt = form.text.data
+        lang = form.lang.data if form.lang.data in ('ru', 'en') else detect_lang(txt)
+        candidates = caesar_bruteforce(txt, lang)
+        best = caesar_decrypt(txt, candidates[0].shift)
+    return render_template('playground/caesar_brute.html', form=form,
+                           candidates=candidates, best=best, lang=lang)
+
 @bp.route('/playground/vigenere', methods=['GET', 'POST'])
 @login_required
+@admission.limit(cost_of('vigenere'))
+@page_cache.cached()
 def pg_vigenere():
     form = VigenereForm()
     result = None
@@ -69,8 +105,27 @@ def pg_vigenere():
             result = vigenere(txt, key, encrypt=False)
     return render_template('playground/vigenere.html', form=form, result=result)
 
+@bp.route('/playground/vigenere/break', methods=['GET', 'POST'])
+@login_required
+@admission.limit(cost_of('vigenere.break'))
+@page_cache.cached()
+def pg_vigenere_break():
+    form = VigenereBreakForm()
+    candidates = best = lang = None
+    if form.validate_on_submit():
+        txt = form.text.data
+        lang = form.lang.data if form.lang.data in ('ru', 'en') else detect_lang(txt)
+        # в веб-воркере процессы не плодим — считаем в текущем
+        candidates = vigenere_break(txt, lang, top=5, max_len=form.max_len.data or 24, workers=1)
+        if candidates:
+            best = vigenere(txt, candidates[0].key, encrypt=False)
+    return render_template('playground/vigenere_break.html', form=form,
+                           candidates=candidates, best=best, lang=lang)
+
 @bp.route('/playground/aes', methods=['GET', 'POST'])
 @login_required
+@admission.limit(cost_of('aes'))
+@page_cache.cached()
 def pg_aes():
     form = AESForm()
     enc = dec = err = None
@@ -91,17 +146,93 @@ def pg_aes():
             err = f'Ошибка AES: {e}'
     return render_template('playground/aes.html', form=form, enc=enc, dec=dec, err=err)
 
+# Расшифровка до ответа: до стольких байт — в памяти, дальше — во временном файле
+DECRYPT_SPOOL_MEMORY = 1024 * 1024
+
+
+def _spooled(gen):
+    """Прогоняет gen целиком во временный файл и отдаёт его кусками."""
+    out = tempfile.SpooledTemporaryFile(max_size=DECRYPT_SPOOL_MEMORY)
+    try:
+        for chunk in gen:
+            out.write(chunk)
+        out.seek(0)
+    except BaseException:
+        out.close()
+        raise
+
+    def read():
+        with out:
+            yield from read_chunks(out)
+    return read()
+
+
+def _aes_stream_response(stream, key: bytes, mode: str, cipher: str, filename: str):
+    """
+    Шифрование идёт потоком прямо в ответ (до ответа ловится только неверная
+    длина ключа). Расшифровка сначала целиком проходит во временный файл:
+    неверный ключ, паддинг CBC или тег GCM дают ValueError до начала ответа,
+    а не обрезанную загрузку.
+    """
+    chunks = read_chunks(stream)
+    if mode == 'enc':
+        if cipher not in STREAM_MODES:
+            raise ValueError(f'Неизвестный режим AES: {cipher}')
+        gen = encrypt_stream(chunks, key, cipher)
+        name = filename + '.clab'
+    else:
+        gen = _spooled(decrypt_stream(chunks, key))
+        name = filename[:-5] if filename.endswith('.clab') else filename + '.dec'
+    first = next(gen, b'')
+    return Response(stream_with_context(chain([first], gen)),
+                    mimetype='application/octet-stream',
+                    headers={'Content-Disposition': f'attachment; filename="{secure_filename(name) or "data.bin"}"'})
+
+@bp.route('/playground/aes/file', methods=['GET', 'POST'])
+@login_required
+@admission.limit(cost_of('aes.file'))
+@page_cache.cached()
+def pg_aes_file():
+    form = AESFileForm()
+    err = None
+    if request.method == 'POST' and request.mimetype != 'multipart/form-data':
+        # «сырое» тело без формы, например:
+        # curl --data-binary @f.bin -H 'X-AES-Key: ...' '.../playground/aes/file?mode=enc&cipher=gcm'
+        try:
+            return _aes_stream_response(request.stream,
+                                        request.headers.get('X-AES-Key', '').encode('utf-8'),
+                                        request.args.get('mode', 'enc'),
+                                        request.args.get('cipher', 'gcm'),
+                                        request.args.get('filename', 'data.bin'))
+        except ValueError as e:
+            return Response(f'Ошибка AES: {e}', status=400, mimetype='text/plain')
+    if form.validate_on_submit():
+        f = form.file.data
+        try:
+            return _aes_stream_response(f.stream, form.key.data.encode('utf-8'),
+                                        form.mode.data, form.cipher.data,
+                                        f.filename or 'data.bin')
+        except ValueError as e:
+            err = f'Ошибка AES: {e}'
+    return render_template('playground/aes_file.html', form=form, err=err)
+
 @bp.route('/playground/rsa', methods=['GET', 'POST'])
 @login_required
+@admission.limit(cost_of('rsa.keygen'))
+@page_cache.cached()
 def pg_rsa():
     form = RSAForm()
     enc = dec = pub_pem = priv_pem = None
     if form.validate_on_submit():
         text = (form.text.data or '').strip()
         try:
-            priv_pem, pub_pem = generate_keypair_pem(bits=2048)
-            enc = rsa_encrypt_b64(text, pub_pem)
-            dec = rsa_decrypt_b64(enc, priv_pem)
+            priv_pem, pub_pem = key_pool.get_pem(bits=2048)
+            if form.scheme.data == 'hybrid':
+                enc = rsa_hybrid_encrypt_b64(text, pub_pem)
+                dec = rsa_hybrid_decrypt_b64(enc, priv_pem)
+            else:
+                enc = rsa_encrypt_b64(text, pub_pem)
+                dec = rsa_decrypt_b64(enc, priv_pem)
         except Exception as e:
             flash(f'Ошибка RSA: {e}', 'danger')
     return render_template('playground/rsa.html',
@@ -110,6 +241,8 @@ def pg_rsa():
 
 @bp.route('/playground/rc4', methods=['GET', 'POST'])
 @login_required
+@admission.limit(cost_of('rc4'))
+@page_cache.cached()
 def pg_rc4():
     form = RC4Form()
     enc = dec = err = None
@@ -130,6 +263,8 @@ def pg_rc4():
 
 @bp.route('/playground/playfair', methods=['GET', 'POST'])
 @login_required
+@admission.limit(cost_of('playfair'))
+@page_cache.cached()
 def pg_playfair():
     form = PlayfairForm()
     enc = dec = err = None
@@ -149,38 +284,81 @@ def pg_playfair():
 
 @bp.route('/playground/railfence', methods=['GET', 'POST'])
 @login_required
+@admission.limit(cost_of('railfence'))
+@page_cache.cached()
 def pg_railfence():
     form = RailFenceForm()
     result = None
     if form.validate_on_submit():
         txt = form.text.data
         rails = form.rails.data
+        offset = form.offset.data or 0
         if getattr(form, 'mode', None) and form.mode.data == 'enc':
-            result = railfence_encrypt(txt, rails)
+            result = railfence_encrypt(txt, rails, offset)
         else:
-            result = railfence_decrypt(txt, rails)
+            result = railfence_decrypt(txt, rails, offset)
     return render_template('playground/railfence.html', form=form, result=result)
 
 @bp.route('/playground/sha256', methods=['GET', 'POST'])
 @login_required
+@admission.limit(cost_of('sha256'))
+@page_cache.cached()
 def pg_sha256():
     form = SHA256Form()
     digest = None
     if form.validate_on_submit():
-        import hashlib
-        digest = hashlib.sha256(form.text.data.encode('utf-8')).hexdigest()
+        if form.file.data:
+            # загрузка хэшируется кусками, без чтения файла целиком
+            digest = sha256_fileobj(form.file.data.stream)
+        else:
+            digest = sha256_hex(form.text.data)
     return render_template('playground/sha256.html', form=form, digest=digest)
 
+PIPELINE_EXAMPLE = ('[{"cipher": "vigenere", "key": "лимон"},\n'
+                    ' {"cipher": "railfence", "rails": 3},\n'
+                    ' {"cipher": "rc4", "key": "secret"},\n'
+                    ' {"cipher": "base64"}]')
+
+@bp.route('/playground/pipeline', methods=['GET', 'POST'])
+@login_required
+@admission.limit(cost_of('pipeline'))
+@page_cache.cached()
+def pg_pipeline():
+    form = PipelineForm()
+    if not form.spec.data:
+        form.spec.data = PIPELINE_EXAMPLE
+    result = err = stages = None
+    if form.validate_on_submit():
+        try:
+            pipe = Pipeline.from_spec(form.spec.data, decrypt=(form.mode.data == 'dec'))
+            stages = pipe.spec()
+            data = form.text.data
+            if pipe.input_type == BYTES:
+                # байтовый вход: шифртекст — из Base64, открытый текст — UTF-8
+                data = base64.b64decode(data) if form.mode.data == 'dec' else data.encode('utf-8')
+            result = pipe.apply(data)
+            if pipe.output_type == BYTES:
+                # байтовый выход показываем в Base64
+                result = base64.b64encode(result).decode('ascii')
+        except ValueError as e:
+            # PipelineError — тоже ValueError; сюда же битый Base64 и тег GCM
+            err = f'Ошибка конвейера: {e}'
+    return render_template('playground/pipeline.html', form=form, result=result, err=err,
+                           stages=stages, ciphers=sorted(CIPHERS.values(), key=lambda c: c.name))
+
 # ===== Лабы =====
 
 @bp.route('/labs')
 @login_required
+@page_cache.cached('labs')
 def labs_list():
-    labs = Lab.query.order_by(Lab.id.desc()).all()
-    return render_template('playground/labs_list.html', labs=labs)
+    # порядок как до пагинации (ORDER BY lab.id DESC): новые лабы сверху
+    page = paginate(Lab.query, (Lab.id,))
+    return render_template('playground/labs_list.html', labs=page.items, page=page)
 
 @bp.route('/labs/<int:lab_id>', methods=['GET', 'POST'])
 @login_required
+@page_cache.cached('labs')
 def solve_lab(lab_id):
     lab = Lab.query.get_or_404(lab_id)
     answer = None
@@ -188,9 +366,6 @@ def solve_lab(lab_id):
     if 'answer' in request.form:
         answer = request.form['answer']
         ok = (sha256(answer.encode()).hexdigest().lower() == lab.answer_hash.lower())
-        db.session.add(Submission(user_id=current_user.id,
-                                  lab_id=lab.id,
-                                  submitted_text=answer,
-                                  is_correct=ok))
-        db.session.commit()
+        # ответ проверен сразу, сама запись уходит в очередь (см. submission_sink)
+        submission_sink.submit(current_user.id, lab.id, answer, ok)
     return render_template('playground/lab_solve.html', lab=lab, ok=ok, answer=answer)
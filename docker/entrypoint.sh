@@ -1,5 +1,6 @@
 #!/bin/sh
 set -e
+flask wait_ready --db-only
 flask db upgrade
 python manage.py create_admin_if_needed
-exec flask run --host=0.0.0.0 --port=8000
+exec flask serve
@@ -0,0 +1,5 @@
+#!/bin/sh
+set -e
+# схему мигрирует web (docker/entrypoint.sh) — ждём её, а не мигрируем сами
+flask wait_ready
+exec flask jobs_worker --graceful 30
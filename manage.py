@@ -1,7 +1,7 @@
 from app import create_app, db
 from app.models import User
-from werkzeug.security import generate_password_hash
-import click, os
+from app.passwords import passwords
+import click, os, random, time
 
 app = create_app()
 
@@ -12,9 +12,236 @@ def create_admin_if_needed():
     password = os.getenv("ADMIN_PASSWORD", "admin123")
     if not User.query.filter_by(email=email).first():
         u = User(email=email, name=name, is_admin=True,
-                 password_hash=generate_password_hash(password))
+                 password_hash=passwords.hash(password))
         db.session.add(u)
         db.session.commit()
         click.echo(f"[OK] Admin user created: {email}")
     else:
         click.echo("[OK] Admin already exists")
+
+
+@app.cli.command("serve")
+@click.option("--bind", "-b", default=None, help="Адрес (по умолчанию SERVE_BIND)")
+@click.option("--workers", "-w", type=int, default=None, help="Процессов (по умолчанию SERVE_WORKERS или CPU+1)")
+@click.option("--threads", type=int, default=None, help="Потоков на процесс (SERVE_THREADS)")
+@click.option("--max-requests", type=int, default=None,
+              help="Перезапуск воркера после N запросов, 0 — никогда (SERVE_MAX_REQUESTS)")
+@click.option("--timeout", type=int, default=120, help="Убить зависший воркер через N с")
+@click.option("--graceful-timeout", type=int, default=30, help="Сколько ждать запросы при остановке/HUP, с")
+def serve(bind, workers, threads, max_requests, timeout, graceful_timeout):
+    """Боевой сервер: gunicorn, приложение загружено до fork. HUP — мягкий перезапуск воркеров."""
+    from app.server import serve as run_server
+    cfg = app.config
+    run_server(app,
+               bind=bind or cfg['SERVE_BIND'],
+               workers=workers or cfg['SERVE_WORKERS'] or None,
+               threads=threads or cfg['SERVE_THREADS'],
+               max_requests=cfg['SERVE_MAX_REQUESTS'] if max_requests is None else max_requests,
+               timeout=timeout, graceful_timeout=graceful_timeout)
+
+@app.cli.command("jobs_worker")
+@click.option("--concurrency", "-c", type=int, default=None, help="Процессов-исполнителей (по умолчанию — число CPU)")
+@click.option("--min-priority", type=int, default=None,
+              help="Брать только задачи с приоритетом не ниже (отдельный пул для срочных)")
+@click.option("--graceful", type=float, default=30.0, help="Сколько ждать текущие задачи при остановке, с")
+def jobs_worker(concurrency, min_priority, graceful):
+    """Исполнители фоновых задач из таблицы job (TERM/Ctrl-C — мягкая остановка)."""
+    from app.jobs import jobs
+    n = concurrency or os.cpu_count() or 1
+    click.echo(f"[OK] jobs_worker: {n} процессов"
+               + (f", приоритет >= {min_priority}" if min_priority is not None else ""))
+    jobs.serve(app, n, min_priority=min_priority, graceful=graceful, echo=click.echo)
+
+@app.cli.command("wait_ready")
+@click.option("--timeout", "-t", type=float, default=120.0, help="Сколько ждать, с")
+@click.option("--db-only", is_flag=True, help="Только доступность базы (до flask db upgrade)")
+def wait_ready(timeout, db_only):
+    """Ждёт готовности (как GET /readyz): база отвечает, схема на последней миграции."""
+    from app.views.health import readiness
+    deadline = time.monotonic() + timeout
+    while True:
+        checks = readiness()
+        if db_only:
+            checks = {'database': checks['database']}
+        if all(v == 'ok' for v in checks.values()):
+            click.echo("[OK] ready")
+            return
+        if time.monotonic() >= deadline:
+            raise click.ClickException(f"не готово за {timeout:.0f} s: {checks}")
+        click.echo(f"[..] ждём: {checks}")
+        time.sleep(2)
+
+@app.cli.command("rebuild_stats")
+def rebuild_stats():
+    """Пересчитывает user_stats/user_lab_stats из таблицы submission."""
+    from app import stats
+    t0 = time.perf_counter()
+    n = stats.rebuild()
+    click.echo(f"[OK] user_stats: {n} пользователей за {time.perf_counter() - t0:.2f} s")
+
+@app.cli.command("password_bench")
+@click.option("--target", "-t", type=float, default=0.25, help="Желаемое время одного хэша, с")
+@click.option("--algo", type=click.Choice(["scrypt", "pbkdf2"]), default="scrypt")
+def password_bench(target, algo):
+    """Подбирает стоимость хэша пароля под TARGET секунд на этой машине."""
+    from app.passwords import calibrate
+    method, tried = calibrate(target, algo)
+    for m, dt in tried:
+        click.echo(f"{m:<24} {dt * 1000:8.1f} ms")
+    click.echo(f"[OK] PASSWORD_HASH_METHOD={method}  (текущая политика: {passwords.method})")
+
+@app.cli.command("hash_tree")
+@click.argument("path", type=click.Path(exists=True))
+@click.option("--workers", "-w", type=int, default=None, help="Число потоков (по умолчанию — число CPU)")
+@click.option("--quiet", "-q", is_flag=True, help="Только итоговая строка")
+def hash_tree(path, workers, quiet):
+    """SHA-256 всех файлов под PATH (формат как у sha256sum) + пропускная способность."""
+    from app.crypto.sha256util import sha256_tree
+    t0 = time.perf_counter()
+    results = sha256_tree(path, workers)
+    elapsed = time.perf_counter() - t0
+    total = 0
+    errors = 0
+    for r in results:
+        if r.error:
+            errors += 1
+            click.echo(f"[ERR] {r.path}: {r.error}", err=True)
+            continue
+        total += r.size
+        if not quiet:
+            click.echo(f"{r.digest}  {r.path}")
+    mb = total / (1024 * 1024)
+    speed = mb / elapsed if elapsed > 0 else 0.0
+    click.echo(f"[OK] {len(results) - errors} files, {mb:.1f} MB in {elapsed:.2f} s — {speed:.1f} MB/s"
+               + (f", {errors} errors" if errors else ""))
+
+
+@app.cli.command("playfair_solve")
+@click.argument("source", type=click.File("r", encoding="utf-8"), default="-")
+@click.option("--lang", type=click.Choice(["auto", "ru", "en"]), default="auto")
+@click.option("--time", "time_limit", type=float, default=60.0, help="Лимит времени, с")
+@click.option("--workers", "-w", type=int, default=None, help="Процессов (по умолчанию — число CPU)")
+@click.option("--steps", type=int, default=None, help="Шагов отжига на один перезапуск")
+@click.option("--threshold", type=float, default=None, help="Целевая средняя log10-оценка квадграммы")
+@click.option("--corpus", type=click.Path(exists=True, dir_okay=False), default=None,
+              help="Свой корпус для квадграмм (текст на языке шифровки)")
+@click.option("--seed", type=int, default=None)
+def playfair_solve(source, lang, time_limit, workers, steps, threshold, corpus, seed):
+    """Подбор ключа Playfair по шифртексту из файла SOURCE (или stdin)."""
+    from app.crypto.playfair_solver import solve_playfair, DEFAULT_STEPS
+    res = solve_playfair(source.read(), lang=lang, time_limit=time_limit, workers=workers,
+                         threshold=threshold, corpus_path=corpus, steps=steps or DEFAULT_STEPS,
+                         seed=seed)
+    click.echo(f"key:       {res.key}")
+    click.echo(f"score:     {res.score:.1f} ({res.per_quadgram:.3f} на квадграмму)")
+    click.echo(f"threshold: {'достигнут' if res.reached_threshold else 'не достигнут'}")
+    speed = res.iterations / res.elapsed if res.elapsed > 0 else 0.0
+    click.echo(f"search:    {res.iterations} итераций, {res.restarts} перезапусков, "
+               f"{res.elapsed:.1f} s ({speed:.0f} it/s)")
+    click.echo(res.plaintext)
+
+
+@app.cli.command("pipeline")
+@click.argument("spec")
+@click.option("--input", "-i", "src", type=click.Path(exists=True, dir_okay=False), default=None,
+              help="Входной файл (по умолчанию stdin)")
+@click.option("--output", "-o", "dst", type=click.Path(dir_okay=False), default=None,
+              help="Выходной файл (по умолчанию stdout)")
+@click.option("--decrypt", "-d", is_flag=True, help="Обратный конвейер (расшифровка)")
+def pipeline(spec, src, dst, decrypt):
+    """Прогоняет вход через конвейер шифров. SPEC — JSON или путь к JSON-файлу."""
+    from app.crypto.pipeline import Pipeline, PipelineError, CHUNK_SIZE, TEXT
+    if os.path.isfile(spec):
+        with open(spec, encoding="utf-8") as f:
+            spec = f.read()
+    try:
+        pipe = Pipeline.from_spec(spec, decrypt=decrypt)
+    except PipelineError as e:
+        raise click.UsageError(str(e))
+
+    text_in = pipe.input_type == TEXT
+    text_out = pipe.output_type == TEXT
+    fin = click.open_file(src or "-", "r" if text_in else "rb", encoding="utf-8" if text_in else None)
+    fout = click.open_file(dst or "-", "w" if text_out else "wb", encoding="utf-8" if text_out else None)
+    with fin, fout:
+        for chunk in pipe.run(iter(lambda: fin.read(CHUNK_SIZE), "" if text_in else b"")):
+            fout.write(chunk)
+    if pipe.buffered_stages:
+        click.echo(f"[i] буферизуются целиком: {', '.join(pipe.buffered_stages)}", err=True)
+
+@app.cli.command("bench")
+@click.option("--sizes", default=None, help="Размеры входа, напр. 1K,64K,1M,10M (по умолчанию — полный набор)")
+@click.option("--quick", is_flag=True, help="Только 1K и 64K")
+@click.option("--algo", "-a", multiple=True, help="Только эти алгоритмы (можно несколько раз)")
+@click.option("--alphabet", multiple=True, type=click.Choice(["en", "ru", "mixed"]), help="Только эти алфавиты")
+@click.option("--baseline", "-b", type=click.Path(dir_okay=False), default="bench_baseline.json",
+              show_default=True, help="Файл базовой линии")
+@click.option("--save", is_flag=True, help="Записать результаты как новую базовую линию")
+@click.option("--threshold", "-t", type=float, default=0.2, show_default=True,
+              help="Допустимое падение ops/s (доля), больше — регрессия")
+@click.option("--no-trace", is_flag=True, help="Без прогона под tracemalloc")
+def bench(sizes, quick, algo, alphabet, baseline, save, threshold, no_trace):
+    """Микробенчмарки app/crypto: ops/s, MB/s, пик памяти; сравнение с базовой линией."""
+    from app.crypto import bench as b
+    if sizes:
+        size_list = b.parse_sizes(sizes)
+    else:
+        size_list = b.QUICK_SIZES if quick else b.DEFAULT_SIZES
+    cases = b.build_cases(size_list, alphabet or b.ALPHABETS, only=algo)
+    if not cases:
+        raise click.UsageError("Нет случаев под выбранные фильтры")
+    results = b.run(cases, progress=lambda r: click.echo(b.format_result(r)), trace=not no_trace)
+
+    if save:
+        b.save_baseline(baseline, results)
+        click.echo(f"[OK] Базовая линия записана: {baseline} ({len(results)} случаев)")
+        return
+    if not os.path.exists(baseline):
+        click.echo(f"[i] Базовой линии {baseline} нет — запустите с --save")
+        return
+
+    report = b.compare(results, b.load_baseline(baseline), threshold)
+    regressed = [c for c in report if c.regressed]
+    for c in regressed:
+        click.echo(f"[REGRESSION] {c.id}: {c.baseline_ops:.1f} -> {c.current_ops:.1f} ops/s "
+                   f"({(c.ratio - 1) * 100:+.0f}%)")
+    click.echo(f"Сравнено {len(report)} случаев, регрессий: {len(regressed)} (порог {threshold:.0%})")
+    if regressed:
+        raise SystemExit(1)
+
+@app.cli.command("generate_labs")
+@click.option("--count", "-n", type=int, default=100, show_default=True, help="Вариантов на каждый алгоритм")
+@click.option("--algo", "-a", multiple=True, help="Алгоритмы (можно несколько раз; по умолчанию все шаблоны)")
+@click.option("--key", "-k", "keys", multiple=True,
+              help="Диапазон ключа: caesar=1-25 (сдвиг), vigenere/playfair/rc4=N-M (длина), "
+                   "railfence=N-M (рельсы), aes=16-32 (байты)")
+@click.option("--corpus", multiple=True, type=click.Path(exists=True, dir_okay=False),
+              help="Корпус открытых текстов (можно несколько; по умолчанию app/crypto/data/corpus_*.txt)")
+@click.option("--length", default="80-200", show_default=True, help="Длина открытого текста, символов")
+@click.option("--prefix", default="", help="Префикс заголовков, напр. 'Осень 2026 · '")
+@click.option("--seed", type=int, default=None, help="Seed (по умолчанию случайный, печатается)")
+@click.option("--workers", "-w", type=int, default=None, help="Процессов (по умолчанию — число CPU)")
+@click.option("--batch", type=int, default=500, show_default=True, help="Лаб в пачке: один INSERT и один commit")
+@click.option("--dry-run", is_flag=True, help="Показать по варианту каждого алгоритма, ничего не вставлять")
+def generate_labs(count, algo, keys, corpus, length, prefix, seed, workers, batch, dry_run):
+    """Массово создаёт лабы со случайными ключами по шаблонам app/labgen.py."""
+    from app import labgen
+    from app.page_cache import page_cache
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    try:
+        chunks = labgen.plan(algo or list(labgen.TEMPLATES), 1 if dry_run else count, seed, corpus,
+                             labgen.key_ranges(keys), labgen.parse_range(length), prefix, batch)
+    except labgen.LabGenError as e:
+        raise click.UsageError(str(e))
+    if dry_run:
+        for rows in labgen.generate(chunks, workers=1):
+            for r in rows:
+                click.echo(f"--- {r['title']} [{r['algorithm']}]\n{r['description']}\n"
+                           f"payload: {r['payload']}\nanswer_hash: {r['answer_hash']}")
+        return
+    t0 = time.perf_counter()
+    total = labgen.insert_batches(labgen.generate(chunks, workers),
+                                  progress=lambda n: click.echo(f"[..] {n} лаб"))
+    page_cache.invalidate('labs')
+    click.echo(f"[OK] {total} лаб за {time.perf_counter() - t0:.2f} s (seed {seed})")
@@ -0,0 +1,44 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002_user_stats'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('user_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), primary_key=True),
+        sa.Column('ok', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('first_solved_at', sa.DateTime(), nullable=True)
+    )
+    op.create_index('ix_user_stats_rank', 'user_stats', ['ok', 'total'])
+    op.create_table('user_lab_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), primary_key=True),
+        sa.Column('lab_id', sa.Integer(), sa.ForeignKey('lab.id'), primary_key=True),
+        sa.Column('ok', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('first_solved_at', sa.DateTime(), nullable=True)
+    )
+    op.create_index('ix_user_lab_stats_lab', 'user_lab_stats', ['lab_id'])
+
+    # заполняем из уже накопленных отправок
+    op.execute(
+        "INSERT INTO user_stats (user_id, ok, total, first_solved_at) "
+        "SELECT user_id, SUM(CASE WHEN is_correct THEN 1 ELSE 0 END), COUNT(*), "
+        "MIN(CASE WHEN is_correct THEN created_at END) "
+        "FROM submission GROUP BY user_id"
+    )
+    op.execute(
+        "INSERT INTO user_lab_stats (user_id, lab_id, ok, total, first_solved_at) "
+        "SELECT user_id, lab_id, SUM(CASE WHEN is_correct THEN 1 ELSE 0 END), COUNT(*), "
+        "MIN(CASE WHEN is_correct THEN created_at END) "
+        "FROM submission GROUP BY user_id, lab_id"
+    )
+
+def downgrade():
+    op.drop_index('ix_user_lab_stats_lab', table_name='user_lab_stats')
+    op.drop_table('user_lab_stats')
+    op.drop_index('ix_user_stats_rank', table_name='user_stats')
+    op.drop_table('user_stats')
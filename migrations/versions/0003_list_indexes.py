@@ -0,0 +1,23 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003_list_indexes'
+down_revision = '0002_user_stats'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # keyset-пагинация сравнивает (created_at, id) — NULL там выпадал бы из списков
+    for table in ('"user"', 'lab', 'submission'):
+        op.execute(f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+
+    op.create_index('ix_submission_user_created', 'submission', ['user_id', 'created_at', 'id'])
+    op.create_index('ix_submission_lab_created', 'submission', ['lab_id', 'created_at'])
+    op.create_index('ix_lab_created', 'lab', ['created_at', 'id'])
+    op.create_index('ix_user_created', 'user', ['created_at', 'id'])
+
+def downgrade():
+    op.drop_index('ix_user_created', table_name='user')
+    op.drop_index('ix_lab_created', table_name='lab')
+    op.drop_index('ix_submission_lab_created', table_name='submission')
+    op.drop_index('ix_submission_user_created', table_name='submission')
@@ -0,0 +1,37 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004_jobs'
+down_revision = '0003_list_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('job',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('params', sa.Text(), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+        sa.Column('progress', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('message', sa.String(length=255), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('worker', sa.String(length=100), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True)
+    )
+    op.create_index('ix_job_queue', 'job', ['status', 'priority', 'id'])
+    op.create_index('ix_job_user_created', 'job', ['user_id', 'created_at', 'id'])
+    op.create_index('ix_job_expires', 'job', ['expires_at'])
+
+def downgrade():
+    op.drop_index('ix_job_expires', table_name='job')
+    op.drop_index('ix_job_user_created', table_name='job')
+    op.drop_index('ix_job_queue', table_name='job')
+    op.drop_table('job')
@@ -0,0 +1,13 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005_job_attempts'
+down_revision = '0004_jobs'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('job', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+
+def downgrade():
+    op.drop_column('job', 'attempts')
@@ -0,0 +1,71 @@
+# tests/conftest.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from werkzeug.security import generate_password_hash
+
+# дешёвый хэш паролей и никаких фоновых пулов/процессов в тестах
+TEST_ENV = {
+    'SECRET_KEY': 'test',
+    'RSA_POOL_DEPTH': '0',
+    'API_BATCH_WORKERS': '0',
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'PASSWORD_HASH_WORKERS': '0',
+    'ADMISSION_ENABLED': '0',
+    'METRICS_DIR': '',
+}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    for key, value in TEST_ENV.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('PAGE_CACHE_STAMP', str(tmp_path / 'pages.stamp'))
+    monkeypatch.setenv('JOB_DIR', str(tmp_path / 'jobs'))
+    monkeypatch.setenv('ADMISSION_SQLITE_PATH', str(tmp_path / 'admission.db'))
+
+    from app import create_app, db
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+    # запросы клиента не должны идти внутри общего app context:
+    # иначе g (и current_user в нём) один на всех клиентов
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def users(app):
+    from app import db
+    from app.models import User
+    with app.app_context():
+        return _create_users(db, User)
+
+
+def _create_users(db, User):
+    admin = User(email='admin@x', name='Admin', is_admin=True,
+                 password_hash=generate_password_hash('pw123456', method='pbkdf2:sha256:1000'))
+    student = User(email='student@x', name='Student',
+                   password_hash=generate_password_hash('pw123456', method='pbkdf2:sha256:1000'))
+    db.session.add_all([admin, student])
+    db.session.commit()
+    return {'admin': admin.id, 'student': student.id}
+
+
+def login(client, email, password='pw123456'):
+    r = client.post('/auth/login', data={'email': email, 'password': password})
+    assert r.status_code == 302, r.status_code
+    return client
+
+
+@pytest.fixture
+def student(app, users):
+    return login(app.test_client(), 'student@x')
+
+
+@pytest.fixture
+def admin(app, users):
+    return login(app.test_client(), 'admin@x')
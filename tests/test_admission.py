@@ -0,0 +1,48 @@
+# tests/test_admission.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from app.admission import SQLiteBackend, admission
+
+
+@pytest.fixture
+def tight(app, monkeypatch):
+    # ведро пользователя на одну SHA-256 и почти без пополнения
+    monkeypatch.setattr(admission, 'enabled', True)
+    monkeypatch.setattr(admission, 'user_rate', 0.001)
+    monkeypatch.setattr(admission, 'user_burst', 1.5)
+    return admission
+
+
+def test_default_backend_is_shared(app):
+    assert isinstance(admission.backend, SQLiteBackend)
+
+
+def test_browser_gets_form_with_flash(student, tight):
+    html = {'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'}
+    assert student.post('/playground/sha256', data={'text': 'a'}, headers=html).status_code == 200
+    resp = student.post('/playground/sha256', data={'text': 'a'}, headers=html)
+    assert resp.status_code == 303 and resp.headers['Location'].endswith('/playground/sha256')
+    page = student.get('/playground/sha256', headers=html).get_data(as_text=True)
+    assert 'Слишком много тяжёлых запросов' in page and '<form' in page
+
+
+def test_scripts_get_429(student, tight):
+    student.post('/playground/sha256', data={'text': 'a'})
+    resp = student.post('/playground/sha256', data={'text': 'a'}, headers={'Accept': 'text/plain'})
+    assert resp.status_code == 429 and resp.headers['Retry-After']
+
+
+def test_heavier_than_bucket_goes_to_jobs(student, tight):
+    resp = student.post('/api/v1/rsa/keygen', json={'bits': 2048})
+    assert resp.status_code == 429 and 'Retry-After' not in resp.headers
+    assert '/api/v1/jobs' in resp.get_json()['error']
+    # в ведре ничего не списано
+    assert student.post('/playground/sha256', data={'text': 'a'}, headers={'Accept': 'text/plain'}).status_code == 200
+
+
+def test_default_accept_is_not_a_browser(student, tight):
+    any_type = {'Accept': '*/*'}
+    student.post('/playground/sha256', data={'text': 'a'}, headers=any_type)
+    resp = student.post('/playground/sha256', data={'text': 'a'}, headers=any_type)
+    assert resp.status_code == 429 and resp.headers['Retry-After']
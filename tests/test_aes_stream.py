@@ -0,0 +1,66 @@
+# tests/test_aes_stream.py
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from app.crypto.aes import STREAM_CHUNK, decrypt_stream, encrypt_stream
+
+KEY = b'0123456789abcdef'
+
+
+def enc(data: bytes, mode: str) -> bytes:
+    return b''.join(encrypt_stream([data[i:i + 1000] for i in range(0, len(data), 1000)] or [b''], KEY, mode))
+
+
+def dec(blob: bytes, key: bytes = KEY) -> list:
+    # куски нарочно не совпадают с границами сегментов
+    return list(decrypt_stream([blob[i:i + 777] for i in range(0, len(blob), 777)], key))
+
+
+@pytest.mark.parametrize('mode', ['cbc', 'ctr', 'gcm'])
+@pytest.mark.parametrize('size', [0, 15, STREAM_CHUNK, 2 * STREAM_CHUNK + 5])
+def test_roundtrip(mode, size):
+    data = os.urandom(size)
+    assert b''.join(dec(enc(data, mode))) == data
+
+
+def test_gcm_releases_nothing_before_bad_segment():
+    data = os.urandom(3 * STREAM_CHUNK)
+    blob = bytearray(enc(data, 'gcm'))
+    blob[-20] ^= 1  # портим последний сегмент
+    out = []
+    with pytest.raises(ValueError):
+        for chunk in decrypt_stream([bytes(blob)], KEY):
+            out.append(chunk)
+    # отданы только проверенные сегменты — ровно первые два
+    assert b''.join(out) == data[:2 * STREAM_CHUNK]
+
+
+def test_gcm_wrong_key_fails_on_first_segment():
+    blob = enc(os.urandom(3 * STREAM_CHUNK), 'gcm')
+    gen = decrypt_stream([blob], b'f' * 16)
+    with pytest.raises(ValueError):
+        next(gen)
+
+
+def test_gcm_truncation_detected():
+    blob = enc(os.urandom(2 * STREAM_CHUNK + 1), 'gcm')
+    # отрезан последний сегмент целиком: предпоследний не помечен как последний
+    cut = len(blob) - (4 + 1 + 16)
+    with pytest.raises(ValueError):
+        dec(blob[:cut])
+
+
+def post_dec(client, blob, key):
+    return client.post('/playground/aes/file?mode=dec', data=blob,
+                       headers={'X-AES-Key': key, 'Content-Type': 'application/octet-stream'})
+
+
+def test_playground_errors_before_response(student):
+    # неверный ключ GCM и обрезанный CBC — 400 до первого байта, а не обрезанный файл
+    assert post_dec(student, enc(b'secret' * 20000, 'gcm'), 'f' * 16).status_code == 400
+    blob = enc(b'secret' * 1000, 'cbc')
+    assert post_dec(student, blob[:-3], KEY.decode()).status_code == 400
+    r = post_dec(student, blob, KEY.decode())
+    assert r.status_code == 200 and r.data == b'secret' * 1000
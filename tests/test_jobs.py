@@ -0,0 +1,137 @@
+# tests/test_jobs.py
+# -*- coding: utf-8 -*-
+import json
+import os
+
+from app import db
+from app.jobs import DONE, FAILED, QUEUED, RUNNING, jobs
+from app.models import Job, User
+
+XHR = {'X-Requested-With': 'XMLHttpRequest'}
+
+
+def _touch(name):
+    with open(jobs.path(name), 'wb') as f:
+        f.write(b'x')
+    return name
+
+
+def test_user_delete_removes_jobs_and_files(app, admin, users):
+    uid = users['student']
+    with app.app_context():
+        queued = jobs.enqueue('op', {'op': 'sha256.hash', 'input': _touch('in-1')}, user_id=uid)
+        done = jobs.enqueue('op', {'op': 'sha256.hash'}, user_id=uid)
+        done.status, done.result = DONE, json.dumps({'file': _touch('out-2')})
+        running = jobs.enqueue('op', {'op': 'sha256.hash'}, user_id=uid)
+        running.status = RUNNING
+        db.session.commit()
+        ids = queued.id, done.id, running.id
+
+    assert admin.post(f'/admin/users/{uid}/delete').status_code == 302
+    with app.app_context():
+        assert db.session.get(User, uid) is None
+        assert db.session.get(Job, ids[0]) is None and db.session.get(Job, ids[1]) is None
+        left = db.session.get(Job, ids[2])
+        assert left.user_id is None and left.cancel_requested and left.status == RUNNING
+    assert not os.path.exists(jobs.path('in-1')) and not os.path.exists(jobs.path('out-2'))
+
+
+def test_queued_cancel(app, users):
+    with app.app_context():
+        row = jobs.enqueue('op', {'op': 'sha256.hash', 'params': {'text': 'a'}}, user_id=users['student'])
+        assert row.status == QUEUED
+        assert jobs.cancel(row) == 'cancelled'
+
+
+def test_secrets_scrubbed_after_run(app, users):
+    with app.app_context():
+        row = jobs.enqueue('op', {'op': 'pipeline.run', 'params': {
+            'text': 'abc', 'key': 'top', 'spec': [{'cipher': 'rc4', 'key': 'secret'}, {'cipher': 'base64'}]}},
+            user_id=users['student'])
+        claimed = jobs.claim('test')
+        assert claimed.id == row.id
+        assert jobs.run_one(claimed) == DONE
+        db.session.expire_all()
+        stored = db.session.get(Job, row.id)
+        assert 'secret' not in stored.params and 'top' not in stored.params
+        assert json.loads(stored.params)['params']['spec'][0] == {'cipher': 'rc4'}
+
+
+def test_upload_size_limit(app, student):
+    import io
+    jobs.max_upload = 1024
+
+    def upload(size):
+        return student.post('/api/v1/jobs', content_type='multipart/form-data', headers=XHR, data={
+            'kind': 'aes.file', 'key': '0123456789abcdef', 'mode': 'enc',
+            'file': (io.BytesIO(b'x' * size), 'f.bin')})
+
+    assert upload(4096).status_code == 413
+    assert upload(100).status_code == 202
+    assert len(os.listdir(jobs.dir)) == 1
+
+
+def test_events_stream_is_bounded(app, student, monkeypatch):
+    from app.views import api
+    monkeypatch.setattr(api, 'EVENTS_MAX_SECONDS', 0.2)
+    jobs.poll_seconds = 0.05
+    job_id = student.post('/api/v1/jobs', json={
+        'kind': 'op', 'params': {'op': 'sha256.hash', 'params': {'text': 'a'}}}).get_json()['id']
+    body = student.get(f'/api/v1/jobs/{job_id}/events').get_data(as_text=True)
+    # задача так и не выполнилась, но поток закрылся сам
+    assert body.startswith('retry: ') and '"status": "queued"' in body
+
+
+def test_stale_job_gives_up_after_max_attempts(app, users):
+    from datetime import datetime, timedelta
+    with app.app_context():
+        jobs.max_attempts = 2
+        row = jobs.enqueue('op', {'op': 'sha256.hash', 'params': {'text': 'a'}}, user_id=users['student'])
+        for attempt in (1, 2):
+            claimed = jobs.claim('test')
+            assert claimed.id == row.id and claimed.attempts == attempt
+            claimed.heartbeat_at = datetime.utcnow() - timedelta(seconds=jobs.stale_seconds + 10)
+            db.session.commit()
+            jobs.requeue_stale()
+            db.session.expire_all()
+            status = db.session.get(Job, row.id).status
+            assert status == (QUEUED if attempt == 1 else FAILED)
+        assert jobs.claim('test') is None
+
+
+def test_playfair_check_runs_as_job(app, admin):
+    from hashlib import sha256
+    from app.crypto.playfair import playfair_encrypt
+    from app.models import Lab
+    plain = 'THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG'
+    app.config['PLAYFAIR_SOLVER_SECONDS'] = 0.2
+    with app.app_context():
+        lab = Lab(title='pf', description='', algorithm='playfair',
+                  payload=playfair_encrypt(plain, 'KEYWORD'),
+                  answer_hash=sha256(plain.encode()).hexdigest())
+        db.session.add(lab)
+        db.session.commit()
+        lab_id = lab.id
+
+    resp = admin.post(f'/admin/labs/{lab_id}/playfair-check')
+    assert resp.status_code == 302
+    page = admin.get(resp.headers['Location'])
+    assert 'Страница обновится сама' in page.get_data(as_text=True)
+
+    with app.app_context():
+        row = jobs.claim('test')
+        assert row.kind == 'labs.playfair_check'
+        assert jobs.run_one(row) == DONE
+    page = admin.get(resp.headers['Location']).get_data(as_text=True)
+    assert 'Ключевая таблица' in page
+
+
+def test_form_posts_need_custom_header(app, student):
+    import io
+    form = {'kind': 'aes.file', 'key': '0123456789abcdef', 'mode': 'enc', 'file': (io.BytesIO(b'x'), 'f.bin')}
+    assert student.post('/api/v1/jobs', content_type='multipart/form-data', data=form).status_code == 403
+    job_id = student.post('/api/v1/jobs', json={
+        'kind': 'op', 'params': {'op': 'sha256.hash', 'params': {'text': 'a'}}}).get_json()['id']
+    assert student.post(f'/api/v1/jobs/{job_id}/cancel').status_code == 403
+    resp = student.post(f'/api/v1/jobs/{job_id}/cancel', headers=XHR)
+    assert resp.status_code == 200 and resp.get_json()['status'] == 'cancelled'
@@ -0,0 +1,54 @@
+# tests/test_metrics.py
+# -*- coding: utf-8 -*-
+import json
+import os
+import subprocess
+import sys
+
+from app.metrics import Metrics, EXITED
+
+
+def _registry(tmp_path):
+    m = Metrics()
+    m.counter('c_total', 'c')
+    m.gauge('g', 'g')
+    m.histogram('h', 'h', (1.0, 2.0))
+    m.dir = str(tmp_path)
+    return m
+
+
+def _dead_pid():
+    p = subprocess.Popen([sys.executable, '-c', 'pass'])
+    p.wait()
+    return p.pid
+
+
+def test_reap_folds_dead_process_into_exited(tmp_path):
+    m = _registry(tmp_path)
+    pid = _dead_pid()
+    with open(m._path(pid), 'w') as f:
+        json.dump({'c_total': {'': [5]}, 'g': {'': [7]}, 'h': {'': [1, 0, 0, 0.5]}}, f)
+    m.inc('c_total')
+    before = m.collect()
+
+    assert m.reap() == 1
+    assert not os.path.exists(m._path(pid))
+    after = m.collect()
+    assert after['c_total'][''] == before['c_total'][''] == [6]
+    assert after['h'] == before['h']
+    assert 'g' not in after
+
+    # второй завершившийся процесс прибавляется к тому же архиву
+    with open(m._path(pid), 'w') as f:
+        json.dump({'c_total': {'': [2]}}, f)
+    assert m.reap(pid) == 1
+    with open(m._path(EXITED)) as f:
+        assert json.load(f)['c_total'][''] == [7]
+
+
+def test_reap_keeps_live_processes(tmp_path):
+    m = _registry(tmp_path)
+    m.inc('c_total')
+    m.flush(force=True)
+    assert m.reap() == 0
+    assert os.path.exists(m._path(os.getpid()))
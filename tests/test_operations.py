@@ -0,0 +1,56 @@
+# tests/test_operations.py
+# -*- coding: utf-8 -*-
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.admission import admission
+from app.crypto.operations import BatchPool, MAX_BATCH_HEAVY, OperationError, PARALLEL_MIN_OPS, run_batch
+
+
+def _items(n):
+    return [('caesar.encrypt', {'text': f'abc{i}', 'shift': 3}) for i in range(n)]
+
+
+def test_pool_runs_batch_in_order():
+    pool = BatchPool(workers=2)
+    try:
+        out = pool.map(_items(PARALLEL_MIN_OPS))
+    finally:
+        pool.shutdown()
+    assert [r['result'] for r in out] == [f'def{i}' for i in range(PARALLEL_MIN_OPS)]
+
+
+def test_broken_pool_fails_batch_without_rerun(monkeypatch):
+    class Broken:
+        def map(self, *args, **kwargs):
+            raise BrokenProcessPool()
+
+        def shutdown(self, **kwargs):
+            pass
+
+    pool = BatchPool(workers=2)
+    monkeypatch.setattr(pool, '_executor', lambda: Broken())
+    out = pool.map(_items(PARALLEL_MIN_OPS))
+    assert all(not r['ok'] and 'аварийно' in r['error'] for r in out)
+
+
+def test_errors_are_per_operation():
+    out = run_batch([{'op': 'caesar.encrypt', 'params': {'text': 'a', 'shift': 1}}, {'op': 'nope'}, 'x'])
+    assert out[0] == {'ok': True, 'result': 'b'}
+    assert not out[1]['ok'] and not out[2]['ok']
+
+
+def test_heavy_ops_are_capped_per_batch():
+    breaks = [{'op': 'vigenere.break', 'params': {'text': 'abc'}}] * (MAX_BATCH_HEAVY + 1)
+    with pytest.raises(OperationError, match='/api/v1/jobs'):
+        run_batch(breaks)
+    with pytest.raises(OperationError, match='2048'):
+        run_batch([{'op': 'rsa.keygen', 'params': {'bits': 4096}}])
+
+
+def test_keygen_cost_scales_with_bits(student, monkeypatch):
+    monkeypatch.setattr(admission, 'enabled', True)
+    resp = student.post('/api/v1/batch', json={'ops': [{'op': 'rsa.keygen', 'params': {'bits': 4096}}]})
+    # 4096 бит дороже ведра пользователя — отказ ещё до выполнения
+    assert resp.status_code == 429 and '/api/v1/jobs' in resp.get_json()['error']
@@ -0,0 +1,56 @@
+# tests/test_page_cache.py
+# -*- coding: utf-8 -*-
+from hashlib import sha256
+
+import pytest
+
+from app import db
+from app.models import Lab
+from app.page_cache import page_cache
+
+
+@pytest.fixture
+def labs(app):
+    with app.app_context():
+        return _create_labs()
+
+
+def _create_labs():
+    items = [Lab(title=title, description='d', algorithm='caesar', payload=title.lower(),
+                 answer_hash=sha256(b'x').hexdigest())
+             for title in ('LAB-ONE', 'LAB-TWO')]
+    db.session.add_all(items)
+    db.session.commit()
+    return [lab.id for lab in items]
+
+
+def test_lab_pages_are_keyed_by_id(student, labs):
+    one, two = labs
+    assert b'LAB-ONE' in student.get(f'/labs/{one}').data
+    r = student.get(f'/labs/{two}')
+    assert b'LAB-TWO' in r.data and b'LAB-ONE' not in r.data
+    assert student.get('/labs/999').status_code == 404
+    assert page_cache.stats()['entries'] == 2
+
+
+def test_etag_revalidation(student, labs):
+    r = student.get(f'/labs/{labs[0]}')
+    etag = r.headers['ETag']
+    r = student.get(f'/labs/{labs[0]}', headers={'If-None-Match': etag})
+    assert r.status_code == 304 and not r.data
+
+
+def test_invalidate_drops_old_pages(app, student, labs):
+    student.get(f'/labs/{labs[0]}')
+    with app.app_context():
+        db.session.get(Lab, labs[0]).title = 'LAB-EDITED'
+        db.session.commit()
+    assert b'LAB-ONE' in student.get(f'/labs/{labs[0]}').data  # ещё из кэша
+    page_cache.invalidate('labs')
+    assert b'LAB-EDITED' in student.get(f'/labs/{labs[0]}').data
+
+
+def test_users_do_not_share_pages(app, student, admin, labs):
+    student.get('/labs')
+    r = admin.get('/labs')
+    assert b'admin@x' in r.data and b'student@x' not in r.data
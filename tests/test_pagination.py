@@ -0,0 +1,75 @@
+# tests/test_pagination.py
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Lab
+from app.pagination import decode_cursor, encode_cursor, keyset_page
+
+KEYS = (Lab.created_at, Lab.id)
+
+
+def _labs(n, same_time=False):
+    t0 = datetime(2024, 1, 1)
+    for i in range(n):
+        db.session.add(Lab(title=f'lab {i}', description='', algorithm='caesar', payload='x',
+                           answer_hash='0' * 64,
+                           created_at=t0 if same_time else t0 + timedelta(minutes=i)))
+    db.session.commit()
+
+
+def _titles(page):
+    return [lab.title for lab in page.items]
+
+
+def test_walk_forward_and_back(app):
+    with app.app_context():
+        _labs(7)
+        first = keyset_page(Lab.query, KEYS, per_page=3)
+        assert _titles(first) == ['lab 6', 'lab 5', 'lab 4']
+        assert not first.has_prev
+        second = keyset_page(Lab.query, KEYS, first.next_cursor, per_page=3)
+        third = keyset_page(Lab.query, KEYS, second.next_cursor, per_page=3)
+        assert _titles(second) == ['lab 3', 'lab 2', 'lab 1']
+        assert _titles(third) == ['lab 0'] and not third.has_next
+        back = keyset_page(Lab.query, KEYS, third.prev_cursor, per_page=3)
+        assert _titles(back) == _titles(second)
+
+
+def test_ties_broken_by_id(app):
+    with app.app_context():
+        _labs(5, same_time=True)
+        seen = []
+        cursor = None
+        while True:
+            page = keyset_page(Lab.query, KEYS, cursor, per_page=2)
+            seen += _titles(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        assert seen == [f'lab {i}' for i in reversed(range(5))]
+
+
+def test_insert_does_not_shift_open_page(app):
+    with app.app_context():
+        _labs(4)
+        first = keyset_page(Lab.query, KEYS, per_page=2)
+        db.session.add(Lab(title='new', description='', algorithm='caesar', payload='x',
+                           answer_hash='0' * 64, created_at=datetime(2025, 1, 1)))
+        db.session.commit()
+        assert _titles(keyset_page(Lab.query, KEYS, first.next_cursor, per_page=2)) == ['lab 1', 'lab 0']
+
+
+def test_bad_cursor_gives_first_page(app):
+    with app.app_context():
+        _labs(3)
+        assert decode_cursor('not-a-cursor', KEYS) is None
+        assert decode_cursor(encode_cursor('next', [1]), KEYS) is None
+        assert _titles(keyset_page(Lab.query, KEYS, 'garbage', per_page=2)) == ['lab 2', 'lab 1']
+
+
+def test_labs_list_keeps_newest_first(app, student):
+    with app.app_context():
+        _labs(3)
+    page = student.get('/labs').get_data(as_text=True)
+    assert page.index('lab 2') < page.index('lab 1') < page.index('lab 0')
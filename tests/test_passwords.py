@@ -0,0 +1,43 @@
+# tests/test_passwords.py
+# -*- coding: utf-8 -*-
+from flask import Flask
+
+from app.passwords import PasswordHasher, method_of
+
+
+class _User:
+    def __init__(self, password_hash):
+        self.password_hash = password_hash
+
+
+def _hasher(method, workers=0):
+    app = Flask(__name__)
+    app.config.update(PASSWORD_HASH_METHOD=method, PASSWORD_HASH_WORKERS=workers)
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    return hasher
+
+
+def test_short_method_is_normalised():
+    hasher = _hasher('pbkdf2')
+    assert hasher.method.startswith('pbkdf2:sha256:')
+    user = _User(hasher.hash('secret'))
+    assert method_of(user.password_hash) == hasher.method
+    assert not hasher.needs_rehash(user.password_hash)
+    assert hasher.verify_and_update(user, 'secret')
+
+
+def test_old_method_is_rehashed():
+    old = _hasher('pbkdf2:sha256:1000')
+    user = _User(old.hash('secret'))
+    new = _hasher('pbkdf2:sha256:2000')
+    assert new.verify_and_update(user, 'secret')
+    assert method_of(user.password_hash) == 'pbkdf2:sha256:2000'
+
+
+def test_pool_hashes_in_subprocess():
+    hasher = _hasher('pbkdf2:sha256:1000', workers=1)
+    try:
+        assert hasher.verify(hasher.hash('secret'), 'secret')
+    finally:
+        hasher.shutdown()
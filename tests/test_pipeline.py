@@ -0,0 +1,81 @@
+# tests/test_pipeline.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from app.crypto.pipeline import BYTES, CIPHERS, Pipeline, PipelineError, Stage, register
+from app.crypto.vigenere import vigenere
+
+TEXT = 'Съешь же ещё этих мягких французских булок, да выпей чаю. The quick brown fox! ' * 50
+
+
+def chunks(s, size):
+    return [s[i:i + size] for i in range(0, len(s), size)]
+
+
+@pytest.mark.parametrize('spec', [
+    [{'cipher': 'caesar', 'shift': 7}],
+    [{'cipher': 'vigenere', 'key': 'лимон'}, {'cipher': 'railfence', 'rails': 4, 'offset': 2}],
+    [{'cipher': 'vigenere', 'key': 'lemon'}, {'cipher': 'rc4', 'key': 'k'}, {'cipher': 'base64'}],
+    [{'cipher': 'aes', 'key': '0123456789abcdef', 'mode': 'gcm'}, {'cipher': 'base64'}],
+    [{'cipher': 'aes', 'key': '0123456789abcdef', 'mode': 'cbc'}],
+])
+def test_roundtrip(spec):
+    pipe = Pipeline.from_spec(spec)
+    out = pipe.apply(TEXT)
+    assert out != TEXT
+    back = Pipeline.from_spec(spec, decrypt=True).apply(out)
+    if isinstance(back, bytes):
+        back = back.decode('utf-8')
+    assert back == TEXT
+
+
+@pytest.mark.parametrize('size', [1, 7, 64, 1000])
+def test_vigenere_stream_matches_whole_text(size):
+    # позиция ключа не должна сбиваться на границах кусков
+    pipe = Pipeline.from_spec([{'cipher': 'vigenere', 'key': 'ключ'}])
+    assert ''.join(pipe.run(chunks(TEXT, size))) == vigenere(TEXT, 'ключ')
+
+
+def test_adapters_between_text_and_bytes():
+    pipe = Pipeline.from_spec([{'cipher': 'rc4', 'key': 'k'}])
+    assert pipe.input_type != BYTES and pipe.output_type == BYTES
+    assert [st.name for st in pipe.stages] == ['utf8', 'rc4']
+
+
+@pytest.mark.parametrize('stage', [
+    {'cipher': 'railfence', 'rails': 1},
+    {'cipher': 'railfence', 'rails': 1_000_000_000},
+    {'cipher': 'railfence', 'rails': [1]},
+    {'cipher': 'railfence', 'rails': 'три'},
+    {'cipher': 'railfence', 'rails': True},
+    {'cipher': 'railfence', 'offset': -1},
+    {'cipher': 'caesar', 'shift': {'a': 1}},
+    {'cipher': 'aes', 'key': 'short'},
+    {'cipher': 'vigenere'},
+    {'cipher': 'rot13'},
+    {'cipher': 'caesar', 'bogus': 1},
+])
+def test_bad_specs_are_pipeline_errors(stage):
+    with pytest.raises(PipelineError):
+        Pipeline.from_spec([stage])
+
+
+def test_too_many_stages():
+    with pytest.raises(PipelineError):
+        Pipeline.from_spec([{'cipher': 'caesar'}] * 17)
+
+
+def test_api_rejects_bad_rails(app, student):
+    r = student.post('/api/v1/pipeline/run',
+                     json={'spec': [{'cipher': 'railfence', 'rails': [1]}], 'text': 'abc'})
+    assert r.status_code == 400 and 'rails' in r.get_json()['error']
+
+
+def test_incomplete_stage_fails_at_registration():
+    class Half(Stage):
+        name = 'half'
+        buffered = True
+
+    with pytest.raises(TypeError):
+        register(Half)
+    assert 'half' not in CIPHERS
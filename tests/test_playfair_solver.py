@@ -0,0 +1,39 @@
+# tests/test_playfair_solver.py
+# -*- coding: utf-8 -*-
+import random
+
+from app.crypto.playfair import playfair_encrypt
+from app.crypto.playfair_solver import (
+    THRESHOLD_FACTOR, _score, load_quadgrams, prepare_ciphertext, solve_playfair,
+)
+
+# текст не из корпуса app/crypto/data/corpus_en.txt
+UNSEEN = ('Whenever the old lighthouse keeper climbed the spiral stairs at dusk he counted '
+          'every step aloud, partly from habit and partly because the rhythm kept his mind away '
+          'from the storm gathering over the harbour. Fishermen below were hauling their boats '
+          'above the tide line while children ran along the breakwater shouting at the gulls.')
+
+
+def _per_quadgram(letters, model):
+    idx = {ch: i for i, ch in enumerate(model.alph)}
+    seq = [idx[ch] for ch in letters]
+    return _score(seq, model.table, len(model.alph)) / (len(seq) - 3)
+
+
+def test_threshold_separates_unseen_text_from_noise():
+    model = load_quadgrams('en')
+    _, letters = prepare_ciphertext(UNSEEN, 'en')
+    threshold = model.corpus_avg * THRESHOLD_FACTOR
+    assert _per_quadgram(letters, model) >= threshold
+    shuffled = list(letters)
+    random.Random(1).shuffle(shuffled)
+    assert _per_quadgram(''.join(shuffled), model) < threshold
+
+
+def test_threshold_alone_does_not_stop_search():
+    # порог, который проходит любой ключ: без совпадения двух перезапусков
+    # решение не засчитывается
+    ct = playfair_encrypt(UNSEEN[:120], 'LIGHTHOUSE')
+    res = solve_playfair(ct, 'en', time_limit=0.5, workers=1, threshold=-100.0, steps=2000, seed=1)
+    assert not res.reached_threshold
+    assert res.restarts > 1
@@ -0,0 +1,39 @@
+# tests/test_railfence.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from app.crypto.railfence import (
+    PERM_CACHE_MAX_LEN, _getters, railfence_batch, railfence_decrypt, railfence_encrypt,
+)
+from app.crypto import railfence
+
+
+def test_known_vector():
+    assert railfence_encrypt('WEAREDISCOVERED', 3, 1) == 'RSEWAEICVRDEDOE'
+    assert railfence_decrypt('RSEWAEICVRDEDOE', 3, 1) == 'WEAREDISCOVERED'
+
+
+@pytest.mark.parametrize('n', [2, 97, PERM_CACHE_MAX_LEN, PERM_CACHE_MAX_LEN + 1])
+@pytest.mark.parametrize('rails', [2, 3, 7])
+def test_roundtrip(n, rails):
+    text = ''.join(chr(0x430 + i % 32) for i in range(n))
+    assert railfence_decrypt(railfence_encrypt(text, rails, 5), rails, 5) == text
+
+
+def test_long_texts_are_not_cached():
+    _getters.cache_clear()
+    railfence_encrypt('x' * (PERM_CACHE_MAX_LEN + 1), 3)
+    assert _getters.cache_info().currsize == 0
+    railfence_encrypt('x' * 100, 3)
+    assert _getters.cache_info().currsize == 1
+
+
+def test_batch_builds_long_permutation_once_per_length(monkeypatch):
+    long = 'я' * (PERM_CACHE_MAX_LEN + 1)
+    texts = [long, 'abc', long.upper(), '', long]
+    expected = [railfence_encrypt(t, 3, 1) for t in texts]
+    built = []
+    build = railfence._build_getters
+    monkeypatch.setattr(railfence, '_build_getters', lambda *a: built.append(a) or build(*a))
+    assert railfence_batch(texts, 3, 1) == expected
+    assert built == [(PERM_CACHE_MAX_LEN + 1, 3, 1)]
@@ -0,0 +1,33 @@
+# tests/test_rsa_pool.py
+# -*- coding: utf-8 -*-
+import pytest
+from flask import Flask
+
+from app.crypto.rsa_pool import KeyPool
+from app.metrics import metrics
+
+
+def _pool(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    pool = KeyPool()
+    pool.init_app(app)
+    return pool
+
+
+def test_sizes_from_config():
+    assert _pool(RSA_POOL_SIZES='2048, 4096').sizes == (2048, 4096)
+    assert _pool().sizes == (2048,)
+    with pytest.raises(ValueError):
+        _pool(RSA_POOL_SIZES='1024')
+
+
+def test_stats_exported_to_metrics():
+    pool = _pool(RSA_POOL_DEPTH=0)
+    priv, pub = pool.get_pem(2048)
+    assert 'PRIVATE KEY' in priv and 'PUBLIC KEY' in pub
+    assert pool.stats()[2048]['misses'] == 1
+    text = metrics.render()
+    assert 'cryptolab_rsa_pool_requests_total{bits="2048",result="miss"}' in text
+    assert '# TYPE cryptolab_rsa_pool_depth gauge' in text
+    assert 'cryptolab_rsa_pool_depth{bits="2048"} 0' in text
@@ -0,0 +1,62 @@
+# tests/test_stats.py
+# -*- coding: utf-8 -*-
+from hashlib import sha256
+
+from app import db
+from app.jobs import DONE, jobs
+from app.models import Lab, Submission, UserLabStats, UserStats
+
+
+def _lab(answer):
+    lab = Lab(title=answer, description='', algorithm='caesar', payload='x',
+              answer_hash=sha256(answer.encode()).hexdigest())
+    db.session.add(lab)
+    db.session.commit()
+    return lab.id
+
+
+def _submit(user_id, lab_id, text, ok):
+    db.session.add(Submission(user_id=user_id, lab_id=lab_id, submitted_text=text, is_correct=ok))
+    db.session.commit()
+
+
+def _totals(user_id):
+    st = db.session.get(UserStats, user_id)
+    return st.ok, st.total
+
+
+def test_lab_delete_drops_its_stats(app, admin, users):
+    uid = users['student']
+    with app.app_context():
+        gone, kept = _lab('a'), _lab('b')
+        _submit(uid, gone, 'a', True)
+        _submit(uid, gone, 'x', False)
+        _submit(uid, kept, 'b', True)
+        assert _totals(uid) == (2, 3)
+
+    assert admin.post(f'/admin/labs/{gone}/delete').status_code == 302
+    with app.app_context():
+        assert _totals(uid) == (1, 1)
+        assert UserLabStats.query.filter_by(lab_id=gone).count() == 0
+        assert UserLabStats.query.filter_by(lab_id=kept).count() == 1
+
+
+def test_regrade_rebuilds_only_that_lab(app, admin, users):
+    uid = users['student']
+    with app.app_context():
+        lab_id, other = _lab('a'), _lab('b')
+        _submit(uid, lab_id, 'new', False)
+        _submit(uid, other, 'b', True)
+        # счётчик другой лабы намеренно испорчен: полный rebuild() его бы исправил
+        db.session.get(UserLabStats, (uid, other)).total = 7
+        lab = db.session.get(Lab, lab_id)
+        lab.answer_hash = sha256(b'new').hexdigest()
+        db.session.commit()
+        jobs.enqueue('labs.regrade', {'lab_id': lab_id}, user_id=users['admin'])
+        assert jobs.run_one(jobs.claim('test')) == DONE
+
+        db.session.expire_all()
+        row = db.session.get(UserLabStats, (uid, lab_id))
+        assert (row.ok, row.total) == (1, 1) and row.first_solved_at is not None
+        assert _totals(uid) == (2, 2)
+        assert db.session.get(UserLabStats, (uid, other)).total == 7
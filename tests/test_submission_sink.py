@@ -0,0 +1,56 @@
+# tests/test_submission_sink.py
+# -*- coding: utf-8 -*-
+import queue
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import Lab, Submission, UserStats
+from app.submission_sink import SubmissionSink
+
+
+@pytest.fixture
+def lab_id(app):
+    with app.app_context():
+        lab = Lab(title='t', description='', algorithm='caesar', payload='x', answer_hash='0' * 64)
+        db.session.add(lab)
+        db.session.commit()
+        return lab.id
+
+
+@pytest.fixture
+def sink(app):
+    sink = SubmissionSink()
+    sink.init_app(app)
+    # app.testing включает синхронный режим — проверяем очередь
+    app.testing = False
+    yield sink
+    app.testing = True
+
+
+def test_async_batches_are_written_on_shutdown(app, users, lab_id, sink):
+    uid = users['student']
+    for i in range(5):
+        sink.submit(uid, lab_id, f'try {i}', i == 4)
+    sink.shutdown()
+    with app.app_context():
+        assert Submission.query.filter_by(user_id=uid).count() == 5
+        st = db.session.get(UserStats, uid)
+        assert (st.total, st.ok) == (5, 1)
+
+
+def test_full_queue_does_not_touch_request_session(app, users, lab_id, sink, monkeypatch):
+    uid = users['student']
+    sink._queue = queue.Queue(maxsize=1)
+    sink._queue.put({'user_id': uid, 'lab_id': lab_id, 'submitted_text': 'queued',
+                     'is_correct': False, 'created_at': datetime.utcnow()})
+    monkeypatch.setattr(sink, '_ensure_started', lambda: None)
+    with app.test_request_context():
+        # незакоммиченная правка вьюхи: синхронная запись её не коммитит
+        db.session.get(Lab, lab_id).title = 'changed'
+        sink.submit(uid, lab_id, 'direct', True)
+        assert sink.sync_writes == 1
+        db.session.rollback()
+        assert db.session.get(Lab, lab_id).title == 't'
+        assert [s.submitted_text for s in Submission.query.all()] == ['direct']
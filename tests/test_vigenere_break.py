@@ -0,0 +1,21 @@
+# tests/test_vigenere_break.py
+# -*- coding: utf-8 -*-
+from app.crypto.vigenere import vigenere
+from app.forms import MAX_VIGENERE_BREAK_TEXT
+
+PLAIN = open('app/crypto/data/corpus_ru.txt', encoding='utf-8').read()
+
+
+def test_break_in_request(student):
+    ct = vigenere(PLAIN, 'лимон', encrypt=True)
+    page = student.post('/playground/vigenere/break', data={'text': ct, 'lang': 'ru', 'max_len': 24})
+    assert page.status_code == 200
+    assert '<code>лимон</code>' in page.get_data(as_text=True)
+
+
+def test_sync_break_is_capped(student):
+    ct = vigenere((PLAIN * (MAX_VIGENERE_BREAK_TEXT // len(PLAIN) + 1))[:MAX_VIGENERE_BREAK_TEXT + 1],
+                  'лимон', encrypt=True)
+    page = student.post('/playground/vigenere/break', data={'text': ct, 'lang': 'ru', 'max_len': 24})
+    html = page.get_data(as_text=True)
+    assert 'Лучший ключ' not in html